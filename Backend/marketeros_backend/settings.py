@@ -37,6 +37,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'voting.middleware.CompressionMiddleware',
+    'voting.middleware.CacheTagMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,9 +73,118 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Las transacciones toman el bloqueo de escritura al empezar y esperan
+        # a las demás (workers de tareas en varios hilos) en lugar de fallar
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
+# Cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'marketeros',
+    }
+}
+
+# Tiempo de vida (segundos) del payload materializado del dashboard
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Tiempo de vida (segundos) del detalle público de cada marketero
+USER_DETAIL_CACHE_TIMEOUT = 300
+
+# Tiempo de vida (segundos) de los likes dados/recibidos cacheados por usuario
+LIKE_EDGES_CACHE_TIMEOUT = 300
+
+# Tiempo de vida (segundos) de las estadísticas del panel de administración
+ADMIN_STATS_CACHE_TIMEOUT = 30
+
+# Tiempo de vida (segundos) de las búsquedas de invitaciones por código
+INVITATION_CACHE_TIMEOUT = 300
+
+# Filas a partir de las cuales los listados del admin usan un conteo estimado
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Likes borrados por lote al resetear todos los likes
+LIKE_RESET_CHUNK_SIZE = 1000
+
+# Compresión de respuestas de la API (brotli si está instalado, si no gzip)
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CONTENT_TYPES = ['application/json']
+
+# Segundos entre verificaciones del grafo de likes en memoria contra la BD
+LIKE_GRAPH_REFRESH_INTERVAL = 2.0
+
+# Segundos entre verificaciones del leaderboard en memoria contra la versión
+# de la etiqueta ranking en la tabla cache_tags, que CacheTagMiddleware lee
+# una sola vez por petición (cada worker reconstruye el suyo al cambiar)
+LEADERBOARD_REFRESH_INTERVAL = 2.0
+
+# Segundos durante los que el feed de actividad se sirve desde la proyección
+# sin releer el log de eventos
+ACTIVITY_REFRESH_INTERVAL = 2.0
+
+# Segundos que se guarda el histograma de likes usado para los percentiles
+LIKES_HISTOGRAM_CACHE_TIMEOUT = 300
+
+# Segundos en los que se rechaza (429) otra actualización manual de rankings,
+# y tras los que se considera caducado el bloqueo de una operación en curso
+RANKINGS_UPDATE_COOLDOWN = 30
+SINGLE_FLIGHT_LOCK_TIMEOUT = 300
+
+# Segundos que se guarda la respuesta de un POST con Idempotency-Key
+# (likes, toggle, lote y registro) para repetirla en los reintentos
+IDEMPOTENCY_KEY_TTL = 86400
+# Segundos que dura la reserva de una petición en curso: si el proceso muere
+# sin responder, un reintento posterior la retoma en lugar de recibir 409
+IDEMPOTENCY_LEASE = 30
+
+# Tareas en segundo plano (manage.py run_worker): segundos que un worker
+# reserva la tarea sin renovarla, cada cuánto la renueva mientras la ejecuta
+# y espera base entre reintentos
+JOB_LEASE_SECONDS = 300
+JOB_HEARTBEAT_INTERVAL = 100
+JOB_RETRY_DELAY = 10
+
+# Eventos de likes leídos por lote al reproducir las proyecciones
+PROJECTION_BATCH_SIZE = 1000
+
+# Token buckets por vista ('capacidad/periodo'): por IP y por usuario
+# (en el login, por email intentado). Se guardan en la tabla throttle_buckets,
+# compartida por todos los workers; la caché indicada solo cuenta los rechazos
+THROTTLE_CACHE_ALIAS = 'default'
+THROTTLE_BUCKETS = {
+    'login': {'ip': '20/min', 'user': '5/min'},
+    'invitation': {'ip': '30/min'},
+    'toggle_like': {'ip': '120/min', 'user': '30/min'},
+}
+
+# Hashers de contraseñas: Argon2 si argon2-cffi está instalado, si no scrypt.
+# PBKDF2 se mantiene para verificar los hashes antiguos, que se migran al iniciar sesión
+PASSWORD_HASHERS = [
+    'voting.hashers.TunedScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+try:
+    import argon2  # noqa: F401
+    PASSWORD_HASHERS.insert(0, 'voting.hashers.TunedArgon2PasswordHasher')
+except ImportError:
+    pass
+
+PASSWORD_HASH_PARAMS = {
+    'scrypt': {'work_factor': 2 ** 15, 'block_size': 8, 'parallelism': 1},
+    'argon2': {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1},
+}
+
+# Contraseñas que se verifican a la vez por proceso (None = núcleos)
+PASSWORD_HASH_WORKERS = None
+
+AUTHENTICATION_BACKENDS = ['voting.backends.BoundedHashModelBackend']
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -100,6 +211,10 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Frontend estático y su build con huellas y precomprimido (manage.py build_frontend)
+FRONTEND_DIR = BASE_DIR.parent / 'Frontend'
+FRONTEND_BUILD_DIR = BASE_DIR / 'frontend_build'
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -121,7 +236,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        # Usa orjson si está instalado y el JSONRenderer estándar si no
+        'voting.renderers.FastJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -155,6 +271,8 @@ SIMPLE_JWT = {
 }
 
 # CORS settings
+from corsheaders.defaults import default_headers
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
@@ -168,6 +286,9 @@ CORS_ALLOW_CREDENTIALS = True
 
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Solo para desarrollo
 
+# Cabecera de los reintentos idempotentes de likes y registro
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
 # Configuraciones adicionales para desarrollo
 if DEBUG:
     CORS_ALLOW_ALL_ORIGINS = True
@@ -181,6 +302,7 @@ if DEBUG:
         'user-agent',
         'x-csrftoken',
         'x-requested-with',
+        'idempotency-key',
     ]
 
 # Configuraciones de archivos
@@ -1,14 +1,91 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from django.utils.html import format_html
-from django.db.models import Count
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
-from .models import User, Invitation, Like, UserStats
+from .cache import invalidate_user_payloads
+from .invitations import invalidate_invitations
+from .leaderboard import leaderboard, recompute_rankings
+from .models import User, Invitation, Like, UserStats, LikeReset, VotingRound, RankingSnapshot, Job
+from .singleflight import run_exclusive
 
 # Register your models here.
 
+# A partir de este número de filas se usa el conteo estimado en los listados
+ESTIMATED_COUNT_THRESHOLD = getattr(settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', 10000)
+
+
+def estimate_table_rows(queryset, threshold=None):
+    """Row count of a whole table: exact below the threshold, estimated above it, or None"""
+    threshold = ESTIMATED_COUNT_THRESHOLD if threshold is None else threshold
+    connection = connections[queryset.db]
+    db_table = queryset.model._meta.db_table
+    table = connection.ops.quote_name(db_table)
+    
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [db_table])
+            row = cursor.fetchone()
+            estimate = int(row[0]) if row and row[0] is not None else -1
+            # Sin estadísticas (-1) o tabla pequeña: el COUNT real es barato
+            return estimate if estimate >= threshold else None
+        
+        if connection.vendor != 'sqlite':
+            return None
+        
+        # Conteo acotado: como mucho threshold + 1 filas
+        cursor.execute(f'SELECT COUNT(*) FROM (SELECT 1 FROM {table} LIMIT %s)', [threshold + 1])
+        bounded = cursor.fetchone()[0]
+        if bounded <= threshold:
+            return bounded
+        
+        # Filas según el último ANALYZE (primer número de sqlite_stat1)
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [db_table])
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        estimate = int(row[0].split()[0])
+        
+        # Los ids no se reutilizan: el mayor rowid es una cota superior
+        # (las estadísticas pueden ser anteriores a un reseteo)
+        cursor.execute(f'SELECT MAX(rowid) FROM {table}')
+        upper_bound = cursor.fetchone()[0] or 0
+    
+    return max(threshold + 1, min(estimate, upper_bound))
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the total of large unfiltered changelists"""
+    
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimate_table_rows(self.object_list)
+            if estimate is not None:
+                return estimate
+        return super().count
+
+
+def rank_with_medal(rank):
+    """Display a rank with a medal for the top three"""
+    if not rank:
+        return "-"
+    if rank == 1:
+        return f"🥇 #{rank}"
+    elif rank == 2:
+        return f"🥈 #{rank}"
+    elif rank == 3:
+        return f"🥉 #{rank}"
+    return f"#{rank}"
+
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
     """Admin interface for User model"""
@@ -46,41 +123,43 @@ class UserAdmin(BaseUserAdmin):
     
     readonly_fields = ('created_at', 'updated_at', 'last_login', 'date_joined')
     
+    # Evitar el COUNT(*) completo en cada página del listado
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('stats').annotate(
-            likes_received_count=Count('received_likes'),
-            likes_given_count=Count('given_likes')
-        )
+        # Los contadores salen de las columnas de UserStats, sin joins a likes
+        return super().get_queryset(request).select_related('stats')
+    
+    def _stats(self, obj):
+        try:
+            return obj.stats
+        except UserStats.DoesNotExist:
+            return None
     
     def likes_received_display(self, obj):
         """Display likes received count"""
-        count = getattr(obj, 'likes_received_count', obj.likes_received_count)
+        stats = self._stats(obj)
+        count = stats.likes_received if stats else 0
         return f"{count} ❤️"
     likes_received_display.short_description = "Likes Recibidos"
-    likes_received_display.admin_order_field = 'likes_received_count'
+    likes_received_display.admin_order_field = 'stats__likes_received'
     
     def likes_given_display(self, obj):
         """Display likes given count"""
-        count = getattr(obj, 'likes_given_count', obj.likes_given_count)
+        stats = self._stats(obj)
+        count = stats.likes_given if stats else 0
         remaining = 5 - count
         return f"{count}/5 (quedan {remaining})"
     likes_given_display.short_description = "Likes Dados"
-    likes_given_display.admin_order_field = 'likes_given_count'
+    likes_given_display.admin_order_field = 'stats__likes_given'
     
     def rank_display(self, obj):
         """Display user rank"""
-        if hasattr(obj, 'stats') and obj.stats.rank:
-            rank = obj.stats.rank
-            if rank == 1:
-                return f"🥇 #{rank}"
-            elif rank == 2:
-                return f"🥈 #{rank}"
-            elif rank == 3:
-                return f"🥉 #{rank}"
-            else:
-                return f"#{rank}"
-        return "-"
+        stats = self._stats(obj)
+        return rank_with_medal(stats.rank if stats else None)
     rank_display.short_description = "Ranking"
+    rank_display.admin_order_field = 'stats__rank'
     
     def avatar_display(self, obj):
         """Display avatar thumbnail"""
@@ -96,19 +175,28 @@ class UserAdmin(BaseUserAdmin):
     
     def make_marketer(self, request, queryset):
         """Mark users as marketers"""
+        user_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(is_marketer=True)
+        # El UPDATE no dispara signals: copiar las columnas del ranking
+        UserStats.sync_listing(user_ids)
         self.message_user(request, f'{updated} usuarios marcados como marketeros.')
     make_marketer.short_description = "Marcar como marketeros"
     
     def remove_marketer(self, request, queryset):
         """Remove marketer status"""
+        user_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(is_marketer=False)
+        # El UPDATE no dispara signals: copiar las columnas del ranking
+        UserStats.sync_listing(user_ids)
         self.message_user(request, f'{updated} usuarios removidos como marketeros.')
     remove_marketer.short_description = "Remover como marketeros"
     
     def complete_registration(self, request, queryset):
         """Complete user registration"""
+        user_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(registration_completed=True)
+        # El UPDATE no dispara signals: copiar las columnas del ranking
+        UserStats.sync_listing(user_ids)
         self.message_user(request, f'{updated} registros completados.')
     complete_registration.short_description = "Completar registro"
 
@@ -188,7 +276,11 @@ class InvitationAdmin(admin.ModelAdmin):
     def expire_invitations(self, request, queryset):
         """Expire selected invitations"""
         from django.utils import timezone
-        updated = queryset.filter(used=False).update(expires_at=timezone.now())
+        unused = queryset.filter(used=False)
+        codes = list(unused.values_list('code', flat=True))
+        updated = unused.update(expires_at=timezone.now())
+        # El UPDATE no dispara signals: invalidar las búsquedas de esos códigos
+        invalidate_invitations(codes)
         self.message_user(request, f'{updated} invitaciones expiradas.')
     expire_invitations.short_description = "Expirar invitaciones"
 
@@ -197,17 +289,20 @@ class InvitationAdmin(admin.ModelAdmin):
 class LikeAdmin(admin.ModelAdmin):
     """Admin interface for Like model"""
     list_display = (
-        'giver_display', 'target_display', 'created_at'
+        'giver_display', 'target_display', 'round', 'created_at'
     )
-    list_filter = ('created_at',)
+    list_filter = ('round', 'created_at')
     search_fields = (
         'giver__first_name', 'giver__last_name', 'giver__email',
         'target__first_name', 'target__last_name', 'target__email'
     )
     ordering = ('-created_at',)
     
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('giver', 'target')
+        return super().get_queryset(request).select_related('giver', 'target', 'round')
     
     def giver_display(self, obj):
         """Display giver with link"""
@@ -237,6 +332,9 @@ class UserStatsAdmin(admin.ModelAdmin):
     search_fields = ('user__first_name', 'user__last_name', 'user__email')
     ordering = ('rank', '-likes_received')
     
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('user')
     
@@ -248,32 +346,24 @@ class UserStatsAdmin(admin.ModelAdmin):
     
     def rank_display(self, obj):
         """Display rank with emoji"""
-        if obj.rank:
-            if obj.rank == 1:
-                return f"🥇 #{obj.rank}"
-            elif obj.rank == 2:
-                return f"🥈 #{obj.rank}"
-            elif obj.rank == 3:
-                return f"🥉 #{obj.rank}"
-            else:
-                return f"#{obj.rank}"
-        return "-"
+        return rank_with_medal(obj.rank)
     rank_display.short_description = "Ranking"
     
     actions = ['update_stats', 'update_rankings']
     
     def update_stats(self, request, queryset):
         """Update stats for selected users"""
-        count = 0
-        for stats in queryset:
-            UserStats.update_user_stats(stats.user)
-            count += 1
+        user_ids = list(queryset.values_list('user_id', flat=True))
+        count = UserStats.refresh_counts(UserStats.objects.filter(user_id__in=user_ids))
+        UserStats.update_all_rankings()
+        leaderboard.invalidate()
+        invalidate_user_payloads(user_ids)
         self.message_user(request, f'{count} estadísticas actualizadas.')
     update_stats.short_description = "Actualizar estadísticas"
     
     def update_rankings(self, request, queryset):
         """Update all rankings"""
-        UserStats.update_all_rankings()
+        run_exclusive('update_rankings', recompute_rankings)
         self.message_user(request, 'Rankings actualizados para todos los usuarios.')
     update_rankings.short_description = "Actualizar rankings"
     
@@ -286,6 +376,80 @@ class UserStatsAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(VotingRound)
+class VotingRoundAdmin(admin.ModelAdmin):
+    """Admin interface for VotingRound model"""
+    list_display = ('name', 'is_active', 'started_at', 'closed_at', 'closed_by')
+    list_filter = ('is_active',)
+    ordering = ('-started_at',)
+    readonly_fields = ('is_active', 'started_at', 'closed_at', 'closed_by')
+    
+    def has_add_permission(self, request):
+        """Rounds are opened by closing the current one"""
+        return False
+
+
+@admin.register(RankingSnapshot)
+class RankingSnapshotAdmin(admin.ModelAdmin):
+    """Read-only admin for frozen rankings"""
+    list_display = ('round', 'position', 'rank', 'full_name', 'likes_received')
+    list_filter = ('round',)
+    search_fields = ('full_name',)
+    ordering = ('round', 'position')
+    
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LikeReset)
+class LikeResetAdmin(admin.ModelAdmin):
+    """Read-only audit log of likes resets"""
+    list_display = (
+        'id', 'status', 'requested_by', 'deleted_likes', 'total_likes',
+        'created_at', 'finished_at'
+    )
+    list_filter = ('status', 'created_at')
+    ordering = ('-created_at',)
+    readonly_fields = (
+        'requested_by', 'status', 'total_likes', 'deleted_likes', 'error',
+        'created_at', 'started_at', 'finished_at'
+    )
+    
+    def has_add_permission(self, request):
+        """Resets are started from the API"""
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        """Keep the audit log intact"""
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Read-only view of the background jobs"""
+    list_display = (
+        'id', 'kind', 'status', 'progress', 'attempts', 'created_by',
+        'created_at', 'finished_at'
+    )
+    list_filter = ('status', 'kind', 'created_at')
+    ordering = ('-created_at',)
+    readonly_fields = (
+        'kind', 'payload', 'status', 'attempts', 'max_attempts', 'progress', 'message',
+        'result', 'error', 'created_by', 'run_after', 'locked_by', 'locked_until',
+        'created_at', 'started_at', 'finished_at'
+    )
+    
+    def has_add_permission(self, request):
+        """Jobs are queued from the API and the management commands"""
+        return False
+
+
 # Personalizar el sitio de administración
 admin.site.site_header = "Administración - Plataforma Marketeros"
 admin.site.site_title = "Admin Marketeros"
@@ -0,0 +1,52 @@
+"""
+Aggregated statistics for the admin dashboard
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .cache import ADMIN_STATS_CACHE_TIMEOUT, admin_stats_cache_key
+from .models import User, Invitation, UserStats
+from .serializers import UserSummarySerializer
+
+
+def compute_admin_stats():
+    """Compute the admin statistics with a fixed number of queries"""
+    # Totales de usuarios y likes en una sola consulta (users ⟕ user_stats es 1 a 1)
+    user_totals = User.objects.aggregate(
+        total_users=Count('id', filter=Q(is_marketer=True)),
+        active_users=Count('id', filter=Q(is_marketer=True, registration_completed=True)),
+        total_likes=Coalesce(Sum('stats__likes_given'), 0)
+    )
+    invitation_totals = Invitation.objects.aggregate(
+        total_invitations=Count('id'),
+        used_invitations=Count('id', filter=Q(used=True))
+    )
+    
+    # Usuarios más activos y más populares desde las columnas indexadas de UserStats
+    most_active_givers = UserStats.objects.select_related('user').filter(
+        likes_given__gt=0
+    ).order_by('-likes_given', 'user_id')[:5]
+    most_popular = UserStats.objects.select_related('user').filter(
+        likes_received__gt=0
+    ).order_by('-likes_received', 'user_id')[:5]
+    
+    return {
+        **user_totals,
+        **invitation_totals,
+        'unused_invitations': (
+            invitation_totals['total_invitations'] - invitation_totals['used_invitations']
+        ),
+        'most_active_givers': UserSummarySerializer(most_active_givers, many=True).data,
+        'most_popular': UserSummarySerializer(most_popular, many=True).data
+    }
+
+
+def get_admin_stats():
+    """Return the admin statistics, cached for a short time"""
+    key = admin_stats_cache_key()
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_admin_stats()
+        cache.set(key, stats, ADMIN_STATS_CACHE_TIMEOUT)
+    return stats
@@ -0,0 +1,29 @@
+"""
+Authentication backend that bounds concurrent password hashes
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .hashers import run_dummy_hash, verify_password
+
+
+class BoundedHashModelBackend(ModelBackend):
+    """ModelBackend whose password checks share a per-process limit of concurrent hashes"""
+    
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Mismo coste que con un usuario existente (evita enumerar emails)
+            run_dummy_hash(password)
+            return None
+        
+        if verify_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,49 @@
+"""
+Cache keys and invalidation helpers for payloads derived from likes
+"""
+from django.conf import settings
+
+from .tags import INVITATIONS_TAG, RANKING_TAG, USERS_TAG, bump_tags, tagged_key, user_tag
+
+
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+USER_DETAIL_CACHE_TIMEOUT = getattr(settings, 'USER_DETAIL_CACHE_TIMEOUT', 300)
+LIKE_EDGES_CACHE_TIMEOUT = getattr(settings, 'LIKE_EDGES_CACHE_TIMEOUT', 300)
+ADMIN_STATS_CACHE_TIMEOUT = getattr(settings, 'ADMIN_STATS_CACHE_TIMEOUT', 30)
+
+
+def admin_stats_cache_key():
+    """Cache key for the admin statistics"""
+    # Cada cambio de likes renueva la etiqueta del ranking. Los canjes de
+    # invitaciones, como las altas de usuarios, se ven al caducar la entrada
+    return tagged_key('voting:admin_stats', [RANKING_TAG, INVITATIONS_TAG, USERS_TAG])
+
+
+def _user_payload_key(prefix, user_id):
+    # Cambia al invalidar ese usuario o a todos a la vez
+    return tagged_key(f'voting:{prefix}:{user_id}', [user_tag(user_id), USERS_TAG])
+
+
+def dashboard_cache_key(user_id):
+    """Cache key for the materialized dashboard of a user"""
+    return _user_payload_key('dashboard', user_id)
+
+
+def user_detail_cache_key(user_id):
+    """Cache key for the public detail payload of a user"""
+    return _user_payload_key('user_detail', user_id)
+
+
+def like_edges_cache_key(user_id):
+    """Cache key for the given/received like edges of a user"""
+    return _user_payload_key('like_edges', user_id)
+
+
+def invalidate_user_payloads(user_ids):
+    """Drop every cached per-user payload for the given users in every worker"""
+    bump_tags(*[user_tag(user_id) for user_id in set(user_ids) if user_id])
+
+
+def invalidate_all_user_payloads():
+    """Drop the cached per-user payloads of every user in every worker"""
+    bump_tags(USERS_TAG)
@@ -0,0 +1,63 @@
+"""
+Materialized dashboard payload for the current user
+"""
+from django.core.cache import cache
+
+from .cache import dashboard_cache_key, DASHBOARD_CACHE_TIMEOUT
+from .models import Like, UserStats, MAX_LIKES_PER_USER
+
+
+def _user_summary(user):
+    """Minimal user representation used inside the dashboard"""
+    return {
+        'id': user.id,
+        'name': user.full_name,
+        'avatar': user.avatar.url if user.avatar else None
+    }
+
+
+def build_dashboard_payload(user):
+    """Build the dashboard payload straight from the database"""
+    stats = UserStats.objects.filter(user=user).values(
+        'likes_received', 'likes_given', 'rank'
+    ).first() or {'likes_received': 0, 'likes_given': 0, 'rank': None}
+    
+    # Los likes dados están limitados a MAX_LIKES_PER_USER, se cargan todos
+    given_likes = list(Like.objects.current().filter(
+        giver=user
+    ).select_related('target').order_by('-created_at'))
+    
+    recent_received = Like.objects.current().filter(
+        target=user
+    ).select_related('giver').order_by('-created_at')[:10]
+    
+    return {
+        'user': _user_summary(user),
+        'stats': {
+            'likes_given': len(given_likes),
+            'likes_received': stats['likes_received'],
+            'remaining_likes': max(0, MAX_LIKES_PER_USER - len(given_likes)),
+            'rank': stats['rank']
+        },
+        'liked_ids': [like.target_id for like in given_likes],
+        'recent_received': [{
+            'id': like.id,
+            'from': _user_summary(like.giver),
+            'created_at': like.created_at
+        } for like in recent_received],
+        'recent_given': [{
+            'id': like.id,
+            'to': _user_summary(like.target),
+            'created_at': like.created_at
+        } for like in given_likes]
+    }
+
+
+def get_dashboard_payload(user):
+    """Return the cached dashboard payload, building it on a miss"""
+    key = dashboard_cache_key(user.id)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_dashboard_payload(user)
+        cache.set(key, payload, DASHBOARD_CACHE_TIMEOUT)
+    return payload
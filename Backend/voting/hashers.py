@@ -0,0 +1,63 @@
+"""
+Tuned password hashers and bounded password verification
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, ScryptPasswordHasher, check_password, make_password
+)
+
+
+PASSWORD_HASH_PARAMS = getattr(settings, 'PASSWORD_HASH_PARAMS', {})
+PASSWORD_HASH_WORKERS = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+
+_SCRYPT_PARAMS = PASSWORD_HASH_PARAMS.get('scrypt', {})
+_ARGON2_PARAMS = PASSWORD_HASH_PARAMS.get('argon2', {})
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt with parameters from settings.PASSWORD_HASH_PARAMS['scrypt']"""
+    work_factor = _SCRYPT_PARAMS.get('work_factor', 2 ** 15)
+    block_size = _SCRYPT_PARAMS.get('block_size', 8)
+    parallelism = _SCRYPT_PARAMS.get('parallelism', 1)
+    # OpenSSL limita scrypt a 32 MiB por defecto: dejar margen para el work factor
+    maxmem = _SCRYPT_PARAMS.get('maxmem', 256 * work_factor * block_size)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with parameters from settings.PASSWORD_HASH_PARAMS['argon2']"""
+    time_cost = _ARGON2_PARAMS.get('time_cost', 2)
+    memory_cost = _ARGON2_PARAMS.get('memory_cost', 19456)
+    parallelism = _ARGON2_PARAMS.get('parallelism', 1)
+
+
+# Acota los hashes simultáneos (CPU y memoria de scrypt/argon2) por proceso.
+# Se hashea en el hilo de la petición: un pool solo añadiría un salto de hilo
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS)
+
+
+def _verify(password, encoded):
+    """Check a password and report whether its hash should be upgraded"""
+    must_rehash = []
+    is_correct = check_password(password, encoded, setter=lambda raw: must_rehash.append(True))
+    return is_correct, bool(must_rehash)
+
+
+def verify_password(user, password):
+    """Check the password of a user, rehashing it if outdated"""
+    with _hash_slots:
+        is_correct, must_rehash = _verify(password, user.password)
+        if is_correct and must_rehash:
+            # Migración transparente al hasher y parámetros actuales
+            user.password = make_password(password)
+    if is_correct and must_rehash:
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+def run_dummy_hash(password):
+    """Hash a password to equalize timing for unknown users"""
+    with _hash_slots:
+        make_password(password)
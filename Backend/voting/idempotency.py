@@ -0,0 +1,172 @@
+"""
+Idempotency-Key support: retried POSTs replay the stored response
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+from .models import IdempotencyRecord
+
+
+IDEMPOTENCY_KEY_TTL = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400)
+IDEMPOTENCY_PURGE_INTERVAL = getattr(settings, 'IDEMPOTENCY_PURGE_INTERVAL', 300)
+IDEMPOTENCY_LEASE = getattr(settings, 'IDEMPOTENCY_LEASE', 30)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+_last_purge = 0.0
+
+
+def purge_expired_records():
+    """Delete the records whose TTL has passed"""
+    return IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+
+def _maybe_purge():
+    # Como mucho una limpieza por intervalo y proceso, sobre el índice de caducidad
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge >= IDEMPOTENCY_PURGE_INTERVAL:
+        _last_purge = now
+        purge_expired_records()
+
+
+def _record_key(request, key):
+    # La clave es del cliente: se separa por usuario (o IP si es anónimo) y por endpoint
+    if request.user and request.user.is_authenticated:
+        scope = request.user.pk
+    else:
+        scope = f'anon:{BaseThrottle().get_ident(request)}'
+    return hashlib.sha256(f'{scope}:{request.method}:{request.path}:{key}'.encode()).hexdigest()
+
+
+def _fingerprint(request):
+    # HMAC con SECRET_KEY: el cuerpo puede llevar contraseñas y un sha256 sin
+    # clave permitiría probarlas por fuerza bruta con solo leer la tabla
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return salted_hmac('voting.idempotency.fingerprint', body, algorithm='sha256').hexdigest()
+
+
+def _is_success(status_code):
+    return 200 <= status_code < 300
+
+
+def _replay(request, record, replay=None):
+    data = json.loads(record.response_body)
+    if replay is not None and _is_success(record.status_code):
+        data = replay(request, data)
+    response = Response(data, status=record.status_code)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _take_over(record_key, now):
+    """Renew the lease of an abandoned reservation, returning it or None if still held"""
+    lease = now + timedelta(seconds=IDEMPOTENCY_LEASE)
+    taken = IdempotencyRecord.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lte=now),
+        key=record_key, status_code__isnull=True
+    ).update(locked_until=lease)
+    return lease if taken else None
+
+
+def run_idempotent(request, func, store=None, replay=None):
+    """Run func once per Idempotency-Key, replaying its stored response on retries"""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return func()
+    if len(key) > MAX_KEY_LENGTH:
+        return Response({
+            'error': f'La Idempotency-Key no puede superar {MAX_KEY_LENGTH} caracteres'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    _maybe_purge()
+    record_key = _record_key(request, key)
+    fingerprint = _fingerprint(request)
+    now = timezone.now()
+    
+    # Reservar la clave antes de ejecutar: un reintento simultáneo recibe 409.
+    # La reserva caduca a los IDEMPOTENCY_LEASE segundos: si el proceso que la
+    # tomó murió sin liberarla, un reintento posterior se queda con ella
+    IdempotencyRecord.objects.filter(key=record_key, expires_at__lte=now).delete()
+    lease = now + timedelta(seconds=IDEMPOTENCY_LEASE)
+    try:
+        with transaction.atomic():
+            IdempotencyRecord.objects.create(
+                key=record_key,
+                fingerprint=fingerprint,
+                locked_until=lease,
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+            )
+    except IntegrityError:
+        record = IdempotencyRecord.objects.filter(key=record_key).first()
+        if record is None:
+            return func()
+        if record.fingerprint != fingerprint:
+            return Response({
+                'error': 'La Idempotency-Key ya se usó con una petición distinta'
+            }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if record.status_code is not None:
+            return _replay(request, record, replay)
+        lease = _take_over(record_key, now)
+        if lease is None:
+            return Response({
+                'error': 'Hay una petición con esta Idempotency-Key en curso'
+            }, status=status.HTTP_409_CONFLICT)
+    
+    # El vencimiento de la reserva identifica a su dueño: si otro reintento la
+    # tomó tras caducar, esta ejecución ya no guarda ni borra nada
+    owned = IdempotencyRecord.objects.filter(key=record_key, locked_until=lease)
+    try:
+        response = func()
+    except Exception:
+        # Sin respuesta que repetir: el reintento vuelve a ejecutar la petición
+        owned.delete()
+        raise
+    
+    if response.status_code >= 500 or not hasattr(response, 'data'):
+        owned.delete()
+    else:
+        # store reduce el cuerpo a lo que se guarda (sin tokens ni secretos)
+        # y replay lo reconstruye al repetir la respuesta
+        data = response.data
+        if store is not None and _is_success(response.status_code):
+            data = store(data)
+        owned.update(
+            status_code=response.status_code,
+            response_body=json.dumps(data, cls=DjangoJSONEncoder),
+            locked_until=None
+        )
+    return response
+
+
+def idempotent(view_func=None, *, store=None, replay=None):
+    """Make a POST view or view method honour the Idempotency-Key header"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            # Vistas de función (request, ...) o métodos de vista (self, request, ...)
+            request = args[0] if isinstance(args[0], Request) else args[1]
+            return run_idempotent(
+                request, lambda: view_func(*args, **kwargs), store=store, replay=replay
+            )
+        return wrapper
+    
+    if view_func is None:
+        return decorator
+    return decorator(view_func)
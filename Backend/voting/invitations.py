@@ -0,0 +1,116 @@
+"""
+Cached invitation lookups with negative entries and a bloom filter of codes
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Invitation
+from .tags import INVITATIONS_TAG, bump_tags, get_tag_versions, invitation_tag
+
+
+INVITATION_CACHE_TIMEOUT = getattr(settings, 'INVITATION_CACHE_TIMEOUT', 300)
+
+# Bits por código y funciones hash: ~1% de falsos positivos
+BLOOM_BITS_PER_CODE = 10
+BLOOM_HASHES = 7
+
+# Marca de "el código no existe" en la caché
+MISSING = 'missing'
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings"""
+    
+    def __init__(self, size, hashes=BLOOM_HASHES, bits=None):
+        self.size = max(size, 8)
+        self.hashes = hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.size + 7) // 8)
+    
+    @classmethod
+    def from_values(cls, values, count):
+        bloom = cls(count * BLOOM_BITS_PER_CODE)
+        for value in values:
+            bloom.add(value)
+        return bloom
+    
+    def _positions(self, value):
+        # Doble hashing: k posiciones a partir de un único digest
+        digest = hashlib.sha256(value.encode()).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:16], 'big') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+    
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+    
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+    
+    def dump(self):
+        return (self.size, self.hashes, bytes(self.bits))
+
+
+def _code_key(versions, code):
+    # Los códigos vienen del usuario: se usan hasheados en la clave
+    digest = hashlib.sha1(code.encode()).hexdigest()
+    return f'voting:invitation:{versions[INVITATIONS_TAG]}.{versions[invitation_tag(code)]}:{digest}'
+
+
+def _bloom_key(version):
+    return f'voting:invitations:bloom:{version}'
+
+
+def _get_bloom(version):
+    """Bloom filter of every existing code, built with one scan on a miss"""
+    dumped = cache.get(_bloom_key(version))
+    if dumped is not None:
+        size, hashes, bits = dumped
+        return BloomFilter(size, hashes, bits)
+    
+    codes = Invitation.objects.values_list('code', flat=True)
+    bloom = BloomFilter.from_values(codes.iterator(), codes.count())
+    cache.set(_bloom_key(version), bloom.dump(), INVITATION_CACHE_TIMEOUT)
+    return bloom
+
+
+def get_invitation(code):
+    """Invitation with the given code, or None, avoiding the DB when possible"""
+    # Una sola lectura para la versión global (filtro) y la del código (entrada)
+    versions = get_tag_versions([INVITATIONS_TAG, invitation_tag(code)])
+    if code not in _get_bloom(versions[INVITATIONS_TAG]):
+        return None
+    
+    key = _code_key(versions, code)
+    cached = cache.get(key)
+    if cached == MISSING:
+        return None
+    if cached is not None:
+        field_names, values = cached
+        return Invitation.from_db('default', field_names, values)
+    
+    invitation = Invitation.objects.filter(code=code).first()
+    if invitation is None:
+        cache.set(key, MISSING, INVITATION_CACHE_TIMEOUT)
+        return None
+    
+    field_names = [field.attname for field in Invitation._meta.concrete_fields]
+    cache.set(
+        key,
+        (field_names, [getattr(invitation, name) for name in field_names]),
+        INVITATION_CACHE_TIMEOUT
+    )
+    return invitation
+
+
+def invalidate_invitations(codes):
+    """Drop the cached lookups of the given codes in every worker, keeping the bloom filter"""
+    bump_tags(*[invitation_tag(code) for code in codes])
+
+
+def invalidate_all_invitations():
+    """Start a new key version in every worker: entries and the bloom filter are rebuilt lazily"""
+    # Solo hace falta cuando cambia el conjunto de códigos (altas o cambios de código)
+    bump_tags(INVITATIONS_TAG)
@@ -0,0 +1,266 @@
+"""
+Database-backed job queue for admin-scale operations, run by manage.py run_worker
+"""
+import logging
+import secrets
+import string
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .cache import invalidate_all_user_payloads
+from .invitations import invalidate_all_invitations
+from .leaderboard import recompute_rankings
+from .models import Invitation, Job, User, UserStats
+from .resets import run_like_reset
+from .serializers import (
+    BulkInvitationsPayloadSerializer, JobPayloadSerializer, ResetLikesPayloadSerializer
+)
+from .singleflight import run_exclusive
+
+
+JOB_LEASE_SECONDS = getattr(settings, 'JOB_LEASE_SECONDS', 300)
+JOB_RETRY_DELAY = getattr(settings, 'JOB_RETRY_DELAY', 10)
+# Cada cuánto renueva la reserva un job en curso, informe o no progreso
+JOB_HEARTBEAT_INTERVAL = getattr(settings, 'JOB_HEARTBEAT_INTERVAL', JOB_LEASE_SECONDS / 3)
+
+logger = logging.getLogger(__name__)
+
+# kind -> función(job, **payload) que devuelve un resultado serializable a JSON
+JOB_HANDLERS = {}
+# kind -> serializer que valida el payload al encolar
+JOB_PAYLOADS = {}
+
+
+def job_handler(kind, payload=JobPayloadSerializer):
+    """Register the function that runs the jobs of a kind and its payload serializer"""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        JOB_PAYLOADS[kind] = payload
+        return func
+    return register
+
+
+def enqueue(kind, payload=None, created_by=None, max_attempts=3):
+    """Queue a job for the workers, raising ValidationError on an invalid payload"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'Tipo de tarea desconocido: {kind}')
+    # Se valida aquí y no en el worker: un payload inválido no llega a la cola
+    serializer = JOB_PAYLOADS[kind](data=payload or {})
+    serializer.is_valid(raise_exception=True)
+    return Job.objects.create(
+        kind=kind,
+        payload=dict(serializer.validated_data),
+        created_by=created_by,
+        max_attempts=max_attempts
+    )
+
+
+def _claimable(now):
+    # Pendientes ya programadas, o en curso con el worker caducado y con
+    # intentos disponibles (reclamarla cuenta como un intento más)
+    return Q(status=Job.STATUS_PENDING, run_after__lte=now) | Q(
+        status=Job.STATUS_RUNNING, locked_until__lte=now, attempts__lt=F('max_attempts')
+    )
+
+
+def fail_abandoned_jobs():
+    """Mark as failed the jobs whose worker died on their last attempt"""
+    now = timezone.now()
+    return Job.objects.filter(
+        status=Job.STATUS_RUNNING, locked_until__lte=now, attempts__gte=F('max_attempts')
+    ).update(
+        status=Job.STATUS_FAILED,
+        error='El worker dejó de responder y no quedan intentos',
+        locked_by='',
+        locked_until=None,
+        finished_at=now
+    )
+
+
+def claim_job(worker_id):
+    """Take the next runnable job for this worker, or None"""
+    fail_abandoned_jobs()
+    for _ in range(5):
+        now = timezone.now()
+        job_id = Job.objects.filter(_claimable(now)).order_by('run_after', 'id').values_list(
+            'id', flat=True
+        ).first()
+        if job_id is None:
+            return None
+        
+        # UPDATE condicional: si otro worker la tomó antes, se prueba con la siguiente
+        claimed = Job.objects.filter(_claimable(now), id=job_id).update(
+            status=Job.STATUS_RUNNING,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=JOB_LEASE_SECONDS),
+            attempts=F('attempts') + 1,
+            started_at=now
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def report_progress(job, progress, message=''):
+    """Store the progress of a running job and extend its lease"""
+    Job.objects.filter(id=job.id, locked_by=job.locked_by).update(
+        progress=max(0, min(100, int(progress))),
+        message=message[:200],
+        locked_until=timezone.now() + timedelta(seconds=JOB_LEASE_SECONDS)
+    )
+
+
+def extend_lease(job):
+    """Keep a running job reserved for this worker without touching its progress"""
+    Job.objects.filter(id=job.id, locked_by=job.locked_by).update(
+        locked_until=timezone.now() + timedelta(seconds=JOB_LEASE_SECONDS)
+    )
+
+
+@contextmanager
+def lease_heartbeat(job):
+    """Extend the lease of a job from a background thread while it runs"""
+    # Sin esto, un handler que tarda más que JOB_LEASE_SECONDS sin informar
+    # progreso lo reclamaría otro worker y se ejecutaría dos veces a la vez
+    stop = threading.Event()
+    
+    def beat():
+        try:
+            while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+                try:
+                    extend_lease(job)
+                except DatabaseError:
+                    logger.warning('No se pudo renovar la reserva del job %s', job.id, exc_info=True)
+        finally:
+            connection.close()
+    
+    thread = threading.Thread(target=beat, name=f'job-{job.id}-lease', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job):
+    """Run a claimed job, scheduling a retry or marking it failed on errors"""
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f'Tipo de tarea desconocido: {job.kind}')
+        with lease_heartbeat(job):
+            result = handler(job, **job.payload)
+    except Exception as e:
+        now = timezone.now()
+        retry = job.attempts < job.max_attempts
+        Job.objects.filter(id=job.id, locked_by=job.locked_by).update(
+            status=Job.STATUS_PENDING if retry else Job.STATUS_FAILED,
+            error=f'{e}\n{traceback.format_exc()}',
+            locked_by='',
+            locked_until=None,
+            run_after=now + timedelta(seconds=JOB_RETRY_DELAY * 2 ** (job.attempts - 1)),
+            finished_at=None if retry else now
+        )
+        return False
+    
+    Job.objects.filter(id=job.id, locked_by=job.locked_by).update(
+        status=Job.STATUS_COMPLETED,
+        progress=100,
+        result=result,
+        error='',
+        locked_by='',
+        locked_until=None,
+        finished_at=timezone.now()
+    )
+    return True
+
+
+@job_handler('reset_likes', payload=ResetLikesPayloadSerializer)
+def reset_likes_job(job, reset_id):
+    """Delete every like of the current round for a LikeReset"""
+    run_like_reset(
+        reset_id,
+        on_progress=lambda deleted, total: report_progress(
+            job, deleted * 100 / total if total else 0, f'{deleted} de {total} likes eliminados'
+        )
+    )
+    return {'reset_id': reset_id}
+
+
+def _new_invitation_codes(count):
+    """Generate count codes not used by any invitation"""
+    codes = set()
+    while len(codes) < count:
+        candidates = {
+            ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(12))
+            for _ in range(count - len(codes))
+        }
+        # Una consulta por tanda en lugar de una por código
+        taken = set(Invitation.objects.filter(code__in=candidates).values_list('code', flat=True))
+        codes |= candidates - taken
+    return sorted(codes)
+
+
+@job_handler('bulk_invitations', payload=BulkInvitationsPayloadSerializer)
+def bulk_invitations_job(job, count, emails=(), expires_days=30):
+    """Create count invitations, assigning the given emails in order"""
+    # Los códigos se guardan en el job antes de insertar: un reintento reutiliza
+    # los mismos y solo crea los que falten, sin duplicar invitaciones
+    codes = (job.result or {}).get('codes')
+    if not codes:
+        codes = _new_invitation_codes(count)
+        Job.objects.filter(id=job.id).update(result={'codes': codes})
+    
+    expires_at = timezone.now() + timedelta(days=expires_days)
+    with transaction.atomic():
+        existing = set(Invitation.objects.filter(code__in=codes).values_list('code', flat=True))
+        Invitation.objects.bulk_create([
+            Invitation(
+                code=code,
+                created_by=job.created_by,
+                email=emails[i] if i < len(emails) else None,
+                expires_at=expires_at
+            )
+            for i, code in enumerate(codes) if code not in existing
+        ])
+    # bulk_create no emite post_save: una sola invalidación para todo el lote
+    invalidate_all_invitations()
+    report_progress(job, 100, f'{count} de {count} invitaciones creadas')
+    
+    return {'count': len(codes), 'codes': codes}
+
+
+@job_handler('recompute_rankings')
+def recompute_rankings_job(job):
+    """Recompute every rank, sharing the run with concurrent manual refreshes"""
+    changed_user_ids, shared = run_exclusive('update_rankings', recompute_rankings)
+    return {
+        'updated_users': len(changed_user_ids) if changed_user_ids is not None else None,
+        'shared': shared
+    }
+
+
+@job_handler('rebuild_stats')
+def rebuild_stats_job(job):
+    """Create missing stats rows for marketers and recount every like"""
+    missing = User.objects.filter(is_marketer=True, stats__isnull=True)
+    with transaction.atomic():
+        UserStats.objects.bulk_create([
+            UserStats(user=user, **UserStats.listing_fields(user)) for user in missing
+        ], ignore_conflicts=True, batch_size=500)
+        
+        # Un único UPDATE con subconsultas en lugar de un recuento por usuario
+        updated = UserStats.refresh_counts(UserStats.objects.filter(user__is_marketer=True))
+    report_progress(job, 70, f'{updated} estadísticas recalculadas')
+    
+    recompute_rankings()
+    invalidate_all_user_payloads()
+    return {'updated_stats': updated}
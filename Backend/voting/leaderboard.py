@@ -0,0 +1,199 @@
+"""
+Process-local sorted leaderboard with O(log N) top-N and rank lookups
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import UserStats
+from .singleflight import single_flight
+from .tags import RANKING_TAG, bump_tags, get_tag_version, tagged_key
+
+
+LIKES_HISTOGRAM_CACHE_TIMEOUT = getattr(settings, 'LIKES_HISTOGRAM_CACHE_TIMEOUT', 300)
+RANKINGS_UPDATE_COOLDOWN = getattr(settings, 'RANKINGS_UPDATE_COOLDOWN', 30)
+
+
+def _key(user_id, likes_received, sort_name):
+    # Mismo orden que el ranking: más likes primero, después por nombre
+    return (-likes_received, sort_name, user_id)
+
+
+class Leaderboard:
+    """Bisect-maintained arrays of UserStats keyed by (-likes_received, sort_name, user_id)"""
+    
+    def __init__(self, refresh_interval=None):
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None
+            else getattr(settings, 'LEADERBOARD_REFRESH_INTERVAL', 2.0)
+        )
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._version = None
+        self._checked_at = 0.0
+        self._reset()
+    
+    def _reset(self):
+        """Clear the in-memory structure"""
+        # Todas las filas: el ranking numérico cuenta también a los no listados
+        self._all = []
+        # Solo los marketeros listados: lo que se muestra en el ranking
+        self._listed = []
+        # user_id -> (clave, listado)
+        self._entries = {}
+    
+    def _insert(self, user_id, likes_received, sort_name, is_listed):
+        key = _key(user_id, likes_received, sort_name)
+        insort(self._all, key)
+        if is_listed:
+            insort(self._listed, key)
+        self._entries[user_id] = (key, is_listed)
+    
+    def _remove(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        key, is_listed = entry
+        del self._all[bisect_left(self._all, key)]
+        if is_listed:
+            del self._listed[bisect_left(self._listed, key)]
+    
+    @staticmethod
+    def _read_version():
+        """Shared version of the ranking tag, bumped by every process that changes it"""
+        return get_tag_version(RANKING_TAG)
+    
+    def rebuild(self):
+        """Load the leaderboard from a single scan of UserStats"""
+        with self._lock:
+            version = self._read_version()
+            self._reset()
+            rows = UserStats.objects.order_by().values_list(
+                'user_id', 'likes_received', 'sort_name', 'is_listed'
+            )
+            for user_id, likes_received, sort_name, is_listed in rows.iterator():
+                key = _key(user_id, likes_received, sort_name)
+                self._all.append(key)
+                if is_listed:
+                    self._listed.append(key)
+                self._entries[user_id] = (key, is_listed)
+            self._all.sort()
+            self._listed.sort()
+            self._version = version
+            self._checked_at = time.monotonic()
+            self._loaded = True
+    
+    def ensure_fresh(self, force=False):
+        """Rebuild the leaderboard if another worker published a change"""
+        now = time.monotonic()
+        if not force and self._loaded and now - self._checked_at < self.refresh_interval:
+            return
+        
+        with self._lock:
+            if not self._loaded or self._read_version() != self._version:
+                self.rebuild()
+            else:
+                self._checked_at = now
+    
+    def invalidate(self):
+        """Force a full rebuild here and in every other worker"""
+        with self._lock:
+            self._loaded = False
+        bump_tags(RANKING_TAG)
+    
+    def invalidate_on_commit(self):
+        """Invalidate once the surrounding transaction commits"""
+        transaction.on_commit(self.invalidate)
+    
+    def apply_changes(self, rows, version):
+        """Apply (user_id, likes_received, sort_name, is_listed) rows published as version"""
+        with self._lock:
+            # Si otro proceso publicó entre medias, la siguiente verificación reconstruye
+            if not self._loaded or version != self._version + 1:
+                return
+            for user_id, likes_received, sort_name, is_listed in rows:
+                self._remove(user_id)
+                self._insert(user_id, likes_received, sort_name, is_listed)
+            self._version = version
+    
+    def apply_on_commit(self, rows):
+        """Publish stats rows with the transaction and apply them here once it commits"""
+        rows = list(rows)
+        bump_tags(RANKING_TAG)
+        version = get_tag_version(RANKING_TAG)
+        transaction.on_commit(lambda: self.apply_changes(rows, version))
+    
+    def _rank(self, likes_received):
+        # Ranking de competición: 1 + usuarios con más likes (como update_all_rankings)
+        return bisect_left(self._all, (-likes_received,)) + 1 if likes_received > 0 else None
+    
+    def total_ranked(self, force=False):
+        """Number of listed marketers with at least one like"""
+        self.ensure_fresh(force)
+        return bisect_left(self._listed, (0,))
+    
+    def top(self, limit, force=False):
+        """(user_id, likes_received, rank) of the first listed marketers with likes"""
+        self.ensure_fresh(force)
+        with self._lock:
+            keys = self._listed[:min(limit, bisect_left(self._listed, (0,)))]
+            return [(user_id, -neg_likes, self._rank(-neg_likes)) for neg_likes, _, user_id in keys]
+    
+    def rank_of(self, user_id, force=False):
+        """Current rank of a user, or None without likes"""
+        self.ensure_fresh(force)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            return self._rank(-entry[0][0])
+
+
+leaderboard = Leaderboard()
+
+
+def recompute_rankings():
+    """Recompute every stored rank and rebuild the leaderboard in every worker"""
+    changed_user_ids = UserStats.update_all_rankings()
+    leaderboard.invalidate()
+    return changed_user_ids
+
+
+def _build_likes_histogram(key):
+    values, cumulative, total = [], [], 0
+    for likes_received, count in UserStats.objects.filter(is_listed=True).values(
+        'likes_received'
+    ).annotate(total=Count('id')).order_by('likes_received').values_list('likes_received', 'total'):
+        total += count
+        values.append(likes_received)
+        cumulative.append(total)
+    histogram = (values, cumulative)
+    cache.set(key, histogram, LIKES_HISTOGRAM_CACHE_TIMEOUT)
+    return histogram
+
+
+def get_likes_histogram():
+    """Listed marketers per likes_received value as (values, cumulative counts)"""
+    # La clave sigue la etiqueta del ranking: cualquier cambio la renueva
+    key = tagged_key('voting:leaderboard:histogram', [RANKING_TAG])
+    histogram = cache.get(key)
+    if histogram is None:
+        # Con la caché fría, las peticiones simultáneas comparten un único cálculo
+        histogram, _ = single_flight.do(key, lambda: _build_likes_histogram(key))
+    return histogram
+
+
+def likes_percentile(likes_received):
+    """Percentage of listed marketers with fewer likes, and the number of listed marketers"""
+    values, cumulative = get_likes_histogram()
+    total = cumulative[-1] if cumulative else 0
+    if not total:
+        return 0.0, 0
+    bucket = bisect_left(values, likes_received)
+    below = cumulative[bucket - 1] if bucket else 0
+    return round(100 * below / total, 1), total
@@ -0,0 +1,55 @@
+"""
+Cached projection of the likes given and received by a user
+"""
+from django.core.cache import cache
+
+from .cache import like_edges_cache_key, LIKE_EDGES_CACHE_TIMEOUT
+from .models import Like, User
+
+
+def _edges(queryset, user_field):
+    """Edges of a likes queryset with the other user's summary, newest first"""
+    avatar_storage = User._meta.get_field('avatar').storage
+    rows = queryset.order_by('-created_at').values_list(
+        'id', 'created_at', user_field, f'{user_field}__first_name',
+        f'{user_field}__last_name', f'{user_field}__email', f'{user_field}__avatar'
+    )
+    return [{
+        'like_id': like_id,
+        'created_at': created_at,
+        'user': {
+            'id': user_id,
+            'name': f'{first_name} {last_name}',
+            'email': email,
+            # URL del avatar calculada una vez al construir la proyección
+            'avatar': avatar_storage.url(avatar) if avatar else None
+        }
+    } for like_id, created_at, user_id, first_name, last_name, email, avatar in rows]
+
+
+def edge_summary(edge):
+    """Minimal representation of the other user of an edge"""
+    user = edge['user']
+    return {'id': user['id'], 'name': user['name'], 'avatar': user['avatar']}
+
+
+def build_like_edges(user_id):
+    """Current round likes of a user from two indexed queries"""
+    given = _edges(Like.objects.current().filter(giver_id=user_id), 'target')
+    received = _edges(Like.objects.current().filter(target_id=user_id), 'giver')
+    return {
+        'given': given,
+        'received': received,
+        'given_count': len(given),
+        'received_count': len(received)
+    }
+
+
+def get_like_edges(user_id):
+    """Return the cached like edges of a user, building them on a miss"""
+    key = like_edges_cache_key(user_id)
+    edges = cache.get(key)
+    if edges is None:
+        edges = build_like_edges(user_id)
+        cache.set(key, edges, LIKE_EDGES_CACHE_TIMEOUT)
+    return edges
@@ -0,0 +1,214 @@
+"""
+Process-local like graph with O(1) has_liked and count lookups
+"""
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import Like, MAX_LIKES_PER_USER
+
+
+# Valor que marca un hueco libre en la lista de likes dados
+EMPTY = 0
+
+
+class Adjacency:
+    """Array-backed adjacency of likes: givers -> targets and received counts"""
+
+    def __init__(self):
+        # user_id -> posición en los arrays
+        self.slots = {}
+        # MAX_LIKES_PER_USER ids de destino por posición (EMPTY = libre)
+        self.targets = array('q')
+        self.given = array('H')
+        self.received = array('L')
+
+    def slot(self, user_id):
+        """Return the slot of a user, allocating one if needed"""
+        slot = self.slots.get(user_id)
+        if slot is None:
+            slot = len(self.slots)
+            # Los arrays crecen antes de publicar la posición
+            self.targets.extend([EMPTY] * MAX_LIKES_PER_USER)
+            self.given.append(0)
+            self.received.append(0)
+            self.slots[user_id] = slot
+        return slot
+
+    def add(self, giver_id, target_id):
+        """Add an edge, returning False if the giver has no free slot left"""
+        giver_slot = self.slot(giver_id)
+        start = giver_slot * MAX_LIKES_PER_USER
+        for index in range(start, start + MAX_LIKES_PER_USER):
+            if self.targets[index] == target_id:
+                return True
+        for index in range(start, start + MAX_LIKES_PER_USER):
+            if self.targets[index] == EMPTY:
+                self.targets[index] = target_id
+                self.given[giver_slot] += 1
+                self.received[self.slot(target_id)] += 1
+                return True
+        return False
+
+    def remove(self, giver_id, target_id):
+        giver_slot = self.slots.get(giver_id)
+        if giver_slot is None:
+            return
+        start = giver_slot * MAX_LIKES_PER_USER
+        for index in range(start, start + MAX_LIKES_PER_USER):
+            if self.targets[index] == target_id:
+                self.targets[index] = EMPTY
+                self.given[giver_slot] -= 1
+                self.received[self.slots[target_id]] -= 1
+                return
+
+    def liked_ids(self, giver_id):
+        slot = self.slots.get(giver_id)
+        if slot is None:
+            return []
+        start = slot * MAX_LIKES_PER_USER
+        return [
+            target_id for target_id in self.targets[start:start + MAX_LIKES_PER_USER]
+            if target_id != EMPTY
+        ]
+
+    def given_count(self, user_id):
+        slot = self.slots.get(user_id)
+        return self.given[slot] if slot is not None else 0
+
+    def received_count(self, user_id):
+        slot = self.slots.get(user_id)
+        return self.received[slot] if slot is not None else 0
+
+
+class LikeGraph:
+    """Like adjacency of the current round, kept in step with the likes table"""
+
+    def __init__(self, refresh_interval=None):
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None
+            else getattr(settings, 'LIKE_GRAPH_REFRESH_INTERVAL', 2.0)
+        )
+        # Protege el grafo publicado: lecturas y cambios locales
+        self._lock = threading.RLock()
+        # Serializa las reconstrucciones, que leen la BD sin bloquear a los lectores
+        self._rebuild_lock = threading.RLock()
+        self._graph = Adjacency()
+        self._loaded = False
+        self._fingerprint = None
+        self._checked_at = 0.0
+        # Cambios locales aplicados mientras se reconstruye (None = sin reconstrucción)
+        self._pending = None
+
+    @staticmethod
+    def _read_fingerprint():
+        """Cheap version of the current round likes: row count and sum of ids"""
+        # Ambos se pueden actualizar con los cambios locales, a diferencia del mayor id
+        result = Like.objects.current().aggregate(total=Count('id'), id_sum=Sum('id'))
+        return result['total'], result['id_sum'] or 0
+
+    def rebuild(self):
+        """Load the graph from a single scan of the current round likes"""
+        with self._rebuild_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                fingerprint = self._read_fingerprint()
+                graph = Adjacency()
+                for giver_id, target_id in Like.objects.current().values_list('giver_id', 'target_id'):
+                    if not graph.add(giver_id, target_id):
+                        # Sin huecos libres: el grafo no refleja la base de datos
+                        fingerprint = None
+            finally:
+                with self._lock:
+                    pending, self._pending = self._pending, None
+
+            with self._lock:
+                # Los cambios confirmados durante la carga quizá no estén en ella: se
+                # reaplican y la huella leída antes de la carga fuerza otra verificación
+                for added, removed in pending:
+                    for _, giver_id, target_id in removed:
+                        graph.remove(giver_id, target_id)
+                    for _, giver_id, target_id in added:
+                        graph.add(giver_id, target_id)
+                self._graph = graph
+                self._fingerprint = fingerprint
+                self._checked_at = time.monotonic()
+                self._loaded = True
+
+    def ensure_fresh(self, force=False):
+        """Rebuild the graph if the likes table changed in another worker"""
+        now = time.monotonic()
+        if not force and self._loaded and now - self._checked_at < self.refresh_interval:
+            return
+
+        with self._rebuild_lock:
+            if not self._loaded or self._read_fingerprint() != self._fingerprint:
+                self.rebuild()
+            else:
+                self._checked_at = now
+
+    def invalidate(self):
+        """Force a full rebuild on the next read"""
+        with self._lock:
+            self._loaded = False
+
+    def apply_changes(self, added=(), removed=()):
+        """Apply (like_id, giver_id, target_id) changes made by this process"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((added, removed))
+            if not self._loaded:
+                return
+            for _, giver_id, target_id in removed:
+                self._graph.remove(giver_id, target_id)
+            overflow = False
+            for _, giver_id, target_id in added:
+                overflow |= not self._graph.add(giver_id, target_id)
+
+            # La huella sigue a los cambios locales: solo los de otros procesos
+            # hacen que la siguiente verificación reconstruya el grafo
+            like_ids = [like_id for like_id, _, _ in (*added, *removed)]
+            if overflow or self._fingerprint is None or None in like_ids:
+                self._fingerprint = None
+                return
+            total, id_sum = self._fingerprint
+            self._fingerprint = (
+                total + len(added) - len(removed),
+                id_sum + sum(like_id for like_id, _, _ in added)
+                - sum(like_id for like_id, _, _ in removed)
+            )
+
+    def apply_on_commit(self, added=(), removed=()):
+        """Apply like changes once the surrounding transaction commits"""
+        added, removed = list(added), list(removed)
+        transaction.on_commit(lambda: self.apply_changes(added, removed))
+
+    def has_liked(self, giver_id, target_id, force=False):
+        """Whether giver_id has liked target_id"""
+        return target_id in self.liked_ids(giver_id, force)
+
+    def liked_ids(self, giver_id, force=False):
+        """Ids of the users liked by giver_id"""
+        self.ensure_fresh(force)
+        with self._lock:
+            return self._graph.liked_ids(giver_id)
+
+    def given_count(self, user_id, force=False):
+        """Number of likes given by user_id"""
+        self.ensure_fresh(force)
+        with self._lock:
+            return self._graph.given_count(user_id)
+
+    def received_count(self, user_id, force=False):
+        """Number of likes received by user_id"""
+        self.ensure_fresh(force)
+        with self._lock:
+            return self._graph.received_count(user_id)
+
+
+like_graph = LikeGraph()
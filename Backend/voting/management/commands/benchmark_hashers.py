@@ -0,0 +1,72 @@
+"""
+Management command to benchmark password hashers in logins per second
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher, check_password, get_hashers
+)
+from django.core.management.base import BaseCommand
+
+from voting.hashers import PASSWORD_HASH_WORKERS, TunedArgon2PasswordHasher, TunedScryptPasswordHasher
+
+
+class Command(BaseCommand):
+    help = 'Measure password verifications per second per core and with concurrent logins'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--logins',
+            type=int,
+            default=20,
+            help='Verifications per hasher (default: 20)'
+        )
+        
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=PASSWORD_HASH_WORKERS,
+            help=f'Threads for the concurrent measurement (default: {PASSWORD_HASH_WORKERS})'
+        )
+    
+    def handle(self, *args, **options):
+        password = 'Marketeros-benchmark-2024!'
+        logins = options['logins']
+        workers = options['workers']
+        
+        candidates = [PBKDF2PasswordHasher(), TunedScryptPasswordHasher(), TunedArgon2PasswordHasher()]
+        preferred = get_hashers()[0]
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'🔐 Hasher configurado: {type(preferred).__name__}')
+        )
+        self.stdout.write(
+            f'\n{"hasher":<28} {"verificar":>10} {"login/s/núcleo":>15} {f"login/s ({workers} hilos)":>20}'
+        )
+        self.stdout.write('=' * 76)
+        
+        for hasher in candidates:
+            try:
+                encoded = hasher.encode(password, hasher.salt())
+            except ValueError as e:
+                # Argon2 sin argon2-cffi instalado
+                self.stdout.write(self.style.WARNING(f'{type(hasher).__name__:<28} no disponible: {e}'))
+                continue
+            
+            verify = lambda: check_password(password, encoded)
+            
+            start = time.perf_counter()
+            for _ in range(logins):
+                verify()
+            per_login = (time.perf_counter() - start) / logins
+            
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                start = time.perf_counter()
+                list(executor.map(lambda _: verify(), range(logins)))
+                pooled = logins / (time.perf_counter() - start)
+            
+            self.stdout.write(
+                f'{type(hasher).__name__:<28} {per_login * 1000:>8.1f}ms '
+                f'{1 / per_login:>15.1f} {pooled:>20.1f}'
+            )
@@ -0,0 +1,104 @@
+"""
+Management command to benchmark serialization of large marketer lists
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from voting.models import User, UserStats
+from voting.renderers import FastJSONRenderer, orjson
+from voting.serializers import UserProfileSerializer, RankingSerializer
+
+
+SLIM_PROFILE_FIELDS = ['id', 'first_name', 'last_name', 'avatar', 'likes_received', 'rank']
+SLIM_RANKING_FIELDS = ['user_id', 'full_name', 'likes_count', 'rank']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark JSON rendering and sparse fieldsets on a large in-memory user list'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10000,
+            help='Number of in-memory users to serialize (default: 10000)'
+        )
+        
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Repetitions per variant, the best time is reported (default: 3)'
+        )
+    
+    def handle(self, *args, **options):
+        users = self.build_users(options['users'])
+        stats = [user.stats for user in users]
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'📦 Serializando {len(users)} usuarios en memoria')
+        )
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('⚠️  orjson no está instalado: FastJSONRenderer usa el renderer estándar'))
+        
+        variants = [
+            ('perfil completo', lambda: UserProfileSerializer(users, many=True).data),
+            ('perfil ?fields=', lambda: UserProfileSerializer(
+                users, many=True, fields=SLIM_PROFILE_FIELDS
+            ).data),
+            ('ranking completo', lambda: RankingSerializer(stats, many=True).data),
+            ('ranking ?fields=', lambda: RankingSerializer(
+                stats, many=True, fields=SLIM_RANKING_FIELDS
+            ).data),
+        ]
+        renderers = [('json', JSONRenderer()), ('fast', FastJSONRenderer())]
+        
+        self.stdout.write(
+            f'\n{"variante":<18} {"serializar":>11} {"renderer":>9} {"render":>10} {"bytes":>11}'
+        )
+        self.stdout.write('=' * 63)
+        
+        for label, serialize in variants:
+            serialize_time, data = self.measure(serialize, options['repeat'])
+            for renderer_name, renderer in renderers:
+                render_time, content = self.measure(
+                    lambda: renderer.render(data), options['repeat']
+                )
+                self.stdout.write(
+                    f'{label:<18} {serialize_time * 1000:>9.1f}ms {renderer_name:>9} '
+                    f'{render_time * 1000:>8.1f}ms {len(content):>11,}'
+                )
+    
+    def build_users(self, count):
+        """Build unsaved users with attached stats, no database writes"""
+        now = timezone.now()
+        bio = 'Especialista en marketing digital, branding y estrategia de contenidos. ' * 3
+        users = []
+        for index in range(1, count + 1):
+            user = User(
+                id=index,
+                email=f'marketero{index}@marketeros.com',
+                first_name=f'Nombre{index}',
+                last_name=f'Apellido{index}',
+                bio=bio,
+                avatar=f'avatars/{index}_a1b2c3d4.jpg',
+                created_at=now
+            )
+            # Asignar stats también llena la caché inversa user.stats
+            UserStats(user=user, likes_received=index % 50, likes_given=index % 6, rank=index)
+            users.append(user)
+        return users
+    
+    def measure(self, func, repeat):
+        """Return the best wall time and the last result of func"""
+        best = None
+        result = None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
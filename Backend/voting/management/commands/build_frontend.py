@@ -0,0 +1,138 @@
+"""
+Management command to fingerprint and precompress the frontend assets
+"""
+import gzip
+import hashlib
+import json
+import re
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+ASSET_DIRS = ('css', 'javascript')
+HTML_DIR = 'html'
+TEXT_EXTENSIONS = ('.css', '.js', '.html')
+
+re_asset_reference = re.compile(r'(?P<attr>href|src)="(?P<path>[^"]+\.(?:css|js))"')
+
+
+class Command(BaseCommand):
+    help = 'Fingerprint and precompress Frontend css, javascript and html assets'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            type=str,
+            default=str(settings.FRONTEND_DIR),
+            help='Frontend source directory'
+        )
+        
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=str(settings.FRONTEND_BUILD_DIR),
+            help='Output directory for the built assets'
+        )
+    
+    def handle(self, *args, **options):
+        source = Path(options['source'])
+        output = Path(options['output'])
+        
+        if not source.is_dir():
+            raise CommandError(f'No existe el directorio del frontend: {source}')
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'🏗️  Construyendo frontend desde {source}...')
+        )
+        
+        if output.exists():
+            shutil.rmtree(output)
+        output.mkdir(parents=True)
+        
+        manifest = self.build_assets(source, output)
+        written = list(manifest.values())
+        written += self.build_html(source, output, manifest)
+        
+        (output / 'manifest.json').write_text(
+            json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8'
+        )
+        
+        self.precompress(output, written)
+        
+        if brotli is None:
+            self.stdout.write(
+                self.style.WARNING('⚠️  brotli no está instalado: solo se generan archivos .gz')
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Frontend construido en {output}')
+        )
+    
+    def build_assets(self, source, output):
+        """Copy css/js assets with a content hash in their name"""
+        manifest = {}
+        for directory in ASSET_DIRS:
+            for path in sorted((source / directory).glob('*')):
+                if not path.is_file():
+                    continue
+                
+                content = path.read_bytes()
+                digest = hashlib.md5(content).hexdigest()[:12]
+                name = f'{path.stem}.{digest}{path.suffix}'
+                
+                (output / directory).mkdir(exist_ok=True)
+                (output / directory / name).write_bytes(content)
+                manifest[f'{directory}/{path.name}'] = f'{directory}/{name}'
+        return manifest
+    
+    def build_html(self, source, output, manifest):
+        """Copy html pages pointing their css/js references to the fingerprinted files"""
+        # Las páginas referencian los recursos por nombre de archivo
+        by_name = {Path(original).name: built for original, built in manifest.items()}
+        
+        def replace(match):
+            built = by_name.get(Path(match.group('path')).name)
+            if built is None:
+                return match.group(0)
+            return f'{match.group("attr")}="../{built}"'
+        
+        written = []
+        (output / HTML_DIR).mkdir(exist_ok=True)
+        for path in sorted((source / HTML_DIR).glob('*.html')):
+            html = re_asset_reference.sub(replace, path.read_text(encoding='utf-8'))
+            (output / HTML_DIR / path.name).write_text(html, encoding='utf-8')
+            written.append(f'{HTML_DIR}/{path.name}')
+        return written
+    
+    def precompress(self, output, files):
+        """Write .gz and .br siblings for every text asset"""
+        totals = {'original': 0, 'gzip': 0, 'br': 0}
+        for relative in files:
+            path = output / relative
+            if path.suffix not in TEXT_EXTENSIONS:
+                continue
+            
+            content = path.read_bytes()
+            totals['original'] += len(content)
+            
+            # mtime=0 para que el resultado sea reproducible
+            gzipped = gzip.compress(content, compresslevel=9, mtime=0)
+            path.with_name(path.name + '.gz').write_bytes(gzipped)
+            totals['gzip'] += len(gzipped)
+            
+            if brotli is not None:
+                compressed = brotli.compress(content, mode=brotli.MODE_TEXT, quality=11)
+                path.with_name(path.name + '.br').write_bytes(compressed)
+                totals['br'] += len(compressed)
+        
+        self.stdout.write(f'   📄 Original: {totals["original"]:,} bytes')
+        self.stdout.write(f'   🗜️  Gzip: {totals["gzip"]:,} bytes')
+        if brotli is not None:
+            self.stdout.write(f'   🗜️  Brotli: {totals["br"]:,} bytes')
@@ -0,0 +1,102 @@
+"""
+Management command to EXPLAIN the hot querysets of the API and flag full scans
+"""
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from voting.models import Invitation, Like, LikeEvent, RankHistory, User, UserStats, VotingRound
+
+
+# Patrones de los planes que indican recorrer una tabla completa u ordenar en memoria
+FULL_SCAN_PATTERNS = {
+    'sqlite': [re.compile(r'\bSCAN (?!.*USING (COVERING )?INDEX)'), re.compile(r'USE TEMP B-TREE')],
+    'postgresql': [re.compile(r'Seq Scan'), re.compile(r'\bSort\b')],
+    'mysql': [re.compile(r'type: ALL|\bALL\b'), re.compile(r'Using filesort')],
+}
+
+
+def hot_querysets(user_id):
+    """Querysets run on every request of the busiest endpoints"""
+    since = timezone.now() - timedelta(days=30)
+    listed = Q(is_marketer=True, registration_completed=True)
+    
+    return [
+        ('marketers_list', User.objects.filter(listed).select_related('stats').order_by(
+            '-stats__likes_received', 'first_name'
+        )),
+        ('search_marketers', User.objects.filter(
+            Q(first_name__icontains='ma') | Q(last_name__icontains='ma'), listed
+        ).select_related('stats').order_by('-stats__likes_received', 'first_name')[:20]),
+        ('ranking', UserStats.objects.filter(
+            is_listed=True, likes_received__gt=0
+        ).order_by('-likes_received', 'sort_name')[:50]),
+        ('ranking_around_me_ties', UserStats.objects.filter(
+            is_listed=True, likes_received=3, sort_name__gt='m'
+        ).order_by('sort_name', 'user_id')[:5]),
+        ('ranking_around_me_below', UserStats.objects.filter(
+            is_listed=True, likes_received__lt=3
+        ).order_by('-likes_received', 'sort_name', 'user_id')[:5]),
+        ('likes_histogram', UserStats.objects.filter(is_listed=True).values(
+            'likes_received'
+        ).annotate(total=Count('id')).order_by('likes_received')),
+        ('like_edges_given', Like.objects.current().filter(giver_id=user_id).order_by('-created_at')),
+        ('like_edges_received', Like.objects.current().filter(target_id=user_id).order_by('-created_at')),
+        ('like_graph_rebuild', Like.objects.current().values_list('giver_id', 'target_id')),
+        ('user_stats', UserStats.objects.filter(user_id=user_id)),
+        ('rank_history', RankHistory.objects.filter(
+            user_id=user_id, round=VotingRound.active_id(), recorded_at__gte=since
+        ).order_by('recorded_at')),
+        ('top_movers', RankHistory.objects.filter(
+            round=VotingRound.active_id(), recorded_at__gte=since
+        ).values('user_id').annotate(climbed=Sum('delta')).order_by('-climbed')[:10]),
+        ('like_events_stream', LikeEvent.objects.filter(id__gt=0).order_by('id')[:1000]),
+        ('invitation_lookup', Invitation.objects.filter(code='XXXXXXXXXXXX')),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the hot querysets of voting/views.py and flag full scans'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Mostrar el plan completo de todas las consultas'
+        )
+    
+    def handle(self, *args, **options):
+        user_id = User.objects.values_list('id', flat=True).first() or 0
+        patterns = FULL_SCAN_PATTERNS.get(connection.vendor, [])
+        flagged = 0
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'🔎 EXPLAIN de consultas frecuentes ({connection.vendor})')
+        )
+        
+        for label, queryset in hot_querysets(user_id):
+            plan = queryset.explain()
+            problems = [
+                line.strip() for line in plan.splitlines()
+                if any(pattern.search(line) for pattern in patterns)
+            ]
+            
+            if problems:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f'\n⚠️  {label}'))
+                for line in problems:
+                    self.stdout.write(f'    {line}')
+            else:
+                self.stdout.write(f'\n✅ {label}')
+            
+            if options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f'      {line}')
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'\n{flagged} de {len(hot_querysets(user_id))} consultas con recorrido completo u ordenación')
+        )
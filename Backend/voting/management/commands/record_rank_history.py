@@ -0,0 +1,39 @@
+"""
+Management command to snapshot rank changes into the rank history
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from voting.models import RankHistory, UserStats, VotingRound
+
+
+class Command(BaseCommand):
+    help = 'Record rank changes not yet in the history (run it from cron)'
+    
+    def handle(self, *args, **options):
+        current_round = VotingRound.get_current()
+        last_rank = RankHistory.objects.filter(
+            user=OuterRef('user_id'),
+            round=current_round
+        ).order_by('-recorded_at', '-id').values('rank')[:1]
+        
+        rows = list(UserStats.objects.annotate(
+            last_recorded_rank=Subquery(last_rank),
+            has_history=Subquery(
+                RankHistory.objects.filter(
+                    user=OuterRef('user_id'), round=current_round
+                ).values('id')[:1]
+            )
+        ).values_list('user_id', 'rank', 'last_recorded_rank', 'has_history'))
+        
+        # Sin historial previo en la ronda se parte de "sin ranking"
+        changes = [
+            (user_id, last_recorded_rank, rank)
+            for user_id, rank, last_recorded_rank, has_history in rows
+            if rank != last_recorded_rank and (has_history or rank is not None)
+        ]
+        RankHistory.record(changes, unranked_position=len(rows) + 1)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'📈 {len(changes)} cambios de ranking registrados')
+        )
@@ -0,0 +1,56 @@
+"""
+Management command to rebuild projections from the like event log
+"""
+from django.core.management.base import BaseCommand
+
+from voting.projections import (
+    PROJECTION_BATCH_SIZE, replay_activity, replay_user_stats
+)
+
+
+class Command(BaseCommand):
+    help = 'Replay like events into UserStats, rankings and the activity feed'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--projection',
+            choices=['all', 'user_stats', 'activity'],
+            default='all',
+            help='Proyección a actualizar'
+        )
+        parser.add_argument(
+            '--from-position',
+            type=int,
+            default=None,
+            help='Reproducir desde este id de evento en lugar del checkpoint'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Reconstruir desde el inicio del log'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=PROJECTION_BATCH_SIZE,
+            help='Eventos leídos por lote'
+        )
+    
+    def handle(self, *args, **options):
+        projection = options['projection']
+        
+        if projection in ('all', 'user_stats'):
+            applied = replay_user_stats(
+                from_position=options['from_position'],
+                rebuild=options['rebuild'],
+                batch_size=options['batch_size']
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f'📊 Estadísticas: {applied} eventos aplicados')
+            )
+        
+        if projection in ('all', 'activity'):
+            state = replay_activity(rebuild=options['rebuild'])
+            self.stdout.write(
+                self.style.SUCCESS(f'🕒 Actividad: {len(state["items"])} likes recientes')
+            )
@@ -0,0 +1,81 @@
+"""
+Management command to run the background jobs queued in the database
+"""
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from voting.jobs import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (resets, bulk invitations, rank and stats rebuilds)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=2,
+            help='Tareas ejecutadas a la vez (default: 2)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Segundos de espera cuando no hay tareas (default: 1)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Vaciar la cola y terminar'
+        )
+    
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        threads = max(1, options['threads'])
+        
+        # SIGTERM/SIGINT: terminar las tareas en curso y salir
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.stop.set())
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'⚙️  Worker {worker_id} con {threads} hilos')
+        )
+        
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='job-worker') as executor:
+            loops = [
+                executor.submit(self.work, f'{worker_id}:{index}', options['poll_interval'], options['once'])
+                for index in range(threads)
+            ]
+            processed = sum(loop.result() for loop in loops)
+        
+        self.stdout.write(self.style.SUCCESS(f'✅ {processed} tareas procesadas'))
+    
+    def work(self, worker_id, poll_interval, once):
+        """Claim and run jobs until stopped (or the queue is empty with --once)"""
+        processed = 0
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                job = claim_job(worker_id)
+                if job is None:
+                    if once:
+                        break
+                    self.stop.wait(poll_interval)
+                    continue
+                
+                self.stdout.write(f'▶️  Job {job.id} {job.kind} (intento {job.attempts})')
+                if run_job(job):
+                    self.stdout.write(self.style.SUCCESS(f'✅ Job {job.id} completado'))
+                else:
+                    self.stdout.write(self.style.WARNING(f'⚠️  Job {job.id} falló'))
+                processed += 1
+        finally:
+            connection.close()
+        return processed
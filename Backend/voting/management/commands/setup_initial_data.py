@@ -8,7 +8,8 @@ from datetime import timedelta
 import secrets
 import string
 
-from voting.models import Invitation, UserStats
+from voting.jobs import enqueue
+from voting.models import Invitation
 
 User = get_user_model()
 
@@ -183,22 +184,16 @@ class Command(BaseCommand):
         return str(uuid.uuid4()).upper()[:12]
     
     def update_stats(self):
-        """Update or create user statistics"""
-        self.stdout.write('📊 Actualizando estadísticas de usuarios...')
+        """Queue the rebuild of user statistics and rankings"""
+        self.stdout.write('📊 Encolando la actualización de estadísticas de usuarios...')
         
-        users = User.objects.filter(is_marketer=True)
-        stats_count = 0
-        
-        for user in users:
-            UserStats.update_user_stats(user)
-            stats_count += 1
-        
-        # Actualizar rankings solo si hay usuarios
-        if stats_count > 0:
-            UserStats.update_all_rankings()
+        # Un único recuento por UPDATE en el worker, en lugar de uno por usuario aquí
+        job = enqueue('rebuild_stats')
         
         self.stdout.write(
-            self.style.SUCCESS(f'✅ Estadísticas actualizadas para {stats_count} usuarios')
+            self.style.SUCCESS(
+                f'✅ Job {job.id} en cola: ejecuta `python manage.py run_worker --once` para procesarlo'
+            )
         )
     
     def show_summary(self):
@@ -0,0 +1,86 @@
+"""
+Middleware for the voting API
+"""
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+from .tags import tag_version_memo
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+re_accepts_gzip = re.compile(r'\bgzip\b')
+re_accepts_br = re.compile(r'\bbr\b')
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress API responses above a size threshold with brotli or gzip"""
+    
+    # Bytes aleatorios añadidos al gzip como mitigación de BREACH
+    max_random_bytes = 100
+    
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.content_types = tuple(getattr(
+            settings, 'COMPRESSION_CONTENT_TYPES', ('application/json',)
+        ))
+    
+    def process_response(self, request, response):
+        # Las respuestas en streaming o ya codificadas se dejan intactas
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if content_type not in self.content_types:
+            return response
+        
+        # No vale la pena comprimir respuestas pequeñas
+        if len(response.content) < self.min_size:
+            return response
+        
+        patch_vary_headers(response, ('Accept-Encoding',))
+        
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re_accepts_br.search(accept_encoding):
+            encoding = 'br'
+            compressed = brotli.compress(response.content, mode=brotli.MODE_TEXT, quality=5)
+        elif re_accepts_gzip.search(accept_encoding):
+            encoding = 'gzip'
+            compressed = compress_string(
+                response.content, max_random_bytes=self.max_random_bytes
+            )
+        else:
+            return response
+        
+        # Devolver el contenido comprimido solo si realmente es más pequeño
+        if len(compressed) >= len(response.content):
+            return response
+        
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        
+        return response
+
+
+class CacheTagMiddleware:
+    """Memoize cache tag versions for the duration of each request"""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        with tag_version_memo():
+            return self.get_response(request)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(fields=['-likes_received'], name='user_stats_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(fields=['-likes_given'], name='user_stats_given_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0002_user_stats_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeReset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En curso'), ('completed', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=20)),
+                ('total_likes', models.IntegerField(default=0)),
+                ('deleted_likes', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='like_resets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Reseteo de Likes',
+                'verbose_name_plural': 'Reseteos de Likes',
+                'db_table': 'like_resets',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
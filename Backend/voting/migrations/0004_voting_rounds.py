@@ -0,0 +1,114 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_existing_likes(apps, schema_editor):
+    """Open the first round and move every existing like into it"""
+    VotingRound = apps.get_model('voting', 'VotingRound')
+    Like = apps.get_model('voting', 'Like')
+    
+    first_round = VotingRound.objects.create(name='Ronda 1', is_active=True)
+    Like.objects.filter(round__isnull=True).update(round=first_round)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0003_like_reset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('full_name', models.CharField(max_length=61)),
+                ('likes_received', models.PositiveIntegerField()),
+                ('rank', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Ranking Histórico',
+                'verbose_name_plural': 'Rankings Históricos',
+                'db_table': 'ranking_snapshots',
+                'ordering': ['round', 'position'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VotingRound',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Ronda de Votación',
+                'verbose_name_plural': 'Rondas de Votación',
+                'db_table': 'voting_rounds',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='like',
+            name='likes_giver_i_0a5134_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='like',
+            name='likes_target__b88439_idx',
+        ),
+        migrations.AddField(
+            model_name='rankingsnapshot',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='votinground',
+            name='closed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='closed_rounds', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='rankingsnapshot',
+            name='round',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ranking_snapshot', to='voting.votinground'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='like',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='like',
+            name='round',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='voting.votinground'),
+        ),
+        migrations.RunPython(assign_existing_likes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='like',
+            name='round',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='voting.votinground'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='like',
+            unique_together={('round', 'giver', 'target')},
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['round', 'giver'], name='likes_round_giver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['round', 'target'], name='likes_round_target_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='votinground',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='voting_rounds_single_active'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='rankingsnapshot',
+            unique_together={('round', 'position')},
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0004_voting_rounds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('rank', models.PositiveIntegerField(blank=True, null=True)),
+                ('delta', models.SmallIntegerField()),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='voting.votinground')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rank_history', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Historial de Ranking',
+                'verbose_name_plural': 'Historial de Rankings',
+                'db_table': 'rank_history',
+                'ordering': ['-recorded_at'],
+                'indexes': [models.Index(fields=['user', 'recorded_at'], name='rank_history_user_idx'), models.Index(fields=['round', 'recorded_at'], name='rank_history_round_idx')],
+            },
+        ),
+    ]
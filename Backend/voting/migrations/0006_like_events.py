@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_like_events(apps, schema_editor):
+    """Seed the log with one added event per existing like"""
+    Like = apps.get_model('voting', 'Like')
+    LikeEvent = apps.get_model('voting', 'LikeEvent')
+    
+    LikeEvent.objects.bulk_create([
+        LikeEvent(
+            kind='added',
+            round_id=round_id,
+            giver_id=giver_id,
+            target_id=target_id,
+            created_at=created_at
+        ) for round_id, giver_id, target_id, created_at in Like.objects.order_by(
+            'created_at', 'id'
+        ).values_list('round_id', 'giver_id', 'target_id', 'created_at').iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0005_rank_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectionCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Checkpoint de Proyección',
+                'verbose_name_plural': 'Checkpoints de Proyecciones',
+                'db_table': 'projection_checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='LikeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('added', 'Like dado'), ('removed', 'Like quitado')], max_length=10)),
+                ('giver_id', models.BigIntegerField()),
+                ('target_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='voting.votinground')),
+            ],
+            options={
+                'verbose_name': 'Evento de Like',
+                'verbose_name_plural': 'Eventos de Likes',
+                'db_table': 'like_events',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['round', 'giver_id'], name='like_events_round_giver_idx'), models.Index(fields=['round', 'target_id'], name='like_events_round_target_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_like_events, migrations.RunPython.noop),
+    ]
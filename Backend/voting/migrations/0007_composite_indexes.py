@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('voting', '0006_like_events'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['round', 'giver', '-created_at'], name='likes_round_giver_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['round', 'target', '-created_at'], name='likes_round_target_created_idx'),
+        ),
+        # Los índices nuevos se crean antes de quitar los que reemplazan
+        migrations.RemoveIndex(
+            model_name='like',
+            name='likes_round_giver_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='like',
+            name='likes_round_target_idx',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_marketer', True), ('registration_completed', True)), fields=['first_name', 'last_name'], name='users_listed_name_idx'),
+        ),
+    ]
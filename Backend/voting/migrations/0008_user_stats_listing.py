@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:14
+
+from django.db import migrations, models
+
+
+def populate_listing(apps, schema_editor):
+    """Copy the sort name and listing flags of every user into its stats"""
+    UserStats = apps.get_model('voting', 'UserStats')
+    
+    rows = []
+    for stats in UserStats.objects.select_related('user').iterator():
+        user = stats.user
+        stats.sort_name = f'{user.first_name} {user.last_name}'.lower()
+        stats.is_listed = bool(user.is_marketer and user.registration_completed)
+        rows.append(stats)
+    UserStats.objects.bulk_update(rows, ['sort_name', 'is_listed'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0007_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='userstats',
+            options={'ordering': ['-likes_received', 'sort_name'], 'verbose_name': 'Estadística de Usuario', 'verbose_name_plural': 'Estadísticas de Usuarios'},
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='is_listed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='sort_name',
+            field=models.CharField(blank=True, default='', max_length=61),
+        ),
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(condition=models.Q(('is_listed', True)), fields=['-likes_received', 'sort_name'], name='user_stats_leaderboard_idx'),
+        ),
+        migrations.RunPython(populate_listing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0008_user_stats_listing'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(condition=models.Q(('is_listed', True)), fields=['rank', 'sort_name'], name='user_stats_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0009_user_stats_rank_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheTag',
+            fields=[
+                ('tag', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Etiqueta de Caché',
+                'verbose_name_plural': 'Etiquetas de Caché',
+                'db_table': 'cache_tags',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0010_cache_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperationLock',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('owner', models.CharField(blank=True, default='', max_length=32)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Bloqueo de Operación',
+                'verbose_name_plural': 'Bloqueos de Operaciones',
+                'db_table': 'operation_locks',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0013_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rankhistory',
+            name='delta',
+            field=models.IntegerField(),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0014_rank_history_delta_integer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('key', models.CharField(max_length=150, primary_key=True, serialize=False)),
+                ('tokens', models.FloatField()),
+                ('refilled_at', models.FloatField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Bucket de Throttling',
+                'verbose_name_plural': 'Buckets de Throttling',
+                'db_table': 'throttle_buckets',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0015_throttle_buckets'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='userstats',
+            name='user_stats_rank_idx',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0016_drop_user_stats_rank_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencyrecord',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,16 +1,30 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.core.validators import MinLengthValidator
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+import threading
 import uuid
 import os
+from contextlib import contextmanager
+
+from .cache import invalidate_all_user_payloads, invalidate_user_payloads
 
 # Create your models here.
 
+# Número máximo de likes que puede dar cada usuario
+MAX_LIKES_PER_USER = 5
+
 def user_avatar_path(instance, filename):
     """Generate upload path for user avatars"""
     ext = filename.split('.')[-1]
-    filename = f'{instance.id}_{uuid.uuid4().hex[:8]}.{ext}'
+    # En el registro el avatar se guarda antes de que el usuario tenga id
+    if instance.id is None:
+        filename = f'{uuid.uuid4().hex}.{ext}'
+    else:
+        filename = f'{instance.id}_{uuid.uuid4().hex[:8]}.{ext}'
     return os.path.join('avatars', filename)
 
 
@@ -36,6 +50,14 @@ class User(AbstractUser):
         db_table = 'users'
         verbose_name = 'Usuario'
         verbose_name_plural = 'Usuarios'
+        indexes = [
+            # Índice parcial: solo los marketeros listados (registro completo)
+            models.Index(
+                fields=['first_name', 'last_name'],
+                name='users_listed_name_idx',
+                condition=models.Q(is_marketer=True, registration_completed=True)
+            ),
+        ]
     
     def __str__(self):
         return f'{self.first_name} {self.last_name} ({self.email})'
@@ -46,25 +68,29 @@ class User(AbstractUser):
     
     @property
     def likes_received_count(self):
-        return self.received_likes.count()
+        from .like_graph import like_graph
+        return like_graph.received_count(self.id)
     
     @property
     def likes_given_count(self):
-        return self.given_likes.count()
+        from .like_graph import like_graph
+        return like_graph.given_count(self.id)
     
     @property
     def remaining_likes(self):
-        return max(0, 5 - self.likes_given_count)
+        return max(0, MAX_LIKES_PER_USER - self.likes_given_count)
     
     def can_like(self, target_user):
         """Check if user can like target_user"""
+        from .like_graph import like_graph
+        
         if self == target_user:
             return False, "No puedes darte like a ti mismo"
         
         if self.remaining_likes <= 0:
             return False, "Ya has usado todos tus likes disponibles"
         
-        if self.given_likes.filter(target=target_user).exists():
+        if like_graph.has_liked(self.id, target_user.id):
             return False, "Ya has dado like a este usuario"
         
         return True, "Puede dar like"
@@ -104,6 +130,117 @@ class Invitation(models.Model):
         return True, "Código válido"
 
 
+class RoundAlreadyClosed(Exception):
+    """Raised when closing a round that another request already closed"""
+
+
+class VotingRound(models.Model):
+    """Voting cycle: likes and the like quota belong to a round"""
+    name = models.CharField(max_length=100)
+    is_active = models.BooleanField(default=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(blank=True, null=True)
+    closed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='closed_rounds'
+    )
+    
+    class Meta:
+        db_table = 'voting_rounds'
+        verbose_name = 'Ronda de Votación'
+        verbose_name_plural = 'Rondas de Votación'
+        ordering = ['-started_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['is_active'],
+                condition=models.Q(is_active=True),
+                name='voting_rounds_single_active'
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.name} ({"activa" if self.is_active else "cerrada"})'
+    
+    @classmethod
+    def active_id(cls):
+        """Subquery with the id of the active round"""
+        # Comparar round_id con el id (sin JOIN) deja usar los índices que empiezan por ronda
+        return Subquery(cls.objects.filter(is_active=True).order_by().values('id')[:1])
+    
+    @classmethod
+    def get_current(cls):
+        """Return the active round, opening the first one if needed"""
+        current = cls.objects.filter(is_active=True).first()
+        if current is None:
+            try:
+                with transaction.atomic():
+                    current = cls.objects.create(name=f'Ronda {cls.objects.count() + 1}')
+            except IntegrityError:
+                # Otro proceso la abrió al mismo tiempo
+                current = cls.objects.get(is_active=True)
+        return current
+    
+    def close(self, closed_by=None, next_name=None):
+        """Freeze the ranking of this round and open the next one"""
+        from .leaderboard import leaderboard
+        from .like_graph import like_graph
+        
+        with transaction.atomic():
+            # Releer la ronda bloqueada: dos cierres simultáneos no pueden abrir dos rondas
+            if not VotingRound.objects.select_for_update().filter(id=self.id, is_active=True).exists():
+                raise RoundAlreadyClosed(f'{self.name} ya está cerrada')
+            
+            # Recalcular por si algún cambio no pasó por los signals
+            UserStats.refresh_counts()
+            UserStats.update_all_rankings()
+            
+            ranked = UserStats.objects.select_related('user').filter(
+                is_listed=True,
+                likes_received__gt=0
+            ).order_by('-likes_received', 'sort_name')
+            RankingSnapshot.objects.bulk_create([
+                RankingSnapshot(
+                    round=self,
+                    position=position,
+                    user_id=stats.user_id,
+                    full_name=stats.user.full_name,
+                    likes_received=stats.likes_received,
+                    rank=stats.rank
+                ) for position, stats in enumerate(ranked.iterator(), start=1)
+            ], batch_size=1000)
+            
+            self.is_active = False
+            self.closed_at = timezone.now()
+            self.closed_by = closed_by
+            self.save(update_fields=['is_active', 'closed_at', 'closed_by'])
+            
+            next_round = VotingRound.objects.create(
+                name=next_name or f'Ronda {VotingRound.objects.count() + 1}'
+            )
+            
+            # La nueva ronda empieza sin likes
+            UserStats.objects.update(
+                likes_received=0,
+                likes_given=0,
+                rank=None,
+                last_updated=timezone.now()
+            )
+        
+        like_graph.invalidate()
+        leaderboard.invalidate()
+        invalidate_all_user_payloads()
+        return next_round
+
+
+class LikeQuerySet(models.QuerySet):
+    def current(self):
+        """Likes of the active round"""
+        return self.filter(round=VotingRound.active_id())
+
+
 class Like(models.Model):
     """Model for likes between users"""
     giver = models.ForeignKey(
@@ -116,16 +253,24 @@ class Like(models.Model):
         on_delete=models.CASCADE, 
         related_name='received_likes'
     )
+    round = models.ForeignKey(
+        VotingRound,
+        on_delete=models.CASCADE,
+        related_name='likes'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = LikeQuerySet.as_manager()
+    
     class Meta:
         db_table = 'likes'
         verbose_name = 'Like'
         verbose_name_plural = 'Likes'
-        unique_together = ('giver', 'target')
+        unique_together = ('round', 'giver', 'target')
         indexes = [
-            models.Index(fields=['giver']),
-            models.Index(fields=['target']),
+            # Las consultas de la ronda actual filtran por ronda y usuario y ordenan por fecha
+            models.Index(fields=['round', 'giver', '-created_at'], name='likes_round_giver_created_idx'),
+            models.Index(fields=['round', 'target', '-created_at'], name='likes_round_target_created_idx'),
             models.Index(fields=['created_at']),
         ]
     
@@ -134,20 +279,70 @@ class Like(models.Model):
     
     def clean(self):
         """Validate like constraints"""
-        if self.giver == self.target:
+        from .like_graph import like_graph
+        
+        if self.giver_id == self.target_id:
             raise ValidationError("No puedes darte like a ti mismo")
         
-        # Verificar límite de likes
-        if self.giver.likes_given_count >= 5:
+        # Verificar límite de likes (el grafo se valida contra la BD antes de escribir)
+        if like_graph.given_count(self.giver_id, force=True) >= MAX_LIKES_PER_USER:
             raise ValidationError("Ya has usado todos tus likes disponibles")
         
         # Verificar like duplicado
-        if Like.objects.filter(giver=self.giver, target=self.target).exists():
+        if like_graph.has_liked(self.giver_id, self.target_id):
             raise ValidationError("Ya has dado like a este usuario")
     
     def save(self, *args, **kwargs):
+        if self.round_id is None:
+            self.round = VotingRound.get_current()
         self.clean()
+        # El signal escribe el LikeEvent dentro de esta misma transacción
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class LikeEvent(models.Model):
+    """Append-only log of like changes, written in the same transaction as the like"""
+    KIND_ADDED = 'added'
+    KIND_REMOVED = 'removed'
+    KIND_CHOICES = (
+        (KIND_ADDED, 'Like dado'),
+        (KIND_REMOVED, 'Like quitado'),
+    )
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    round = models.ForeignKey(VotingRound, on_delete=models.CASCADE, related_name='+')
+    # Ids sin clave foránea: el log sobrevive a los usuarios borrados
+    giver_id = models.BigIntegerField()
+    target_id = models.BigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'like_events'
+        verbose_name = 'Evento de Like'
+        verbose_name_plural = 'Eventos de Likes'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['round', 'giver_id'], name='like_events_round_giver_idx'),
+            models.Index(fields=['round', 'target_id'], name='like_events_round_target_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.id} {self.kind} {self.giver_id} → {self.target_id}'
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Los eventos de likes no se pueden modificar")
         super().save(*args, **kwargs)
+    
+    @classmethod
+    def record(cls, kind, pairs, round_id):
+        """Append one event per (giver_id, target_id) pair"""
+        now = timezone.now()
+        return cls.objects.bulk_create([
+            cls(kind=kind, round_id=round_id, giver_id=giver_id, target_id=target_id, created_at=now)
+            for giver_id, target_id in pairs
+        ], batch_size=1000)
 
 
 class UserStats(models.Model):
@@ -157,37 +352,132 @@ class UserStats(models.Model):
     likes_given = models.IntegerField(default=0)
     rank = models.IntegerField(blank=True, null=True)
     last_updated = models.DateTimeField(auto_now=True)
+    # Copias del usuario para ordenar y filtrar el ranking sin JOIN a users
+    sort_name = models.CharField(max_length=61, blank=True, default='')
+    is_listed = models.BooleanField(default=False)
     
     class Meta:
         db_table = 'user_stats'
         verbose_name = 'Estadística de Usuario'
         verbose_name_plural = 'Estadísticas de Usuarios'
-        ordering = ['-likes_received', 'user__first_name']
+        ordering = ['-likes_received', 'sort_name']
+        indexes = [
+            models.Index(fields=['-likes_received'], name='user_stats_received_idx'),
+            models.Index(fields=['-likes_given'], name='user_stats_given_idx'),
+            # Índice parcial del ranking: solo los marketeros listados
+            models.Index(
+                fields=['-likes_received', 'sort_name'],
+                name='user_stats_leaderboard_idx',
+                condition=models.Q(is_listed=True)
+            ),
+        ]
     
     def __str__(self):
         return f'{self.user.full_name} - {self.likes_received} likes'
     
+    @staticmethod
+    def listing_fields(user):
+        """Denormalized user columns stored on the stats row"""
+        return {
+            'sort_name': f'{user.first_name} {user.last_name}'.lower(),
+            'is_listed': bool(user.is_marketer and user.registration_completed),
+        }
+    
+    @classmethod
+    def sync_listing(cls, user_ids):
+        """Copy the listing columns of the given users after bulk user updates"""
+        from .leaderboard import leaderboard
+        
+        rows = []
+        for user in User.objects.filter(id__in=user_ids).select_related('stats').only(
+            'id', 'first_name', 'last_name', 'is_marketer', 'registration_completed',
+            'stats__id', 'stats__sort_name', 'stats__is_listed'
+        ):
+            stats = getattr(user, 'stats', None)
+            if stats is None:
+                continue
+            for field, value in cls.listing_fields(user).items():
+                setattr(stats, field, value)
+            rows.append(stats)
+        cls.objects.bulk_update(rows, ['sort_name', 'is_listed'], batch_size=500)
+        leaderboard.invalidate_on_commit()
+        return len(rows)
+    
     @classmethod
     def update_user_stats(cls, user):
         """Update stats for a specific user"""
         stats, created = cls.objects.get_or_create(user=user)
-        stats.likes_received = user.likes_received_count
-        stats.likes_given = user.likes_given_count
+        stats.likes_received = Like.objects.current().filter(target=user).count()
+        stats.likes_given = Like.objects.current().filter(giver=user).count()
         stats.save()
         return stats
     
+    @classmethod
+    def refresh_counts(cls, queryset=None):
+        """Recount likes for the given stats rows with a single UPDATE"""
+        if queryset is None:
+            queryset = cls.objects.all()
+        
+        received = Like.objects.current().filter(target=OuterRef('user_id')).order_by().values(
+            'target'
+        ).annotate(total=Count('id')).values('total')
+        given = Like.objects.current().filter(giver=OuterRef('user_id')).order_by().values(
+            'giver'
+        ).annotate(total=Count('id')).values('total')
+        
+        return queryset.order_by().update(
+            likes_received=Coalesce(Subquery(received), 0),
+            likes_given=Coalesce(Subquery(given), 0),
+            last_updated=timezone.now()
+        )
+    
+    @classmethod
+    def shift_rankings(cls, user_id, old_likes, new_likes):
+        """Update the stored ranks after a user's likes changed, returning the affected user ids"""
+        if old_likes == new_likes:
+            return []
+        
+        # Ranking de competición: solo se mueven un puesto quienes tienen
+        # entre el valor anterior y el nuevo, sin recorrer toda la tabla
+        low, high = sorted((old_likes, new_likes))
+        step = 1 if new_likes > old_likes else -1
+        peer_ranks = []
+        if max(low, 1) < high:
+            peers = cls.objects.filter(
+                likes_received__gte=max(low, 1), likes_received__lt=high
+            ).exclude(user_id=user_id)
+            peer_ranks = list(peers.values_list('user_id', 'rank'))
+            peers.update(rank=F('rank') + step)
+        
+        # Los puestos desplazados también quedan en el historial
+        rank_changes = [
+            (peer_id, rank, rank + step) for peer_id, rank in peer_ranks if rank is not None
+        ]
+        old_rank = cls.objects.filter(user_id=user_id).values_list('rank', flat=True).first()
+        new_rank = (
+            cls.objects.filter(likes_received__gt=new_likes).count() + 1 if new_likes > 0 else None
+        )
+        if old_rank != new_rank:
+            cls.objects.filter(user_id=user_id).update(rank=new_rank)
+            rank_changes.append((user_id, old_rank, new_rank))
+        if rank_changes:
+            RankHistory.record(rank_changes, unranked_position=cls.objects.count() + 1)
+        return [user_id, *(peer_id for peer_id, _ in peer_ranks)]
+    
     @classmethod
     def update_all_rankings(cls):
         """Update rankings for all users"""
         # Obtener todos los usuarios ordenados por likes recibidos
-        users_with_likes = cls.objects.select_related('user').order_by(
-            '-likes_received', 'user__first_name'
-        )
+        users_with_likes = cls.objects.order_by(
+            '-likes_received', 'sort_name'
+        ).only('id', 'user_id', 'likes_received', 'rank')
         
         # Asignar rankings
         current_rank = 1
         previous_likes = None
         rank_counter = 0
+        changed = []
+        rank_changes = []
         
         for stats in users_with_likes:
             rank_counter += 1
@@ -196,46 +486,419 @@ class UserStats(models.Model):
             if previous_likes is not None and stats.likes_received != previous_likes:
                 current_rank = rank_counter
             
-            stats.rank = current_rank if stats.likes_received > 0 else None
-            stats.save(update_fields=['rank'])
+            # Solo escribir los rankings que cambiaron
+            new_rank = current_rank if stats.likes_received > 0 else None
+            if stats.rank != new_rank:
+                rank_changes.append((stats.user_id, stats.rank, new_rank))
+                stats.rank = new_rank
+                changed.append(stats)
             
             previous_likes = stats.likes_received
+        
+        # Una sola sentencia UPDATE por lote, sin importar cuántos cambien
+        cls.objects.bulk_update(changed, ['rank'], batch_size=500)
+        RankHistory.record(rank_changes, unranked_position=rank_counter + 1)
+        changed_user_ids = [stats.user_id for stats in changed]
+        invalidate_user_payloads(changed_user_ids)
+        return changed_user_ids
+
+
+class RankingSnapshot(models.Model):
+    """Immutable ranking row of a closed round"""
+    round = models.ForeignKey(
+        VotingRound,
+        on_delete=models.CASCADE,
+        related_name='ranking_snapshot'
+    )
+    position = models.PositiveIntegerField()
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+    # Nombre congelado al cerrar la ronda, sin joins al servirlo
+    full_name = models.CharField(max_length=61)
+    likes_received = models.PositiveIntegerField()
+    rank = models.PositiveIntegerField()
+    
+    class Meta:
+        db_table = 'ranking_snapshots'
+        verbose_name = 'Ranking Histórico'
+        verbose_name_plural = 'Rankings Históricos'
+        ordering = ['round', 'position']
+        unique_together = ('round', 'position')
+    
+    def __str__(self):
+        return f'{self.round.name} #{self.rank} {self.full_name}'
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Los rankings históricos no se pueden modificar")
+        super().save(*args, **kwargs)
+
+
+class RankHistory(models.Model):
+    """Rank change of a user, delta-encoded against the previous rank"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rank_history')
+    round = models.ForeignKey(VotingRound, on_delete=models.CASCADE, related_name='+')
+    recorded_at = models.DateTimeField(default=timezone.now)
+    # Ranking tras el cambio (None = sin ranking)
+    rank = models.PositiveIntegerField(blank=True, null=True)
+    # Puestos escalados desde el registro anterior (negativo = bajó)
+    delta = models.IntegerField()
+    
+    class Meta:
+        db_table = 'rank_history'
+        verbose_name = 'Historial de Ranking'
+        verbose_name_plural = 'Historial de Rankings'
+        ordering = ['-recorded_at']
+        indexes = [
+            models.Index(fields=['user', 'recorded_at'], name='rank_history_user_idx'),
+            models.Index(fields=['round', 'recorded_at'], name='rank_history_round_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.user_id} #{self.rank} ({self.delta:+d})'
+    
+    @classmethod
+    def record(cls, changes, unranked_position, recorded_at=None):
+        """Store (user_id, old_rank, new_rank) changes as compact delta rows"""
+        if not changes:
+            return []
+        
+        # Sin ranking cuenta como el puesto siguiente al último
+        current_round = VotingRound.get_current()
+        recorded_at = recorded_at or timezone.now()
+        return cls.objects.bulk_create([
+            cls(
+                user_id=user_id,
+                round=current_round,
+                recorded_at=recorded_at,
+                rank=new_rank,
+                delta=(old_rank or unranked_position) - (new_rank or unranked_position)
+            ) for user_id, old_rank, new_rank in changes
+        ], batch_size=1000)
+
+
+class LikeReset(models.Model):
+    """Audit entry and progress of a bulk reset of all likes"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_RUNNING, 'En curso'),
+        (STATUS_COMPLETED, 'Completado'),
+        (STATUS_FAILED, 'Fallido'),
+    )
+    
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='like_resets'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total_likes = models.IntegerField(default=0)
+    deleted_likes = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'like_resets'
+        verbose_name = 'Reseteo de Likes'
+        verbose_name_plural = 'Reseteos de Likes'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f'Reset {self.id} - {self.get_status_display()}'
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
+    
+    @property
+    def progress(self):
+        """Percentage of likes already deleted"""
+        if self.status == self.STATUS_COMPLETED:
+            return 100
+        if not self.total_likes:
+            return 0
+        return min(100, int(self.deleted_likes * 100 / self.total_likes))
+
+
+class ProjectionCheckpoint(models.Model):
+    """Last LikeEvent applied by a projection"""
+    name = models.CharField(max_length=50, primary_key=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'projection_checkpoints'
+        verbose_name = 'Checkpoint de Proyección'
+        verbose_name_plural = 'Checkpoints de Proyecciones'
+    
+    def __str__(self):
+        return f'{self.name} @ {self.position}'
+
+
+class CacheTag(models.Model):
+    """Version of a cache tag shared by every worker"""
+    tag = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'cache_tags'
+        verbose_name = 'Etiqueta de Caché'
+        verbose_name_plural = 'Etiquetas de Caché'
+    
+    def __str__(self):
+        return f'{self.tag} v{self.version}'
+
+
+class ThrottleBucket(models.Model):
+    """Token bucket of a throttle, shared by every worker"""
+    # voting:throttle:<ámbito>:<tipo>:<identidad>
+    key = models.CharField(max_length=150, primary_key=True)
+    tokens = models.FloatField()
+    # Reloj de pared (segundos) del último consumo
+    refilled_at = models.FloatField()
+    # Sin consumos hasta entonces el bucket vuelve a estar lleno y se puede borrar
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'throttle_buckets'
+        verbose_name = 'Bucket de Throttling'
+        verbose_name_plural = 'Buckets de Throttling'
+    
+    def __str__(self):
+        return f'{self.key} ({self.tokens:.1f})'
+
+
+class OperationLock(models.Model):
+    """Cross-process lock and last run of an expensive operation"""
+    name = models.CharField(max_length=50, primary_key=True)
+    owner = models.CharField(max_length=32, blank=True, default='')
+    locked_until = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'operation_locks'
+        verbose_name = 'Bloqueo de Operación'
+        verbose_name_plural = 'Bloqueos de Operaciones'
+    
+    def __str__(self):
+        return self.name
+
+
+class IdempotencyRecord(models.Model):
+    """Stored response of a POST sent with an Idempotency-Key header"""
+    # sha256 de usuario, endpoint y clave del cliente
+    key = models.CharField(max_length=64, primary_key=True)
+    # sha256 del cuerpo: la misma clave con otro cuerpo se rechaza
+    fingerprint = models.CharField(max_length=64)
+    # Vacío mientras la petición original está en curso
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    response_body = models.TextField(blank=True, default='')
+    # Vencimiento de la reserva en curso: pasado este momento un reintento la retoma
+    locked_until = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'idempotency_records'
+        verbose_name = 'Registro de Idempotencia'
+        verbose_name_plural = 'Registros de Idempotencia'
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.key[:12]} ({self.status_code})'
+
+
+class Job(models.Model):
+    """Background job run by manage.py run_worker"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_RUNNING, 'En curso'),
+        (STATUS_COMPLETED, 'Completado'),
+        (STATUS_FAILED, 'Fallido'),
+    )
+    
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=200, blank=True, default='')
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, default='')
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='jobs'
+    )
+    # Los reintentos se programan con espera creciente
+    run_after = models.DateTimeField(default=timezone.now)
+    # Worker que la ejecuta y hasta cuándo: si muere, otro la recoge al caducar
+    locked_by = models.CharField(max_length=64, blank=True, default='')
+    locked_until = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'jobs'
+        verbose_name = 'Tarea'
+        verbose_name_plural = 'Tareas'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='jobs_status_run_after_idx'),
+        ]
+    
+    def __str__(self):
+        return f'Job {self.id} {self.kind} - {self.get_status_display()}'
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
 
 
 # Signals para actualizar estadísticas automáticamente
-from django.db.models.signals import post_save, post_delete
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from django.utils import timezone
+
+
+_like_signal_state = threading.local()
+
+
+@contextmanager
+def suppress_like_signals():
+    """Disable per-like stats updates while running a bulk like operation"""
+    previous = getattr(_like_signal_state, 'suppressed', False)
+    _like_signal_state.suppressed = True
+    try:
+        yield
+    finally:
+        _like_signal_state.suppressed = previous
+
+
+def like_signals_suppressed():
+    """Whether per-like signal handlers should skip their work"""
+    return getattr(_like_signal_state, 'suppressed', False)
+
+
+def refresh_like_stats(user_ids):
+    """Update stats for the given users and shift the rankings they affect"""
+    from .leaderboard import leaderboard
+    
+    user_ids = set(user_ids)
+    previous = dict(
+        UserStats.objects.filter(user_id__in=user_ids).values_list('user_id', 'likes_received')
+    )
+    rows = []
+    affected = set(user_ids)
+    for user in User.objects.filter(id__in=user_ids):
+        stats = UserStats.update_user_stats(user)
+        rows.append((stats.user_id, stats.likes_received, stats.sort_name, stats.is_listed))
+        affected.update(
+            UserStats.shift_rankings(user.id, previous.get(user.id, 0), stats.likes_received)
+        )
+    leaderboard.apply_on_commit(rows)
+    invalidate_user_payloads(affected)
 
 
 @receiver(post_save, sender=Like)
 def update_stats_on_like_create(sender, instance, created, **kwargs):
     """Update stats when a like is created"""
-    if created:
-        # Actualizar stats del que recibe el like
-        UserStats.update_user_stats(instance.target)
-        # Actualizar stats del que da el like
-        UserStats.update_user_stats(instance.giver)
-        # Actualizar rankings
-        UserStats.update_all_rankings()
+    if created and not like_signals_suppressed():
+        from .like_graph import like_graph
+        LikeEvent.record(LikeEvent.KIND_ADDED, [(instance.giver_id, instance.target_id)], instance.round_id)
+        like_graph.apply_on_commit(added=[(instance.id, instance.giver_id, instance.target_id)])
+        # Actualizar stats del que recibe y del que da el like, y rankings
+        refresh_like_stats([instance.target_id, instance.giver_id])
 
 
 @receiver(post_delete, sender=Like)
 def update_stats_on_like_delete(sender, instance, **kwargs):
     """Update stats when a like is deleted"""
-    # Actualizar stats del que recibía el like
-    UserStats.update_user_stats(instance.target)
-    # Actualizar stats del que daba el like
-    UserStats.update_user_stats(instance.giver)
-    # Actualizar rankings
-    UserStats.update_all_rankings()
+    if not like_signals_suppressed():
+        from .like_graph import like_graph
+        # El borrado de likes (también en cascada) corre dentro de una transacción
+        LikeEvent.record(LikeEvent.KIND_REMOVED, [(instance.giver_id, instance.target_id)], instance.round_id)
+        like_graph.apply_on_commit(removed=[(instance.id, instance.giver_id, instance.target_id)])
+        # Actualizar stats del que recibía y del que daba el like, y rankings
+        refresh_like_stats([instance.target_id, instance.giver_id])
 
 
 @receiver(post_save, sender=User)
 def create_user_stats(sender, instance, created, **kwargs):
     """Create UserStats when a new user is created"""
-    if created:
-        UserStats.objects.get_or_create(user=instance)
+    # El registro inserta las estadísticas en su propia transacción
+    if created and not getattr(instance, '_creates_own_stats', False):
+        UserStats.objects.get_or_create(user=instance, defaults=UserStats.listing_fields(instance))
+
+
+@receiver(post_delete, sender=UserStats)
+def drop_deleted_user_stats(sender, instance, **kwargs):
+    """Rebuild the leaderboard without the deleted stats row"""
+    from .leaderboard import leaderboard
+    leaderboard.invalidate_on_commit()
+
+
+# Campos del usuario copiados en UserStats
+LISTING_SOURCE_FIELDS = {'first_name', 'last_name', 'is_marketer', 'registration_completed'}
+
+
+@receiver(post_save, sender=User)
+def sync_user_stats_listing(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the denormalized ranking columns of UserStats in step with the user"""
+    from .leaderboard import leaderboard
+    
+    if created or (update_fields is not None and not LISTING_SOURCE_FIELDS & set(update_fields)):
+        return
+    listing = UserStats.listing_fields(instance)
+    likes_received = UserStats.objects.filter(user=instance).values_list('likes_received', flat=True).first()
+    if likes_received is not None:
+        UserStats.objects.filter(user=instance).update(**listing)
+        leaderboard.apply_on_commit([
+            (instance.id, likes_received, listing['sort_name'], listing['is_listed'])
+        ])
+
+
+# Campos del usuario que no aparecen en ningún payload cacheado
+PRIVATE_USER_FIELDS = {'password', 'last_login'}
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_payloads_on_profile_change(sender, instance, created, update_fields=None, **kwargs):
+    """Drop cached payloads that embed this user's name or avatar"""
+    # El rehash al iniciar sesión y last_login no cambian ningún payload
+    if created or (update_fields is not None and set(update_fields) <= PRIVATE_USER_FIELDS):
+        return
+    
+    related_ids = {instance.id}
+    for giver_id, target_id in Like.objects.current().filter(
+        Q(giver=instance) | Q(target=instance)
+    ).values_list('giver_id', 'target_id'):
+        related_ids.update((giver_id, target_id))
+    invalidate_user_payloads(related_ids)
 
 
 @receiver(post_save, sender=Invitation)
@@ -244,4 +907,36 @@ def mark_invitation_used(sender, instance, **kwargs):
     if instance.used_by and not instance.used:
         instance.used = True
         instance.used_at = timezone.now()
-        instance.save(update_fields=['used', 'used_at'])
\ No newline at end of file
+        instance.save(update_fields=['used', 'used_at'])
+
+
+@receiver(pre_save, sender=Invitation)
+def remember_invitation_code(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored code of an invitation whose code may change"""
+    if instance.pk is None or (update_fields is not None and 'code' not in update_fields):
+        instance._stored_code = instance.code
+    else:
+        instance._stored_code = Invitation.objects.filter(pk=instance.pk).values_list(
+            'code', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Invitation)
+def invalidate_invitation_cache(sender, instance, created, **kwargs):
+    """Start a new version of the cached lookups of this code, or of all codes if the set changed"""
+    from .invitations import invalidate_all_invitations, invalidate_invitations
+    # Las versiones se guardan en la misma transacción que la invitación
+    stored_code = getattr(instance, '_stored_code', instance.code)
+    if created or stored_code != instance.code:
+        # Código nuevo: el filtro de bloom tiene que incluirlo
+        invalidate_all_invitations()
+    else:
+        invalidate_invitations([instance.code])
+
+
+@receiver(post_delete, sender=Invitation)
+def invalidate_deleted_invitation_cache(sender, instance, **kwargs):
+    """Drop the cached lookup of a deleted invitation"""
+    from .invitations import invalidate_invitations
+    # El filtro de bloom puede seguir teniendo el código: solo cuesta una consulta
+    invalidate_invitations([instance.code])
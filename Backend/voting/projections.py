@@ -0,0 +1,218 @@
+"""
+Projections derived from the LikeEvent log by streaming replay
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import invalidate_all_user_payloads, invalidate_user_payloads
+from .leaderboard import leaderboard
+from .models import LikeEvent, ProjectionCheckpoint, UserStats, VotingRound
+
+
+PROJECTION_BATCH_SIZE = getattr(settings, 'PROJECTION_BATCH_SIZE', 1000)
+# Los ids se asignan al insertar, pero las transacciones se confirman en otro
+# orden: cada puesta al día relee este número de ids ya aplicados
+PROJECTION_RESCAN_WINDOW = getattr(settings, 'PROJECTION_RESCAN_WINDOW', 200)
+
+USER_STATS_PROJECTION = 'user_stats'
+
+ACTIVITY_CACHE_KEY = 'voting:activity'
+# Likes vivos que se guardan para poder servir la actividad tras quitar algunos
+ACTIVITY_WINDOW = 100
+# Segundos durante los que la actividad se sirve tal cual, sin releer el log
+ACTIVITY_REFRESH_INTERVAL = getattr(settings, 'ACTIVITY_REFRESH_INTERVAL', 2.0)
+
+
+def stream_events(after, batch_size=None, **filters):
+    """Yield batches of events with id greater than `after`, in log order"""
+    batch_size = batch_size or PROJECTION_BATCH_SIZE
+    while True:
+        batch = list(
+            LikeEvent.objects.filter(id__gt=after, **filters).order_by('id')[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        after = batch[-1].id
+
+
+def _event_balance(field, round_id):
+    """Subquery with likes added minus likes removed for a user in a round"""
+    return Coalesce(Subquery(
+        LikeEvent.objects.filter(
+            round_id=round_id, **{field: OuterRef('user_id')}
+        ).order_by().values(field).annotate(
+            total=Sum(Case(
+                When(kind=LikeEvent.KIND_ADDED, then=Value(1)),
+                default=Value(-1),
+                output_field=IntegerField()
+            ))
+        ).values('total')
+    ), 0)
+
+
+def project_user_stats(user_ids, round_id):
+    """Write the like counts of the given users as folded from the event log"""
+    return UserStats.objects.filter(user_id__in=user_ids).order_by().update(
+        likes_received=_event_balance('target_id', round_id),
+        likes_given=_event_balance('giver_id', round_id),
+        last_updated=timezone.now()
+    )
+
+
+def _stats_counts(user_ids):
+    return {
+        user_id: (likes_received, likes_given)
+        for user_id, likes_received, likes_given in UserStats.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', 'likes_received', 'likes_given')
+    }
+
+
+def _replay_batches(checkpoint, from_position, round_id, batch_size, counted_after):
+    """Project the events after from_position, returning (events after counted_after, changed users)"""
+    applied = 0
+    changed = set()
+    for batch in stream_events(from_position, batch_size):
+        # Los contadores se recalculan desde el log: reaplicar un lote es idempotente
+        touched = set()
+        for event in batch:
+            if event.round_id == round_id:
+                touched.update((event.giver_id, event.target_id))
+        
+        with transaction.atomic():
+            if touched:
+                before = _stats_counts(touched)
+                project_user_stats(touched, round_id)
+                after = _stats_counts(touched)
+                changed.update(user_id for user_id in touched if before.get(user_id) != after.get(user_id))
+            checkpoint.position = max(checkpoint.position, batch[-1].id)
+            checkpoint.save(update_fields=['position', 'updated_at'])
+        
+        applied += sum(1 for event in batch if event.id > counted_after)
+    return applied, changed
+
+
+def replay_user_stats(from_position=None, rebuild=False, batch_size=None):
+    """Catch UserStats and ranks up with the event log, checkpointing each batch"""
+    current_round = VotingRound.get_current()
+    checkpoint, _ = ProjectionCheckpoint.objects.get_or_create(name=USER_STATS_PROJECTION)
+    
+    if rebuild:
+        # Todo o nada: ningún lector ve las estadísticas a cero a mitad de la reconstrucción
+        with transaction.atomic():
+            UserStats.objects.update(likes_received=0, likes_given=0, rank=None)
+            checkpoint.position = 0
+            applied, _ = _replay_batches(checkpoint, 0, current_round.id, batch_size, 0)
+            UserStats.update_all_rankings()
+        leaderboard.invalidate()
+        invalidate_all_user_payloads()
+        return applied
+    
+    counted_after = from_position
+    if from_position is None:
+        # Un evento confirmado tarde puede tener un id menor que el checkpoint
+        counted_after = checkpoint.position
+        from_position = max(0, checkpoint.position - PROJECTION_RESCAN_WINDOW)
+    
+    applied, changed = _replay_batches(
+        checkpoint, from_position, current_round.id, batch_size, counted_after
+    )
+    if changed:
+        UserStats.update_all_rankings()
+        leaderboard.invalidate()
+        invalidate_user_payloads(changed)
+    return applied
+
+
+def _activity_from_tail(round_id):
+    """Rebuild the recent activity by reading the log backwards"""
+    items = []
+    removed_later = set()
+    events = LikeEvent.objects.filter(round_id=round_id).order_by('-id')
+    position = events.values_list('id', flat=True).first() or 0
+    
+    for event in events.iterator(chunk_size=PROJECTION_BATCH_SIZE):
+        pair = (event.giver_id, event.target_id)
+        if event.kind == LikeEvent.KIND_REMOVED:
+            removed_later.add(pair)
+        elif pair in removed_later:
+            removed_later.discard(pair)
+        else:
+            items.append((event.id, event.giver_id, event.target_id, event.created_at))
+            if len(items) >= ACTIVITY_WINDOW:
+                break
+    
+    # Completo = contiene todos los likes vivos de la ronda
+    return {
+        'round_id': round_id,
+        'position': position,
+        'items': items,
+        'complete': len(items) < ACTIVITY_WINDOW,
+        # Ids ya aplicados dentro de la ventana que se relee
+        'seen': list(events.filter(
+            id__gt=position - PROJECTION_RESCAN_WINDOW
+        ).values_list('id', flat=True)),
+    }
+
+
+def _apply_activity(state, events):
+    """Apply events in log order to the recent activity state, skipping those already applied"""
+    items = state['items']
+    seen = set(state.get('seen', ()))
+    for event in events:
+        if event.id in seen:
+            continue
+        seen.add(event.id)
+        pair = (event.giver_id, event.target_id)
+        if event.kind == LikeEvent.KIND_ADDED:
+            # Un evento confirmado tarde se coloca por id, no al principio
+            index = next((i for i, item in enumerate(items) if item[0] < event.id), len(items))
+            items.insert(index, (event.id, event.giver_id, event.target_id, event.created_at))
+        else:
+            for index, item in enumerate(items):
+                if (item[1], item[2]) == pair:
+                    del items[index]
+                    break
+        state['position'] = max(state['position'], event.id)
+    state['seen'] = [event_id for event_id in seen if event_id > state['position'] - PROJECTION_RESCAN_WINDOW]
+    if len(items) > ACTIVITY_WINDOW:
+        del items[ACTIVITY_WINDOW:]
+        state['complete'] = False
+
+
+def replay_activity(rebuild=False):
+    """Catch the cached recent activity up with the event log"""
+    current_round = VotingRound.get_current()
+    state = None if rebuild else cache.get(ACTIVITY_CACHE_KEY)
+    
+    if state is None or state['round_id'] != current_round.id:
+        state = _activity_from_tail(current_round.id)
+    else:
+        rescan_from = max(0, state['position'] - PROJECTION_RESCAN_WINDOW)
+        for batch in stream_events(rescan_from, round_id=current_round.id):
+            _apply_activity(state, batch)
+        # Tras muchas bajas la ventana se relee del log para no perder likes antiguos
+        if not state['complete'] and len(state['items']) < ACTIVITY_WINDOW // 2:
+            state = _activity_from_tail(current_round.id)
+    
+    # Hora de reloj y no monotónica: el estado se comparte entre procesos
+    state['caught_up_at'] = time.time()
+    cache.set(ACTIVITY_CACHE_KEY, state, None)
+    return state
+
+
+def get_recent_activity(limit=20):
+    """Most recent live likes of the current round as (event_id, giver_id, target_id, created_at)"""
+    # Las lecturas solo leen la proyección: se pone al día como mucho una vez
+    # por intervalo, no en cada petición
+    state = cache.get(ACTIVITY_CACHE_KEY)
+    if state is None or time.time() - state.get('caught_up_at', 0) >= ACTIVITY_REFRESH_INTERVAL:
+        state = replay_activity()
+    return state['items'][:limit]
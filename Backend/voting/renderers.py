@@ -0,0 +1,34 @@
+"""
+Fast JSON renderer for the API
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON renderer backed by orjson, falling back to the stdlib renderer"""
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        if data is None:
+            return b''
+        
+        # orjson solo soporta indentación de 2 espacios: delegar el resto
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if indent not in (None, 2):
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        
+        # Las fechas y tipos no nativos usan el mismo formato que DRF
+        return orjson.dumps(data, default=JSONEncoder().default, option=option)
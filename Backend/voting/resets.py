@@ -0,0 +1,84 @@
+"""
+Chunked reset of all likes of the current round, run in the background
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidate_all_user_payloads
+from .leaderboard import leaderboard
+from .like_graph import like_graph
+from .models import Like, LikeEvent, LikeReset, UserStats, suppress_like_signals
+
+
+RESET_CHUNK_SIZE = getattr(settings, 'LIKE_RESET_CHUNK_SIZE', 1000)
+
+
+def run_like_reset(reset_id, chunk_size=None, on_progress=None):
+    """Delete every like in chunks, then recount all stats and rankings"""
+    chunk_size = chunk_size or RESET_CHUNK_SIZE
+    reset = LikeReset.objects.get(id=reset_id)
+    total = Like.objects.current().count()
+    deleted_total = 0
+    
+    LikeReset.objects.filter(id=reset.id).update(
+        status=LikeReset.STATUS_RUNNING,
+        total_likes=total,
+        started_at=timezone.now()
+    )
+    
+    try:
+        while True:
+            rows = list(
+                Like.objects.current().order_by('id')
+                .values_list('id', 'giver_id', 'target_id', 'round_id')[:chunk_size]
+            )
+            if not rows:
+                break
+            
+            # Los signals por like se suprimen: las estadísticas se recalculan al final
+            with transaction.atomic(), suppress_like_signals():
+                deleted, _ = Like.objects.filter(id__in=[row[0] for row in rows]).delete()
+                LikeEvent.record(
+                    LikeEvent.KIND_REMOVED,
+                    [(giver_id, target_id) for _, giver_id, target_id, _ in rows],
+                    rows[0][3]
+                )
+                LikeReset.objects.filter(id=reset.id).update(
+                    deleted_likes=F('deleted_likes') + deleted
+                )
+            
+            deleted_total += deleted
+            if on_progress:
+                on_progress(deleted_total, total)
+        
+        # Recuento real: los likes dados durante el reseteo siguen contando
+        UserStats.refresh_counts()
+        UserStats.update_all_rankings()
+        LikeReset.objects.filter(id=reset.id).update(
+            status=LikeReset.STATUS_COMPLETED,
+            finished_at=timezone.now()
+        )
+    except Exception as e:
+        LikeReset.objects.filter(id=reset.id).update(
+            status=LikeReset.STATUS_FAILED,
+            error=str(e),
+            finished_at=timezone.now()
+        )
+        raise
+    finally:
+        like_graph.invalidate()
+        leaderboard.invalidate()
+        invalidate_all_user_payloads()
+
+
+def start_like_reset(requested_by):
+    """Create the audit entry and queue the reset for the job workers"""
+    from .jobs import enqueue
+    
+    with transaction.atomic():
+        reset = LikeReset.objects.create(requested_by=requested_by)
+        # Sin reintentos: el registro de auditoría refleja el único intento
+        job = enqueue('reset_likes', {'reset_id': reset.id}, created_by=requested_by, max_attempts=1)
+    return reset, job
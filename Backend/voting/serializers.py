@@ -2,10 +2,54 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 import base64
+import logging
 import uuid
-from .models import User, Invitation, Like, UserStats
+from .models import (
+    User, Invitation, Like, LikeEvent, UserStats, LikeReset, VotingRound, RankingSnapshot,
+    Job, MAX_LIKES_PER_USER,
+    suppress_like_signals, refresh_like_stats
+)
+from .invitations import get_invitation, invalidate_invitations
+from .like_edges import edge_summary, get_like_edges
+from .like_graph import like_graph
+
+
+logger = logging.getLogger(__name__)
+
+
+class SparseFieldsetMixin:
+    """Restrict the output to the fields listed in ?fields=a,b or a fields kwarg"""
+    
+    def __init__(self, *args, **kwargs):
+        requested = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        
+        if requested is None:
+            request = self.context.get('request')
+            value = request.query_params.get('fields') if request else None
+            if value:
+                requested = [name.strip() for name in value.split(',')]
+        
+        self._requested_fields = None
+        if requested:
+            requested = set(requested)
+            readable = {
+                name for name, field in self.fields.items() if not field.write_only
+            }
+            if requested & readable:
+                self._requested_fields = requested & readable
+                for name in readable - requested:
+                    self.fields.pop(name)
+    
+    def filter_representation(self, data):
+        """Drop non requested keys from a hand-built representation"""
+        if self._requested_fields is None:
+            return data
+        return {key: value for key, value in data.items() if key in self._requested_fields}
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -30,63 +74,84 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         
         # Validar código de invitación
         invitation_code = attrs.get('invitation_code')
-        try:
-            invitation = Invitation.objects.get(code=invitation_code)
-            is_valid, message = invitation.is_valid()
-            if not is_valid:
-                raise serializers.ValidationError(f"Código de invitación inválido: {message}")
-            attrs['invitation'] = invitation
-        except Invitation.DoesNotExist:
+        invitation = get_invitation(invitation_code)
+        if invitation is None:
             raise serializers.ValidationError("Código de invitación no existe")
+        is_valid, message = invitation.is_valid()
+        if not is_valid:
+            raise serializers.ValidationError(f"Código de invitación inválido: {message}")
+        attrs['invitation'] = invitation
         
         return attrs
     
     def create(self, validated_data):
-        """Create new user"""
+        """Create the user, its stats and claim the invitation in one transaction"""
         # Remover campos que no van al modelo User
         validated_data.pop('confirm_password')
+        validated_data.pop('invitation_code')
         invitation = validated_data.pop('invitation')
         avatar_data = validated_data.pop('avatar', None)
+        password = validated_data.pop('password')
         
-        # Crear usuario
-        user = User.objects.create_user(
-            username=validated_data['email'],
+        email = User.objects.normalize_email(validated_data.pop('email'))
+        user = User(
+            username=User.normalize_username(email),
+            email=email,
+            registration_completed=True,
             **validated_data
         )
+        user.set_password(password)
+        # El signal no crea las estadísticas: se insertan junto al usuario
+        user._creates_own_stats = True
         
-        # Procesar avatar si se proporcionó
+        # Procesar avatar si se proporcionó (se guarda con el INSERT del usuario)
         if avatar_data:
             try:
-                self._save_avatar(user, avatar_data)
-            except Exception as e:
-                print(f"Error saving avatar: {e}")
-        
-        # Marcar invitación como usada
-        invitation.used_by = user
-        invitation.used = True
-        invitation.used_at = timezone.now()
-        invitation.save()
+                user.avatar = self._decode_avatar(avatar_data)
+            except Exception:
+                # El avatar es opcional: el registro sigue sin él
+                logger.warning('No se pudo guardar el avatar del registro', exc_info=True)
         
-        user.registration_completed = True
-        user.save()
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                user.save()
+                UserStats.objects.create(user=user, **UserStats.listing_fields(user))
+                
+                # Reclamar la invitación solo si sigue libre: cierra el doble uso concurrente
+                claimed = Invitation.objects.filter(
+                    Q(expires_at__isnull=True) | Q(expires_at__gt=now),
+                    id=invitation.id,
+                    used=False
+                ).update(used=True, used_by=user, used_at=now)
+                if not claimed:
+                    # Releer la invitación para explicar por qué ya no es válida
+                    current = Invitation.objects.filter(id=invitation.id).first()
+                    if current is None:
+                        raise serializers.ValidationError("Código de invitación no existe")
+                    is_valid, message = current.is_valid()
+                    if is_valid:
+                        message = "El código de invitación ya ha sido usado"
+                    raise serializers.ValidationError(f"Código de invitación inválido: {message}")
+                # El UPDATE no dispara signals: nueva versión de la búsqueda de este código
+                invalidate_invitations([invitation.code])
+        except Exception:
+            # El archivo del avatar ya se escribió al guardar el usuario
+            if user.avatar:
+                user.avatar.delete(save=False)
+            raise
         
         return user
     
-    def _save_avatar(self, user, base64_data):
-        """Save base64 encoded avatar"""
+    def _decode_avatar(self, base64_data):
+        """Decode a base64 encoded avatar into an unsaved file"""
         try:
             format, imgstr = base64_data.split(';base64,')
             ext = format.split('/')[-1]
             
-            # Generar nombre único
-            filename = f"{user.id}_{uuid.uuid4().hex[:8]}.{ext}"
-            
-            # Decodificar imagen
-            data = base64.b64decode(imgstr)
-            
-            # Guardar archivo
+            # Decodificar imagen (el nombre final lo genera user_avatar_path)
             from django.core.files.base import ContentFile
-            user.avatar.save(filename, ContentFile(data), save=True)
+            return ContentFile(base64.b64decode(imgstr), name=f'avatar.{ext}')
             
         except Exception as e:
             raise serializers.ValidationError(f"Error procesando imagen: {str(e)}")
@@ -121,7 +186,7 @@ class UserLoginSerializer(serializers.Serializer):
             raise serializers.ValidationError("Email y contraseña son requeridos")
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for user profile display"""
     likes_received = serializers.IntegerField(source='likes_received_count', read_only=True)
     likes_given = serializers.IntegerField(source='likes_given_count', read_only=True)
@@ -149,10 +214,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         """Check if current user has liked this user"""
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return Like.objects.filter(
-                giver=request.user, 
-                target=obj
-            ).exists()
+            return like_graph.has_liked(request.user.id, obj.id)
         return False
 
 
@@ -170,7 +232,22 @@ class UserStatsSerializer(serializers.ModelSerializer):
         )
 
 
-class LikeSerializer(serializers.ModelSerializer):
+class UserSummarySerializer(serializers.Serializer):
+    """Lightweight user summary built from UserStats rows"""
+    id = serializers.IntegerField(source='user_id')
+    full_name = serializers.CharField(source='user.full_name')
+    email = serializers.EmailField(source='user.email')
+    avatar = serializers.SerializerMethodField()
+    likes_received = serializers.IntegerField()
+    likes_given = serializers.IntegerField()
+    rank = serializers.IntegerField()
+    
+    def get_avatar(self, obj):
+        """Relative avatar URL, safe to cache across requests"""
+        return obj.user.avatar.url if obj.user.avatar else None
+
+
+class LikeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for likes"""
     giver_name = serializers.CharField(source='giver.full_name', read_only=True)
     target_name = serializers.CharField(source='target.full_name', read_only=True)
@@ -203,11 +280,11 @@ class LikeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("No puedes darte like a ti mismo")
         
         # Verificar límite de likes
-        if giver.likes_given_count >= 5:
+        if like_graph.given_count(giver.id, force=True) >= MAX_LIKES_PER_USER:
             raise serializers.ValidationError("Ya has usado todos tus likes disponibles")
         
         # Verificar like duplicado
-        if Like.objects.filter(giver=giver, target=target).exists():
+        if like_graph.has_liked(giver.id, target.id):
             raise serializers.ValidationError("Ya has dado like a este usuario")
         
         attrs['target'] = target
@@ -220,6 +297,121 @@ class LikeSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class LikeOperationSerializer(serializers.Serializer):
+    """Single add/remove operation inside a like batch"""
+    action = serializers.ChoiceField(choices=('add', 'remove'))
+    marketer_id = serializers.IntegerField()
+
+
+class LikeBatchSerializer(serializers.Serializer):
+    """Serializer for applying several like operations at once"""
+    operations = LikeOperationSerializer(many=True, allow_empty=False)
+    
+    def validate_operations(self, value):
+        """Limit the size of a batch"""
+        if len(value) > MAX_LIKES_PER_USER * 4:
+            raise serializers.ValidationError(
+                f"Máximo {MAX_LIKES_PER_USER * 4} operaciones por lote"
+            )
+        return value
+    
+    def validate(self, attrs):
+        """Validate the whole batch against the current likes in memory"""
+        giver = self.context['request'].user
+        current = set(like_graph.liked_ids(giver.id, force=True))
+        
+        # Simular las operaciones en orden sobre los likes actuales
+        final = set(current)
+        for operation in attrs['operations']:
+            target_id = operation['marketer_id']
+            if operation['action'] == 'add':
+                if target_id == giver.id:
+                    raise serializers.ValidationError("No puedes darte like a ti mismo")
+                if target_id in final:
+                    raise serializers.ValidationError("Ya has dado like a este usuario")
+                final.add(target_id)
+            else:
+                if target_id not in final:
+                    raise serializers.ValidationError("No has dado like a este usuario")
+                final.discard(target_id)
+        
+        if len(final) > MAX_LIKES_PER_USER:
+            raise serializers.ValidationError("Ya has usado todos tus likes disponibles")
+        
+        to_add = final - current
+        if to_add:
+            valid_targets = set(User.objects.filter(
+                id__in=to_add,
+                is_marketer=True,
+                registration_completed=True
+            ).values_list('id', flat=True))
+            if valid_targets != to_add:
+                raise serializers.ValidationError("Usuario no encontrado")
+        
+        attrs['to_add'] = sorted(to_add)
+        attrs['to_remove'] = sorted(current - final)
+        attrs['liked_ids'] = sorted(final)
+        return attrs
+    
+    def save(self):
+        """Apply the batch in one transaction and refresh stats once"""
+        giver = self.context['request'].user
+        to_add = self.validated_data['to_add']
+        to_remove = self.validated_data['to_remove']
+        
+        removed = []
+        added = []
+        with transaction.atomic():
+            current_round = VotingRound.get_current()
+            # La validación se hizo sobre el grafo en memoria y fuera de la transacción:
+            # con el bloqueo de escritura tomado se repite sobre la base de datos,
+            # para que dos lotes simultáneos no superen juntos el cupo
+            User.objects.select_for_update().filter(id=giver.id).exists()
+            given = set(Like.objects.filter(
+                round=current_round, giver=giver
+            ).values_list('target_id', flat=True))
+            if given.intersection(to_add):
+                raise serializers.ValidationError("Ya has dado like a este usuario")
+            if not given.issuperset(to_remove):
+                raise serializers.ValidationError("No has dado like a este usuario")
+            final = (given - set(to_remove)) | set(to_add)
+            if len(final) > MAX_LIKES_PER_USER:
+                raise serializers.ValidationError("Ya has usado todos tus likes disponibles")
+            self.validated_data['liked_ids'] = sorted(final)
+            
+            with suppress_like_signals():
+                if to_remove:
+                    likes = Like.objects.filter(
+                        round=current_round, giver=giver, target_id__in=to_remove
+                    )
+                    removed = list(likes.values_list('id', 'giver_id', 'target_id'))
+                    likes.delete()
+                    LikeEvent.record(
+                        LikeEvent.KIND_REMOVED,
+                        [(giver.id, target_id) for target_id in to_remove],
+                        current_round.id
+                    )
+                if to_add:
+                    added = [
+                        (like.id, like.giver_id, like.target_id)
+                        for like in Like.objects.bulk_create([
+                            Like(giver=giver, target_id=target_id, round=current_round)
+                            for target_id in to_add
+                        ])
+                    ]
+                    LikeEvent.record(
+                        LikeEvent.KIND_ADDED,
+                        [(giver.id, target_id) for target_id in to_add],
+                        current_round.id
+                    )
+            
+            if to_add or to_remove:
+                like_graph.apply_on_commit(added=added, removed=removed)
+                refresh_like_stats([giver.id, *to_add, *to_remove])
+        
+        return self.validated_data
+
+
 class InvitationSerializer(serializers.ModelSerializer):
     """Serializer for invitations"""
     created_by_name = serializers.CharField(source='created_by.full_name', read_only=True)
@@ -263,6 +455,67 @@ class InvitationSerializer(serializers.ModelSerializer):
                 return code
 
 
+class LikeResetSerializer(serializers.ModelSerializer):
+    """Serializer for likes reset progress"""
+    requested_by_name = serializers.CharField(source='requested_by.full_name', read_only=True)
+    progress = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = LikeReset
+        fields = (
+            'id', 'status', 'requested_by_name', 'total_likes', 'deleted_likes',
+            'progress', 'error', 'created_at', 'started_at', 'finished_at'
+        )
+        read_only_fields = fields
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background job status"""
+    created_by_name = serializers.CharField(source='created_by.full_name', read_only=True)
+    
+    class Meta:
+        model = Job
+        fields = (
+            'id', 'kind', 'status', 'created_by_name', 'attempts', 'max_attempts',
+            'progress', 'message', 'result', 'error', 'created_at', 'started_at', 'finished_at'
+        )
+        read_only_fields = fields
+
+
+class JobPayloadSerializer(serializers.Serializer):
+    """Base serializer for background job payloads, rejecting unknown keys"""
+    
+    def validate(self, attrs):
+        unknown = sorted(set(self.initial_data) - set(self.fields))
+        if unknown:
+            raise serializers.ValidationError({
+                key: 'Campo no permitido para este tipo de tarea' for key in unknown
+            })
+        return attrs
+
+
+class ResetLikesPayloadSerializer(JobPayloadSerializer):
+    """Payload of a reset_likes job"""
+    reset_id = serializers.IntegerField(min_value=1)
+
+
+class BulkInvitationsPayloadSerializer(JobPayloadSerializer):
+    """Payload of a bulk_invitations job"""
+    count = serializers.IntegerField(min_value=1, max_value=100, required=False, default=1)
+    emails = serializers.ListField(
+        child=serializers.EmailField(), max_length=100, required=False, default=list
+    )
+    expires_days = serializers.IntegerField(min_value=1, max_value=365, required=False, default=30)
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if len(attrs['emails']) > attrs['count']:
+            raise serializers.ValidationError({
+                'emails': 'No puede haber más emails que invitaciones'
+            })
+        return attrs
+
+
 class UserDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for user information"""
     stats = UserStatsSerializer(read_only=True)
@@ -280,26 +533,20 @@ class UserDetailSerializer(serializers.ModelSerializer):
     
     def get_given_likes(self, obj):
         """Get users liked by this user"""
-        likes = obj.given_likes.select_related('target').all()
-        return [{
-            'id': like.target.id,
-            'name': like.target.full_name,
-            'avatar': like.target.avatar.url if like.target.avatar else None,
-            'created_at': like.created_at
-        } for like in likes]
+        return [
+            {**edge_summary(edge), 'created_at': edge['created_at']}
+            for edge in get_like_edges(obj.id)['given']
+        ]
     
     def get_received_likes(self, obj):
         """Get users who liked this user"""
-        likes = obj.received_likes.select_related('giver').all()
-        return [{
-            'id': like.giver.id,
-            'name': like.giver.full_name,
-            'avatar': like.giver.avatar.url if like.giver.avatar else None,
-            'created_at': like.created_at
-        } for like in likes]
+        return [
+            {**edge_summary(edge), 'created_at': edge['created_at']}
+            for edge in get_like_edges(obj.id)['received']
+        ]
 
 
-class RankingSerializer(serializers.Serializer):
+class RankingSerializer(SparseFieldsetMixin, serializers.Serializer):
     """Serializer for ranking data"""
     user_id = serializers.IntegerField()
     full_name = serializers.CharField()
@@ -311,12 +558,32 @@ class RankingSerializer(serializers.Serializer):
     def to_representation(self, instance):
         """Custom representation for ranking"""
         if isinstance(instance, UserStats):
-            return {
+            return self.filter_representation({
                 'user_id': instance.user.id,
                 'full_name': instance.user.full_name,
                 'email': instance.user.email,
                 'avatar': instance.user.avatar.url if instance.user.avatar else None,
                 'likes_count': instance.likes_received,
                 'rank': instance.rank
-            }
-        return super().to_representation(instance)
\ No newline at end of file
+            })
+        if isinstance(instance, RankingSnapshot):
+            user = instance.user
+            return self.filter_representation({
+                'user_id': instance.user_id,
+                'full_name': instance.full_name,
+                'email': user.email if user else None,
+                'avatar': user.avatar.url if user and user.avatar else None,
+                'likes_count': instance.likes_received,
+                'rank': instance.rank
+            })
+        return super().to_representation(instance)
+
+
+class VotingRoundSerializer(serializers.ModelSerializer):
+    """Serializer for voting rounds"""
+    closed_by_name = serializers.CharField(source='closed_by.full_name', read_only=True)
+    
+    class Meta:
+        model = VotingRound
+        fields = ('id', 'name', 'is_active', 'started_at', 'closed_at', 'closed_by_name')
+        read_only_fields = fields
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Single-flight execution of expensive recomputations, in-process and across workers
+"""
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+
+SINGLE_FLIGHT_LOCK_TIMEOUT = getattr(settings, 'SINGLE_FLIGHT_LOCK_TIMEOUT', 300)
+SINGLE_FLIGHT_POLL_INTERVAL = getattr(settings, 'SINGLE_FLIGHT_POLL_INTERVAL', 0.2)
+
+
+class CooldownActive(Exception):
+    """The operation finished too recently to run again"""
+    
+    def __init__(self, retry_after):
+        super().__init__(f'Operación en enfriamiento durante {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run one execution per key at a time and share its outcome with concurrent callers"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+    
+    def do(self, key, func):
+        """Return (result, shared): shared is True when another caller ran func"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+single_flight = SingleFlight()
+
+
+def _acquire(name, cooldown):
+    """Take the lock row of an operation, returning the owner token or None"""
+    from .models import OperationLock
+    
+    OperationLock.objects.get_or_create(name=name)
+    now = timezone.now()
+    owner = uuid.uuid4().hex
+    # Un único UPDATE condicional: libre (o caducado) y fuera del enfriamiento
+    taken = OperationLock.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lte=now),
+        Q(finished_at__isnull=True) | Q(finished_at__lte=now - timedelta(seconds=cooldown)),
+        name=name
+    ).update(owner=owner, locked_until=now + timedelta(seconds=SINGLE_FLIGHT_LOCK_TIMEOUT))
+    return owner if taken else None
+
+
+def _wait_for_release(name):
+    """Poll until the worker holding the lock finishes or the lock expires"""
+    from .models import OperationLock
+    
+    deadline = time.monotonic() + SINGLE_FLIGHT_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        if not OperationLock.objects.filter(name=name, locked_until__gt=timezone.now()).exists():
+            return
+        time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+
+
+def _run_locked(name, func, cooldown):
+    from .models import OperationLock
+    
+    owner = _acquire(name, cooldown)
+    if owner is None:
+        lock = OperationLock.objects.get(name=name)
+        now = timezone.now()
+        if lock.locked_until and lock.locked_until > now:
+            # Otro worker la está ejecutando: se espera a que termine y se comparte
+            _wait_for_release(name)
+            return None, True
+        raise CooldownActive((lock.finished_at + timedelta(seconds=cooldown) - now).total_seconds())
+    
+    finished = False
+    try:
+        result = func()
+        finished = True
+        return result, False
+    finally:
+        OperationLock.objects.filter(name=name, owner=owner).update(
+            owner='',
+            locked_until=None,
+            **({'finished_at': timezone.now()} if finished else {})
+        )
+
+
+def run_exclusive(name, func, cooldown=0):
+    """Run func once across threads and workers, returning (result, shared)"""
+    # Quien se une a la ejecución de otro worker recibe None como resultado.
+    # El enfriamiento forma parte de la clave: un CooldownActive del líder no
+    # se comparte con llamadas que usan otro enfriamiento (o ninguno)
+    (result, joined_remote), joined_local = single_flight.do(
+        (name, cooldown), lambda: _run_locked(name, func, cooldown)
+    )
+    return result, joined_local or joined_remote
@@ -0,0 +1,89 @@
+"""
+Versioned cache tags shared by every worker through the database
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+RANKING_TAG = 'ranking'
+USERS_TAG = 'users'
+INVITATIONS_TAG = 'invitations'
+
+# Etiquetas por sentencia: margen bajo el límite de variables de SQLite
+TAG_BATCH_SIZE = 500
+
+# Versiones ya leídas durante la petición en curso (None fuera de peticiones)
+_request_versions = ContextVar('voting_tag_versions', default=None)
+
+
+def user_tag(user_id):
+    return f'user:{user_id}'
+
+
+def invitation_tag(code):
+    return f'invitation:{code}'
+
+
+@contextmanager
+def tag_version_memo():
+    """Read each tag version at most once inside the block"""
+    token = _request_versions.set({})
+    try:
+        yield
+    finally:
+        _request_versions.reset(token)
+
+
+def get_tag_versions(tags):
+    """Current version of each tag, 0 for tags never bumped"""
+    from .models import CacheTag
+    
+    memo = _request_versions.get()
+    tags = list(dict.fromkeys(tags))
+    missing = [tag for tag in tags if memo is None or tag not in memo]
+    
+    versions = {} if memo is None else {tag: memo[tag] for tag in tags if tag in memo}
+    if missing:
+        found = dict(CacheTag.objects.filter(tag__in=missing).values_list('tag', 'version'))
+        for tag in missing:
+            versions[tag] = found.get(tag, 0)
+        if memo is not None:
+            memo.update({tag: versions[tag] for tag in missing})
+    return versions
+
+
+def get_tag_version(tag):
+    return get_tag_versions([tag])[tag]
+
+
+def tagged_key(base, tags):
+    """Cache key that changes whenever one of its tags is bumped"""
+    versions = get_tag_versions(tags)
+    return f'{base}:' + '.'.join(str(versions[tag]) for tag in tags)
+
+
+def bump_tags(*tags):
+    """Invalidate every entry keyed on the given tags, atomically with the caller's transaction"""
+    from .models import CacheTag
+    
+    tags = list(dict.fromkeys(tags))
+    if not tags:
+        return
+    memo = _request_versions.get()
+    now = timezone.now()
+    with transaction.atomic():
+        for start in range(0, len(tags), TAG_BATCH_SIZE):
+            batch = tags[start:start + TAG_BATCH_SIZE]
+            CacheTag.objects.bulk_create(
+                [CacheTag(tag=tag, updated_at=now) for tag in batch],
+                ignore_conflicts=True
+            )
+            CacheTag.objects.filter(tag__in=batch).update(version=F('version') + 1, updated_at=now)
+    # Se vuelven a leer: si la transacción se deshace, la versión no cambió
+    if memo is not None:
+        for tag in tags:
+            memo.pop(tag, None)
@@ -1,3 +1,1531 @@
+import gzip
+import hashlib
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.hashers import get_hashers, make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .admin import estimate_table_rows
+from .cache import user_detail_cache_key
+from .leaderboard import leaderboard
+from .like_edges import build_like_edges, edge_summary, get_like_edges
+from .like_graph import LikeGraph, like_graph
+from .invitations import get_invitation
+from .jobs import JOB_HANDLERS, claim_job, enqueue, run_job
+from .models import (
+    IdempotencyRecord, Invitation, Job, Like, LikeEvent, LikeReset, ProjectionCheckpoint, RankHistory,
+    RankingSnapshot, RoundAlreadyClosed, ThrottleBucket, User, UserStats, VotingRound,
+    suppress_like_signals
+)
+from .projections import (
+    USER_STATS_PROJECTION, get_recent_activity, replay_activity, replay_user_stats
+)
+from .renderers import FastJSONRenderer
+from .resets import run_like_reset
+from .singleflight import CooldownActive, SingleFlight, run_exclusive
+from .tags import INVITATIONS_TAG, bump_tags, get_tag_version, user_tag
+from .throttling import purge_expired_buckets
+
+
+def create_marketer(index):
+    return User.objects.create_user(
+        username=f'marketer{index}@example.com',
+        email=f'marketer{index}@example.com',
+        password='Marketeros-2024!',
+        first_name=f'Marketer{index}',
+        last_name='Test',
+        registration_completed=True
+    )
+
+
+class LikeBatchTests(TestCase):
+    """Batched like operations and the like quota"""
+    
+    def setUp(self):
+        cache.clear()
+        like_graph.invalidate()
+        self.giver, *self.targets = [create_marketer(index) for index in range(8)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.giver)
+    
+    def batch(self, *operations):
+        return self.client.post('/api/likes/batch/', {
+            'operations': [
+                {'action': action, 'marketer_id': target.id} for action, target in operations
+            ]
+        }, format='json')
+    
+    def test_batch_applies_every_operation_and_refreshes_stats(self):
+        response = self.batch(*[('add', target) for target in self.targets[:5]])
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['remaining_likes'], 0)
+        self.assertEqual(Like.objects.current().filter(giver=self.giver).count(), 5)
+        self.assertEqual(UserStats.objects.get(user=self.giver).likes_given, 5)
+        self.assertEqual(UserStats.objects.get(user=self.targets[0]).likes_received, 1)
+    
+    def test_batch_over_the_quota_is_rejected_without_changes(self):
+        self.batch(*[('add', target) for target in self.targets[:4]])
+        
+        response = self.batch(('add', self.targets[4]), ('add', self.targets[5]))
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Like.objects.current().filter(giver=self.giver).count(), 4)
+    
+    def test_removals_free_quota_for_adds_in_the_same_batch(self):
+        self.batch(*[('add', target) for target in self.targets[:5]])
+        
+        response = self.batch(('remove', self.targets[0]), ('add', self.targets[5]))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['added'], [self.targets[5].id])
+        self.assertEqual(response.data['removed'], [self.targets[0].id])
+        self.assertEqual(UserStats.objects.get(user=self.targets[0]).likes_received, 0)
+    
+    def test_removing_a_like_not_given_is_rejected(self):
+        response = self.batch(('remove', self.targets[0]))
+        
+        self.assertEqual(response.status_code, 400)
+    
+    def test_quota_is_rechecked_inside_the_write_transaction(self):
+        # Otro lote simultáneo ya gastó cuatro likes; este validó con el grafo sin ellos
+        for target in self.targets[:4]:
+            Like.objects.create(giver=self.giver, target=target)
+        
+        with mock.patch.object(like_graph, 'liked_ids', return_value=[]):
+            response = self.batch(('add', self.targets[4]), ('add', self.targets[5]))
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Like.objects.current().filter(giver=self.giver).count(), 4)
+
+
+class DashboardTests(TestCase):
+    """Cached per-user dashboard payload"""
+    
+    def setUp(self):
+        cache.clear()
+        like_graph.invalidate()
+        self.user, self.fan, self.other = [create_marketer(index) for index in range(3)]
+        Like.objects.create(giver=self.fan, target=self.user)
+        Like.objects.create(giver=self.user, target=self.other)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def test_dashboard_payload(self):
+        data = self.client.get('/api/dashboard/').json()
+        
+        self.assertEqual(data['stats']['likes_received'], 1)
+        self.assertEqual(data['stats']['likes_given'], 1)
+        self.assertEqual(data['stats']['remaining_likes'], 4)
+        self.assertEqual(data['liked_ids'], [self.other.id])
+        self.assertEqual(data['recent_received'][0]['from']['id'], self.fan.id)
+    
+    def test_dashboard_is_served_from_cache(self):
+        self.client.get('/api/dashboard/')
+        
+        # Solo se comprueban las versiones de las etiquetas
+        with self.assertNumQueries(1):
+            self.client.get('/api/dashboard/')
+    
+    def test_new_like_invalidates_cached_dashboard(self):
+        self.client.get('/api/dashboard/')
+        
+        Like.objects.create(giver=self.other, target=self.user)
+        
+        data = self.client.get('/api/dashboard/').json()
+        self.assertEqual(data['stats']['likes_received'], 2)
+    
+    def test_renamed_fan_invalidates_cached_dashboard(self):
+        self.client.get('/api/dashboard/')
+        
+        self.fan.first_name = 'Renamed'
+        self.fan.save()
+        
+        data = self.client.get('/api/dashboard/').json()
+        self.assertEqual(data['recent_received'][0]['from']['name'], 'Renamed Test')
+
+
+class LikeGraphTests(TestCase):
+    """In-memory like graph of the current round"""
+    
+    def setUp(self):
+        like_graph.invalidate()
+        self.users = [create_marketer(index) for index in range(4)]
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(giver=self.users[0], target=self.users[1])
+            Like.objects.create(giver=self.users[2], target=self.users[1])
+    
+    def test_lookups_follow_the_likes_table(self):
+        self.assertTrue(like_graph.has_liked(self.users[0].id, self.users[1].id))
+        self.assertFalse(like_graph.has_liked(self.users[1].id, self.users[0].id))
+        self.assertEqual(like_graph.liked_ids(self.users[2].id), [self.users[1].id])
+        self.assertEqual(like_graph.received_count(self.users[1].id), 2)
+        self.assertEqual(like_graph.given_count(self.users[3].id), 0)
+    
+    def test_local_writes_keep_the_graph_valid_without_a_rebuild(self):
+        like_graph.ensure_fresh(force=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(giver=self.users[3], target=self.users[0])
+            Like.objects.get(giver=self.users[0], target=self.users[1]).delete()
+        
+        # Solo se lee la huella: coincide con la actualizada localmente
+        with self.assertNumQueries(1):
+            self.assertEqual(like_graph.given_count(self.users[3].id, force=True), 1)
+        self.assertFalse(like_graph.has_liked(self.users[0].id, self.users[1].id))
+        self.assertEqual(like_graph.received_count(self.users[1].id), 1)
+    
+    def test_writes_from_another_process_trigger_a_rebuild(self):
+        like_graph.ensure_fresh(force=True)
+        # Sin signals: como un like escrito por otro worker
+        with suppress_like_signals():
+            Like.objects.create(giver=self.users[3], target=self.users[1])
+        
+        self.assertEqual(like_graph.received_count(self.users[1].id, force=True), 3)
+    
+    def test_readers_never_see_a_half_allocated_slot(self):
+        graph = LikeGraph(refresh_interval=60)
+        graph.rebuild()
+        errors = []
+        stop = threading.Event()
+        
+        def read():
+            while not stop.is_set():
+                for user_id in range(1000, 1200):
+                    try:
+                        graph.given_count(user_id)
+                        graph.received_count(user_id)
+                    except Exception as e:
+                        errors.append(e)
+                        return
+        
+        readers = [threading.Thread(target=read) for _ in range(3)]
+        for reader in readers:
+            reader.start()
+        for user_id in range(1000, 1200):
+            graph.apply_changes(added=[(None, user_id, user_id + 1)])
+        stop.set()
+        for reader in readers:
+            reader.join(5)
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(graph.received_count(1200), 1)
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= sparse fieldsets and the orjson renderer"""
+    
+    def setUp(self):
+        cache.clear()
+        like_graph.invalidate()
+        leaderboard.invalidate()
+        self.users = [create_marketer(index) for index in range(3)]
+        Like.objects.create(giver=self.users[1], target=self.users[0])
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+    
+    def test_marketers_only_render_the_requested_fields(self):
+        results = self.client.get('/api/marketers/?fields=id,first_name').json()['results']
+        
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(set(row) == {'id', 'first_name'} for row in results))
+    
+    def test_unknown_fields_render_the_full_representation(self):
+        results = self.client.get('/api/marketers/?fields=nope').json()['results']
+        
+        self.assertIn('likes_received', results[0])
+        self.assertIn('has_liked', results[0])
+    
+    def test_ranking_honours_the_fieldset(self):
+        ranking = self.client.get('/api/marketers/ranking/?fields=full_name,rank').json()['ranking']
+        
+        self.assertEqual(ranking, [{'full_name': 'Marketer0 Test', 'rank': 1}])
+    
+    def test_fast_renderer_matches_the_stdlib_renderer(self):
+        data = {
+            'when': timezone.now(),
+            'amount': Decimal('1.50'),
+            'ids': [1, 2],
+            'name': 'Ñandú',
+            'nothing': None
+        }
+        
+        self.assertEqual(
+            json.loads(FastJSONRenderer().render(data)),
+            json.loads(JSONRenderer().render(data))
+        )
+
+
+class CompressionTests(TestCase):
+    """Compressed API responses and precompressed frontend assets"""
+    
+    def setUp(self):
+        cache.clear()
+        like_graph.invalidate()
+        self.users = [create_marketer(index) for index in range(10)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+    
+    def test_large_responses_are_gzipped(self):
+        plain = self.client.get('/api/marketers/')
+        response = self.client.get('/api/marketers/', HTTP_ACCEPT_ENCODING='gzip')
+        
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(json.loads(gzip.decompress(response.content)), plain.json())
+    
+    def test_small_responses_are_left_uncompressed(self):
+        response = self.client.get(
+            '/api/marketers/?fields=id&search=Marketer1', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        
+        self.assertFalse(response.has_header('Content-Encoding'))
+    
+    def test_responses_are_not_compressed_without_accept_encoding(self):
+        response = self.client.get('/api/marketers/')
+        
+        self.assertFalse(response.has_header('Content-Encoding'))
+    
+    def test_frontend_build_fingerprints_and_precompresses_assets(self):
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as output:
+            source, output = Path(source), Path(output) / 'build'
+            for directory in ('css', 'javascript', 'html'):
+                (source / directory).mkdir()
+            (source / 'css' / 'styles.css').write_text('body { color: red; }' * 50)
+            (source / 'javascript' / 'app.js').write_text('console.log("hola");' * 50)
+            (source / 'html' / 'index.html').write_text(
+                '<link href="../css/styles.css"><script src="../javascript/app.js"></script>'
+            )
+            
+            call_command('build_frontend', source=str(source), output=str(output), stdout=StringIO())
+            
+            manifest = json.loads((output / 'manifest.json').read_text())
+            built_css = output / manifest['css/styles.css']
+            self.assertNotEqual(built_css.name, 'styles.css')
+            self.assertEqual(
+                gzip.decompress((built_css.parent / (built_css.name + '.gz')).read_bytes()),
+                built_css.read_bytes()
+            )
+            html = (output / 'html' / 'index.html').read_text()
+            self.assertIn(f'href="../{manifest["css/styles.css"]}"', html)
+            self.assertIn(f'src="../{manifest["javascript/app.js"]}"', html)
+
+
+class AdminStatsTests(TestCase):
+    """Aggregated admin statistics"""
+    
+    def setUp(self):
+        cache.clear()
+        like_graph.invalidate()
+        self.admin = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com',
+            password='Marketeros-2024!', is_marketer=False
+        )
+        self.users = [create_marketer(index) for index in range(4)]
+        self.users[3].registration_completed = False
+        self.users[3].save()
+        Like.objects.create(giver=self.users[0], target=self.users[1])
+        Like.objects.create(giver=self.users[2], target=self.users[1])
+        Like.objects.create(giver=self.users[0], target=self.users[2])
+        Invitation.objects.create(code='USED', created_by=self.admin, used=True)
+        Invitation.objects.create(code='FREE', created_by=self.admin)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    
+    def test_stats_are_computed_with_a_fixed_number_of_queries(self):
+        # Versiones de las etiquetas, usuarios, invitaciones y los dos top 5
+        with self.assertNumQueries(5):
+            data = self.client.get('/api/admin/stats/').json()
+        
+        self.assertEqual(data['total_users'], 4)
+        self.assertEqual(data['active_users'], 3)
+        self.assertEqual(data['total_likes'], 3)
+        self.assertEqual(data['total_invitations'], 2)
+        self.assertEqual(data['used_invitations'], 1)
+        self.assertEqual(data['unused_invitations'], 1)
+        self.assertEqual(data['most_popular'][0]['id'], self.users[1].id)
+        self.assertEqual(data['most_active_givers'][0]['id'], self.users[0].id)
+    
+    def test_stats_are_cached(self):
+        self.client.get('/api/admin/stats/')
+        
+        with self.assertNumQueries(1):
+            self.client.get('/api/admin/stats/')
+    
+    def test_like_changes_invalidate_the_cached_stats(self):
+        self.client.get('/api/admin/stats/')
+        
+        Like.objects.create(giver=self.users[1], target=self.users[2])
+        
+        data = self.client.get('/api/admin/stats/').json()
+        self.assertEqual(data['total_likes'], 4)
+        self.assertEqual(data['most_popular'][0]['likes_received'], 2)
+
+
+class EstimatedCountTests(TestCase):
+    """Row estimates for the admin changelists"""
+    
+    def setUp(self):
+        self.users = [create_marketer(index) for index in range(5)]
+        self.queryset = User.objects.all()
+        self.table = User._meta.db_table
+    
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(self.table)}')
+    
+    def test_small_tables_are_counted_exactly(self):
+        self.assertEqual(estimate_table_rows(self.queryset, threshold=10), 5)
+    
+    def test_large_tables_without_statistics_fall_back_to_a_real_count(self):
+        self.assertIsNone(estimate_table_rows(self.queryset, threshold=2))
+    
+    def test_large_tables_use_the_analyze_statistics(self):
+        self.analyze()
+        self.assertEqual(estimate_table_rows(self.queryset, threshold=2), 5)
+    
+    def test_stale_statistics_are_capped_by_the_highest_rowid(self):
+        self.analyze()
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE sqlite_stat1 SET stat = '1000000 1' WHERE tbl = %s", [self.table])
+        
+        estimate = estimate_table_rows(self.queryset, threshold=2)
+        self.assertEqual(estimate, max(user.id for user in self.users))
+    
+    def test_changelist_uses_the_estimate(self):
+        admin_user = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com',
+            password='Marketeros-2024!', is_marketer=False
+        )
+        self.client.force_login(admin_user)
+        
+        response = self.client.get('/admin/voting/user/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].paginator.count, 6)
+
+
+class LikeResetTests(TestCase):
+    """Chunked reset of the current round likes"""
+    
+    def setUp(self):
+        like_graph.invalidate()
+        self.users = [create_marketer(index) for index in range(4)]
+        for giver in self.users[1:]:
+            Like.objects.create(giver=giver, target=self.users[0])
+        Like.objects.create(giver=self.users[0], target=self.users[1])
+        self.admin = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com',
+            password='Marketeros-2024!', is_marketer=False
+        )
+        self.reset = LikeReset.objects.create(requested_by=self.admin)
+    
+    def test_likes_are_deleted_in_chunks_with_progress(self):
+        progress = []
+        run_like_reset(self.reset.id, chunk_size=3, on_progress=lambda *args: progress.append(args))
+        
+        self.assertEqual(progress, [(3, 4), (4, 4)])
+        self.assertFalse(Like.objects.current().exists())
+        self.assertEqual(LikeEvent.objects.filter(kind=LikeEvent.KIND_REMOVED).count(), 4)
+        
+        self.reset.refresh_from_db()
+        self.assertEqual(self.reset.status, LikeReset.STATUS_COMPLETED)
+        self.assertEqual(self.reset.total_likes, 4)
+        self.assertEqual(self.reset.deleted_likes, 4)
+    
+    def test_likes_committed_after_the_last_chunk_keep_counting(self):
+        refresh_counts = UserStats.refresh_counts
+        
+        def like_then_refresh(*args):
+            # Like de otro worker confirmado entre el último lote y el recuento
+            Like.objects.create(giver=self.users[3], target=self.users[2])
+            return refresh_counts(*args)
+        
+        with mock.patch.object(UserStats, 'refresh_counts', side_effect=like_then_refresh):
+            run_like_reset(self.reset.id, chunk_size=2)
+        
+        stats = UserStats.objects.get(user=self.users[2])
+        self.assertEqual(stats.likes_received, 1)
+        self.assertEqual(stats.rank, 1)
+        self.assertEqual(UserStats.objects.get(user=self.users[0]).likes_received, 0)
+        self.assertIsNone(UserStats.objects.get(user=self.users[0]).rank)
+
+
+class RoundCloseTests(TestCase):
+    """Closing a round freezes its ranking and opens the next one"""
+    
+    def setUp(self):
+        like_graph.invalidate()
+        self.users = [create_marketer(index) for index in range(3)]
+        Like.objects.create(giver=self.users[0], target=self.users[1])
+        Like.objects.create(giver=self.users[2], target=self.users[1])
+        Like.objects.create(giver=self.users[1], target=self.users[2])
+        self.admin = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com',
+            password='Marketeros-2024!', is_marketer=False
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    
+    def test_close_freezes_the_ranking_and_opens_a_new_round(self):
+        current = VotingRound.get_current()
+        
+        response = self.client.post('/api/admin/rounds/close/', {'confirm': True, 'next_name': 'Final'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        
+        self.assertEqual(
+            list(RankingSnapshot.objects.filter(round=current).values_list('user_id', 'likes_received', 'rank')),
+            [(self.users[1].id, 2, 1), (self.users[2].id, 1, 2)]
+        )
+        next_round = VotingRound.get_current()
+        self.assertEqual(next_round.name, 'Final')
+        self.assertEqual(response.json()['current_round']['id'], next_round.id)
+        self.assertFalse(Like.objects.current().exists())
+        self.assertFalse(UserStats.objects.filter(likes_received__gt=0).exists())
+    
+    def test_closing_an_already_closed_round_is_rejected(self):
+        stale = VotingRound.get_current()
+        stale.close(closed_by=self.admin)
+        
+        with self.assertRaises(RoundAlreadyClosed):
+            stale.close(closed_by=self.admin)
+        
+        self.assertEqual(VotingRound.objects.filter(is_active=True).count(), 1)
+        self.assertEqual(VotingRound.objects.count(), 2)
+        self.assertEqual(RankingSnapshot.objects.filter(round=stale).count(), 2)
+    
+    def test_concurrent_close_returns_conflict(self):
+        stale = VotingRound.get_current()
+        stale.close(closed_by=self.admin)
+        
+        # La otra petición leyó la ronda antes de que se cerrara
+        with mock.patch.object(VotingRound, 'get_current', return_value=stale):
+            response = self.client.post('/api/admin/rounds/close/', {'confirm': True}, format='json')
+        
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(VotingRound.objects.count(), 2)
+
+
+class RankHistoryTests(TestCase):
+    """Incremental rank updates and the delta-encoded history"""
+    
+    def setUp(self):
+        like_graph.invalidate()
+        self.users = [create_marketer(index) for index in range(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+    
+    def ranks(self):
+        return dict(UserStats.objects.values_list('user_id', 'rank'))
+    
+    def test_incremental_ranks_match_a_full_recompute(self):
+        likes = [(0, 1), (2, 1), (3, 2), (4, 3), (1, 3), (0, 3), (2, 4)]
+        for giver, target in likes:
+            Like.objects.create(giver=self.users[giver], target=self.users[target])
+        Like.objects.get(giver=self.users[0], target=self.users[3]).delete()
+        Like.objects.get(giver=self.users[2], target=self.users[1]).delete()
+        
+        incremental = self.ranks()
+        UserStats.update_all_rankings()
+        self.assertEqual(incremental, self.ranks())
+    
+    def test_a_like_records_history_for_the_target_and_shifted_peers(self):
+        Like.objects.create(giver=self.users[0], target=self.users[1])
+        Like.objects.create(giver=self.users[0], target=self.users[2])
+        RankHistory.objects.all().delete()
+        
+        # Deshace el empate: el destino sigue primero y el otro baja un puesto
+        Like.objects.create(giver=self.users[3], target=self.users[2])
+        self.assertEqual(self.ranks()[self.users[1].id], 2)
+        self.assertEqual(
+            list(RankHistory.objects.values_list('user_id', 'rank', 'delta')),
+            [(self.users[1].id, 2, -1)]
+        )
+        
+        Like.objects.create(giver=self.users[4], target=self.users[1])
+        self.assertEqual(
+            list(RankHistory.objects.order_by('id').values_list('user_id', 'rank', 'delta')),
+            [(self.users[1].id, 2, -1), (self.users[1].id, 1, 1)]
+        )
+    
+    def test_like_cost_does_not_grow_with_the_ties(self):
+        Like.objects.create(giver=self.users[0], target=self.users[2])
+        # 20 marketeros empatados a un like con el destino
+        extra = [create_marketer(index) for index in range(5, 25)]
+        with suppress_like_signals():
+            for giver, target in zip(extra, extra[1:] + extra[:1]):
+                Like.objects.create(giver=giver, target=target)
+        UserStats.refresh_counts()
+        UserStats.update_all_rankings()
+        RankHistory.objects.all().delete()
+        like_graph.ensure_fresh(force=True)
+        
+        # Contadores, desplazamiento de los empatados, historial y etiquetas
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(32):
+                Like.objects.create(giver=self.users[3], target=self.users[2])
+        
+        # El destino sigue primero: solo los empatados desplazados escriben historial
+        self.assertEqual(
+            sorted(RankHistory.objects.values_list('user_id', 'rank', 'delta')),
+            [(user.id, 2, -1) for user in extra]
+        )
+        incremental = self.ranks()
+        UserStats.update_all_rankings()
+        self.assertEqual(incremental, self.ranks())
+        self.assertEqual(incremental[extra[0].id], 2)
+    
+    def test_history_and_top_movers(self):
+        Like.objects.create(giver=self.users[0], target=self.users[1])
+        Like.objects.create(giver=self.users[2], target=self.users[3])
+        Like.objects.create(giver=self.users[4], target=self.users[1])
+        Like.objects.create(giver=self.users[1], target=self.users[3])
+        Like.objects.create(giver=self.users[0], target=self.users[3])
+        
+        history = self.client.get(f'/api/marketers/{self.users[3].id}/rank-history/').json()['history']
+        # Incluye el puesto que bajó cuando el otro usuario deshizo el empate
+        self.assertEqual(
+            [(entry['rank'], entry['delta']) for entry in history], [(1, 5), (2, -1), (1, 1)]
+        )
+        
+        movers = self.client.get('/api/marketers/ranking/top-movers/').json()['movers']
+        self.assertEqual([mover['user_id'] for mover in movers], [self.users[3].id, self.users[1].id])
+        self.assertEqual(movers[0]['climbed'], 5)
+    
+    def test_large_deltas_are_stored(self):
+        RankHistory.record([(self.users[1].id, None, 1)], unranked_position=50001)
+        self.assertEqual(RankHistory.objects.get().delta, 50000)
+
+
+class EventReplayTests(TestCase):
+    """Projections folded from the like event log"""
+    
+    def setUp(self):
+        cache.clear()
+        self.users = [create_marketer(index) for index in range(3)]
+        self.round = VotingRound.get_current()
+    
+    def event(self, giver, target, kind=LikeEvent.KIND_ADDED, **fields):
+        return LikeEvent.objects.create(
+            kind=kind, round=self.round,
+            giver_id=self.users[giver].id, target_id=self.users[target].id, **fields
+        )
+    
+    def stats(self, index):
+        return UserStats.objects.get(user=self.users[index])
+    
+    def test_rebuild_folds_the_whole_log(self):
+        self.event(0, 1)
+        self.event(2, 1)
+        self.event(0, 2)
+        self.event(0, 2, kind=LikeEvent.KIND_REMOVED)
+        
+        output = StringIO()
+        call_command('replay_like_events', '--rebuild', stdout=output)
+        
+        self.assertIn('4 eventos aplicados', output.getvalue())
+        self.assertEqual((self.stats(1).likes_received, self.stats(1).rank), (2, 1))
+        self.assertEqual(self.stats(0).likes_given, 1)
+        self.assertEqual(self.stats(2).likes_received, 0)
+        self.assertEqual(ProjectionCheckpoint.objects.get(name=USER_STATS_PROJECTION).position, LikeEvent.objects.last().id)
+    
+    def test_failed_rebuild_leaves_the_stats_untouched(self):
+        self.event(0, 1)
+        replay_user_stats()
+        
+        with mock.patch.object(UserStats, 'update_all_rankings', side_effect=RuntimeError('caída')):
+            with self.assertRaises(RuntimeError):
+                replay_user_stats(rebuild=True)
+        
+        self.assertEqual((self.stats(1).likes_received, self.stats(1).rank), (1, 1))
+    
+    def test_catch_up_picks_events_committed_out_of_order(self):
+        self.event(0, 1)
+        late_id = self.event(2, 1).id
+        self.event(0, 2)
+        # La transacción del segundo evento aún no se ha confirmado
+        LikeEvent.objects.filter(id=late_id).delete()
+        self.assertEqual(replay_user_stats(), 2)
+        self.assertEqual(self.stats(1).likes_received, 1)
+        self.assertEqual([item[0] for item in replay_activity()['items']], [late_id + 1, late_id - 1])
+        
+        self.event(2, 1, id=late_id)
+        
+        self.assertEqual(replay_user_stats(), 0)
+        self.assertEqual((self.stats(1).likes_received, self.stats(1).rank), (2, 1))
+        self.assertEqual(self.stats(2).likes_given, 1)
+        self.assertEqual(
+            [item[0] for item in replay_activity()['items']], [late_id + 1, late_id, late_id - 1]
+        )
+        # Releer la ventana no aplica dos veces los mismos eventos
+        self.assertEqual(replay_user_stats(), 0)
+        self.assertEqual(self.stats(1).likes_received, 2)
+        self.assertEqual(len(replay_activity()['items']), 3)
+    
+    def test_activity_reads_do_not_rescan_the_log_within_the_interval(self):
+        first = self.event(0, 1)
+        get_recent_activity()
+        self.event(2, 1)
+        
+        with self.assertNumQueries(0):
+            self.assertEqual([item[0] for item in get_recent_activity()], [first.id])
+        
+        with mock.patch('voting.projections.time.time', return_value=time.time() + 60):
+            self.assertEqual(len(get_recent_activity()), 2)
+
+
+class ThrottleTests(TestCase):
+    """Token buckets shared by every worker"""
+    
+    def setUp(self):
+        cache.clear()
+        create_marketer(0)
+        self.client = APIClient()
+    
+    def login(self, email='marketer0@example.com'):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': 'incorrecta'}, format='json')
+    
+    def test_attempts_per_email_are_limited_with_retry_after(self):
+        for _ in range(5):
+            self.assertNotEqual(self.login().status_code, 429)
+        
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '12')
+        # Otro email tiene su propio bucket
+        self.assertNotEqual(self.login('otro@example.com').status_code, 429)
+    
+    def test_buckets_live_in_the_shared_table(self):
+        for _ in range(5):
+            self.login()
+        
+        # Otro worker no comparte la caché local, pero sí la tabla
+        cache.clear()
+        self.assertEqual(self.login().status_code, 429)
+        self.assertEqual(ThrottleBucket.objects.filter(key__startswith='voting:throttle:login:').count(), 2)
+    
+    def test_buckets_refill_over_time(self):
+        now = time.time()
+        with mock.patch('voting.throttling.time.time', return_value=now):
+            for _ in range(6):
+                self.login()
+        
+        with mock.patch('voting.throttling.time.time', return_value=now + 12):
+            self.assertNotEqual(self.login().status_code, 429)
+            self.assertEqual(self.login().status_code, 429)
+    
+    def test_refilled_buckets_are_purged(self):
+        self.login()
+        ThrottleBucket.objects.update(expires_at=timezone.now())
+        
+        self.assertEqual(purge_expired_buckets(), 2)
+        self.assertFalse(ThrottleBucket.objects.exists())
+
+
+class InvitationCacheTests(TestCase):
+    """Cached invitation lookups, negative entries and the bloom filter"""
+    
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com',
+            password='Marketeros-2024!', is_marketer=False
+        )
+        self.first = Invitation.objects.create(code='PRIMERA', created_by=self.admin)
+        self.second = Invitation.objects.create(code='SEGUNDA', created_by=self.admin)
+    
+    def test_unknown_codes_are_rejected_by_the_bloom_filter(self):
+        get_invitation('PRIMERA')
+        
+        # Solo la lectura de las versiones: ni la tabla ni una entrada por código
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_invitation('NO-EXISTE'))
+    
+    def test_lookups_are_cached(self):
+        get_invitation('PRIMERA')
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(get_invitation('PRIMERA').id, self.first.id)
+    
+    def test_claims_only_invalidate_their_code(self):
+        get_invitation('PRIMERA')
+        get_invitation('SEGUNDA')
+        version = get_tag_version(INVITATIONS_TAG)
+        
+        user = create_marketer(0)
+        self.first.used_by = user
+        self.first.save()
+        
+        self.assertEqual(get_tag_version(INVITATIONS_TAG), version)
+        self.assertTrue(get_invitation('PRIMERA').used)
+        with self.assertNumQueries(1):
+            self.assertFalse(get_invitation('SEGUNDA').used)
+    
+    def test_registration_claim_refreshes_the_cached_code(self):
+        self.assertFalse(get_invitation('PRIMERA').used)
+        
+        response = APIClient().post('/api/auth/register/', {
+            'invitation_code': 'PRIMERA',
+            'email': 'nuevo@example.com',
+            'first_name': 'Nuevo',
+            'last_name': 'Marketer',
+            'password': 'Marketeros-2024!',
+            'confirm_password': 'Marketeros-2024!'
+        }, format='json')
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(get_invitation('PRIMERA').used)
+    
+    def test_new_and_renamed_codes_rebuild_the_bloom_filter(self):
+        self.assertIsNone(get_invitation('TERCERA'))
+        
+        Invitation.objects.create(code='TERCERA', created_by=self.admin)
+        self.assertIsNotNone(get_invitation('TERCERA'))
+        
+        self.second.code = 'RENOMBRADA'
+        self.second.save()
+        self.assertIsNone(get_invitation('SEGUNDA'))
+        self.assertEqual(get_invitation('RENOMBRADA').id, self.second.id)
+    
+    def test_deleted_codes_are_not_served_from_the_cache(self):
+        get_invitation('PRIMERA')
+        version = get_tag_version(INVITATIONS_TAG)
+        
+        self.first.delete()
+        
+        self.assertEqual(get_tag_version(INVITATIONS_TAG), version)
+        self.assertIsNone(get_invitation('PRIMERA'))
+
+
+class RegistrationClaimTests(TestCase):
+    """Invitation claims guarded against concurrent registrations"""
+    
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com',
+            password='Marketeros-2024!', is_marketer=False
+        )
+        self.invitation = Invitation.objects.create(code='CANJEAME', created_by=self.admin)
+        # La búsqueda queda en caché como libre, como en otro worker
+        get_invitation('CANJEAME')
+    
+    def register(self, **extra):
+        return APIClient().post('/api/auth/register/', {
+            'invitation_code': 'CANJEAME',
+            'email': 'nuevo@example.com',
+            'first_name': 'Nuevo',
+            'last_name': 'Marketer',
+            'password': 'Marketeros-2024!',
+            'confirm_password': 'Marketeros-2024!',
+            **extra
+        }, format='json')
+    
+    def test_invitation_claimed_behind_the_cache_is_rejected(self):
+        Invitation.objects.filter(id=self.invitation.id).update(used=True)
+        
+        response = self.register()
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ya ha sido usado', response.content.decode())
+        self.assertFalse(User.objects.filter(email='nuevo@example.com').exists())
+    
+    def test_invitation_expired_behind_the_cache_is_reported_as_expired(self):
+        Invitation.objects.filter(id=self.invitation.id).update(expires_at=timezone.now())
+        
+        response = self.register()
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ha expirado', response.content.decode())
+        self.assertFalse(UserStats.objects.filter(user__email='nuevo@example.com').exists())
+    
+    def test_broken_avatar_is_logged_and_registration_continues(self):
+        with self.assertLogs('voting.serializers', 'WARNING'):
+            response = self.register(avatar='data:image/png;base64,no-es-base64')
+        
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(email='nuevo@example.com')
+        self.assertFalse(user.avatar)
+        self.invitation.refresh_from_db()
+        self.assertEqual(self.invitation.used_by, user)
+
+
+class PasswordRehashTests(TestCase):
+    """Outdated password hashes are upgraded on login"""
+    
+    def setUp(self):
+        self.user = create_marketer(0)
+        self.user.password = make_password('Marketeros-2024!', hasher='pbkdf2_sha256')
+        self.user.save(update_fields=['password'])
+        self.client = APIClient()
+    
+    def login(self, password='Marketeros-2024!', email='marketer0@example.com'):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': password}, format='json')
+    
+    def test_login_upgrades_the_hash(self):
+        self.assertEqual(self.login().status_code, 200)
+        
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith(f'{get_hashers()[0].algorithm}$'))
+        self.assertEqual(self.login().status_code, 200)
+    
+    def test_failed_login_keeps_the_hash(self):
+        self.assertNotEqual(self.login('incorrecta').status_code, 200)
+        
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+    
+    def test_rehash_keeps_the_cached_payloads(self):
+        version = get_tag_version(user_tag(self.user.id))
+        
+        self.login()
+        
+        self.assertEqual(get_tag_version(user_tag(self.user.id)), version)
+    
+    def test_unknown_users_pay_a_dummy_hash(self):
+        with mock.patch('voting.backends.run_dummy_hash') as dummy_hash:
+            self.assertNotEqual(self.login(email='nadie@example.com').status_code, 200)
+        
+        dummy_hash.assert_called_once_with('Marketeros-2024!')
+
+
+class UserDetailQueryCountTests(TestCase):
+    """Query cost of the marketer detail endpoint"""
+    
+    def setUp(self):
+        cache.clear()
+        like_graph.invalidate()
+        self.users = [create_marketer(index) for index in range(4)]
+        self.target = self.users[0]
+        for giver in self.users[1:]:
+            Like.objects.create(giver=giver, target=self.target)
+        Like.objects.create(giver=self.target, target=self.users[1])
+        cache.clear()
+        
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[1])
+        self.url = f'/api/marketers/{self.target.id}/'
+    
+    def test_detail_costs_four_queries_on_a_cache_miss(self):
+        # Versiones de las etiquetas, usuario, likes dados y likes recibidos
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['received_likes']), 3)
+        self.assertEqual(len(response.data['given_likes']), 1)
+    
+    def test_detail_is_served_from_cache(self):
+        self.client.get(self.url)
+        
+        # Solo se comprueban las versiones de las etiquetas
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, 200)
+    
+    def test_like_change_invalidates_cached_detail(self):
+        self.client.get(self.url)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.get(giver=self.users[2], target=self.target).delete()
+        
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        
+        self.assertEqual(len(response.data['received_likes']), 2)
+    
+    def test_profile_change_invalidates_cached_detail_of_liked_users(self):
+        self.client.get(self.url)
+        
+        giver = self.users[3]
+        giver.first_name = 'Renamed'
+        giver.save()
+        
+        response = self.client.get(self.url)
+        names = {like['name'] for like in response.data['received_likes']}
+        self.assertIn('Renamed Test', names)
+    
+    def test_tag_bump_from_another_worker_invalidates_cached_detail(self):
+        self.client.get(self.url)
+        
+        # Otro worker solo comparte la tabla de etiquetas, no la caché local
+        bump_tags(user_tag(self.target.id))
+        
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+    
+    def test_cached_avatar_urls_follow_each_request(self):
+        User.objects.filter(id=self.target.id).update(avatar='avatars/target.png')
+        bump_tags(user_tag(self.target.id))
+        
+        first = self.client.get(self.url).data
+        second = self.client.get(self.url, secure=True).data
+        
+        self.assertEqual(first['avatar'], 'http://testserver/media/avatars/target.png')
+        self.assertEqual(second['avatar'], 'https://testserver/media/avatars/target.png')
+        self.assertEqual(second['stats']['avatar'], 'https://testserver/media/avatars/target.png')
+        # En caché solo se guarda la ruta relativa
+        self.assertEqual(cache.get(user_detail_cache_key(self.target.id))['avatar'], '/media/avatars/target.png')
+
+
+class LikeEdgesTests(TestCase):
+    """Shared projection of the likes given and received by a user"""
+    
+    def setUp(self):
+        cache.clear()
+        like_graph.invalidate()
+        self.users = [create_marketer(index) for index in range(4)]
+        self.user = self.users[0]
+        Like.objects.create(giver=self.users[1], target=self.user)
+        Like.objects.create(giver=self.users[2], target=self.user)
+        Like.objects.create(giver=self.user, target=self.users[3])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def test_edges_are_built_with_two_queries_newest_first(self):
+        with self.assertNumQueries(2):
+            edges = build_like_edges(self.user.id)
+        
+        self.assertEqual((edges['given_count'], edges['received_count']), (1, 2))
+        self.assertEqual([edge['user']['id'] for edge in edges['received']], [self.users[2].id, self.users[1].id])
+        self.assertEqual(edges['given'][0]['user'], {
+            'id': self.users[3].id,
+            'name': 'Marketer3 Test',
+            'email': 'marketer3@example.com',
+            'avatar': None
+        })
+        self.assertEqual(edge_summary(edges['given'][0]), {'id': self.users[3].id, 'name': 'Marketer3 Test', 'avatar': None})
+    
+    def test_edges_are_cached_until_a_like_changes(self):
+        get_like_edges(self.user.id)
+        with self.assertNumQueries(1):
+            get_like_edges(self.user.id)
+        
+        Like.objects.get(giver=self.users[1], target=self.user).delete()
+        
+        self.assertEqual(get_like_edges(self.user.id)['received_count'], 1)
+    
+    def test_edges_only_cover_the_current_round(self):
+        get_like_edges(self.user.id)
+        
+        VotingRound.get_current().close()
+        
+        edges = get_like_edges(self.user.id)
+        self.assertEqual((edges['given_count'], edges['received_count']), (0, 0))
+    
+    def test_stats_and_activity_read_the_projection(self):
+        get_like_edges(self.user.id)
+        
+        stats = self.client.get('/api/user/stats/').json()
+        self.assertEqual((stats['likes_given'], stats['likes_received'], stats['remaining_likes']), (1, 2, 4))
+        self.assertEqual(stats['given_likes_details'][0]['email'], 'marketer3@example.com')
+        
+        activity = self.client.get('/api/activity/').json()
+        self.assertEqual([item['from']['id'] for item in activity['recent_received']], [self.users[2].id, self.users[1].id])
+        self.assertEqual(activity['recent_given'][0]['to']['name'], 'Marketer3 Test')
+
+
+class HotQueryIndexTests(TestCase):
+    """Hot querysets are served by their composite indexes"""
+    
+    def setUp(self):
+        self.users = [create_marketer(index) for index in range(3)]
+        Like.objects.create(giver=self.users[0], target=self.users[1])
+        Like.objects.create(giver=self.users[2], target=self.users[1])
+    
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+    
+    def test_like_edges_use_the_round_prefixed_indexes(self):
+        self.assertUsesIndex(
+            Like.objects.current().filter(giver_id=self.users[0].id).order_by('-created_at'),
+            'likes_round_giver_created_idx'
+        )
+        self.assertUsesIndex(
+            Like.objects.current().filter(target_id=self.users[1].id).order_by('-created_at'),
+            'likes_round_target_created_idx'
+        )
+    
+    def test_ranking_uses_the_partial_leaderboard_index(self):
+        self.assertUsesIndex(
+            UserStats.objects.filter(is_listed=True, likes_received__gt=0).order_by('-likes_received', 'sort_name')[:50],
+            'user_stats_leaderboard_idx'
+        )
+    
+    def test_explain_command_reports_every_hot_query(self):
+        output = StringIO()
+        call_command('explain_hot_queries', stdout=output)
+        
+        self.assertIn('✅ like_edges_given', output.getvalue())
+        self.assertIn('✅ ranking', output.getvalue())
+        self.assertRegex(output.getvalue(), r'\d+ de \d+ consultas')
+
+
+class ListingSyncTests(TestCase):
+    """Denormalized sort name and listing flag on UserStats"""
+    
+    def setUp(self):
+        cache.clear()
+        like_graph.invalidate()
+        leaderboard.invalidate()
+        self.users = [create_marketer(index) for index in range(3)]
+        Like.objects.create(giver=self.users[0], target=self.users[1])
+        Like.objects.create(giver=self.users[0], target=self.users[2])
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+    
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+    
+    def ranking_ids(self):
+        return [row['user_id'] for row in self.client.get('/api/marketers/ranking/').json()['ranking']]
+    
+    def test_stats_rows_start_with_the_listing_columns(self):
+        stats = self.stats(self.users[1])
+        self.assertEqual((stats.sort_name, stats.is_listed), ('marketer1 test', True))
+    
+    def test_rename_updates_the_sort_name_and_tie_order(self):
+        self.assertEqual(self.ranking_ids(), [self.users[1].id, self.users[2].id])
+        
+        self.users[2].first_name = 'Aaron'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[2].save()
+        
+        self.assertEqual(self.stats(self.users[2]).sort_name, 'aaron test')
+        self.assertEqual(self.ranking_ids(), [self.users[2].id, self.users[1].id])
+    
+    def test_unrelated_saves_skip_the_sync(self):
+        self.users[2].bio = 'Nueva bio'
+        with CaptureQueriesContext(connection) as queries:
+            self.users[2].save(update_fields=['bio'])
+        
+        self.assertFalse([query for query in queries.captured_queries if 'user_stats' in query['sql']])
+    
+    def test_incomplete_registrations_leave_the_ranking(self):
+        self.users[1].registration_completed = False
+        self.users[1].save()
+        
+        self.assertFalse(self.stats(self.users[1]).is_listed)
+        self.assertEqual(self.ranking_ids(), [self.users[2].id])
+    
+    def test_admin_bulk_actions_resync_the_listing_flag(self):
+        admin_user = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com',
+            password='Marketeros-2024!', is_marketer=False
+        )
+        self.client.force_login(admin_user)
+        
+        self.client.post('/admin/voting/user/', {
+            'action': 'remove_marketer', '_selected_action': [self.users[1].id]
+        })
+        self.assertFalse(self.stats(self.users[1]).is_listed)
+        
+        self.client.post('/admin/voting/user/', {
+            'action': 'make_marketer', '_selected_action': [self.users[1].id]
+        })
+        self.assertTrue(self.stats(self.users[1]).is_listed)
+
+
+class LeaderboardTests(TestCase):
+    """In-memory ranking of the current round"""
+    
+    def setUp(self):
+        cache.clear()
+        like_graph.invalidate()
+        leaderboard.invalidate()
+        self.users = [create_marketer(index) for index in range(4)]
+        with self.captureOnCommitCallbacks(execute=True):
+            for giver in self.users[1:]:
+                Like.objects.create(giver=giver, target=self.users[0])
+            Like.objects.create(giver=self.users[0], target=self.users[2])
+            Like.objects.create(giver=self.users[3], target=self.users[1])
+        
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[1])
+    
+    def test_ranking_matches_stored_ranks(self):
+        response = self.client.get('/api/marketers/ranking/?limit=10')
+        
+        stored = {
+            stats.user_id: stats.rank
+            for stats in UserStats.objects.filter(likes_received__gt=0)
+        }
+        ranking = response.json()['ranking']
+        self.assertEqual([row['user_id'] for row in ranking][0], self.users[0].id)
+        self.assertEqual({row['user_id']: row['rank'] for row in ranking}, stored)
+        self.assertEqual(response.json()['total_ranked'], 3)
+        self.assertEqual(response.json()['my_rank'], stored[self.users[1].id])
+    
+    def test_ranking_limit_is_clamped_and_validated(self):
+        negative = self.client.get('/api/marketers/ranking/?limit=-1')
+        invalid = self.client.get('/api/marketers/ranking/?limit=todos')
+        
+        self.assertEqual([row['user_id'] for row in negative.json()['ranking']], [self.users[0].id])
+        self.assertEqual(invalid.status_code, 400)
+    
+    def test_like_changes_are_applied_without_a_rebuild(self):
+        leaderboard.ensure_fresh(force=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(giver=self.users[2], target=self.users[1])
+            Like.objects.create(giver=self.users[0], target=self.users[1])
+        
+        with self.assertNumQueries(0):
+            top = leaderboard.top(2)
+        self.assertEqual(top, [(self.users[0].id, 3, 1), (self.users[1].id, 3, 1)])
+        self.assertEqual(leaderboard.rank_of(self.users[2].id), 3)
+        self.assertIsNone(leaderboard.rank_of(self.users[3].id))
+    
+    def test_around_me_returns_the_rank_window_and_percentile(self):
+        response = self.client.get('/api/marketers/ranking/around-me/?window=1')
+        
+        data = response.json()
+        self.assertEqual(data['rank'], 2)
+        self.assertEqual(data['percentile'], 25.0)
+        self.assertEqual(data['total_listed'], 4)
+        self.assertEqual(
+            [row['user_id'] for row in data['ranking']],
+            [self.users[0].id, self.users[1].id, self.users[2].id]
+        )
+    
+    def test_around_me_is_bounded_among_many_ties(self):
+        tied = [create_marketer(index) for index in range(4, 24)]
+        me = tied[10]
+        self.client.force_authenticate(me)
+        
+        response = self.client.get('/api/marketers/ranking/around-me/?window=2')
+        
+        expected = [
+            stats.user_id for stats in UserStats.objects.filter(
+                is_listed=True
+            ).order_by('-likes_received', 'sort_name', 'user_id')
+        ]
+        position = expected.index(me.id)
+        self.assertEqual(
+            [row['user_id'] for row in response.json()['ranking']],
+            expected[position - 2:position + 3]
+        )
+
+
+class SingleFlightTests(TestCase):
+    """Coalescing of expensive recomputations"""
+    
+    def test_concurrent_callers_share_one_execution(self):
+        group = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        
+        def recompute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'ranks'
+        
+        results = []
+        leader = threading.Thread(target=lambda: results.append(group.do('ranks', recompute)))
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(target=lambda: results.append(group.do('ranks', recompute)))
+            for _ in range(3)
+        ]
+        for follower in followers:
+            follower.start()
+        # Dar tiempo a que los seguidores se unan a la ejecución en curso
+        time.sleep(0.2)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('ranks', False)] + [('ranks', True)] * 3)
+    
+    def test_manual_rank_refresh_has_a_cooldown(self):
+        client = APIClient()
+        client.force_authenticate(create_marketer(0))
+        
+        first = client.post('/api/rankings/update/')
+        second = client.post('/api/rankings/update/')
+        
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(first.data['shared'])
+        self.assertEqual(second.status_code, 429)
+        self.assertIn('Retry-After', second)
+    
+    def test_cooldown_rejection_is_not_shared_with_callers_without_cooldown(self):
+        started = threading.Event()
+        release = threading.Event()
+        
+        def run_locked(name, func, cooldown):
+            if cooldown:
+                started.set()
+                release.wait(5)
+                raise CooldownActive(30)
+            return func(), False
+        
+        errors = []
+        
+        def manual_refresh():
+            try:
+                run_exclusive('update_rankings', lambda: 'ranks', cooldown=60)
+            except CooldownActive as e:
+                errors.append(e)
+        
+        with mock.patch('voting.singleflight._run_locked', side_effect=run_locked):
+            manual = threading.Thread(target=manual_refresh)
+            manual.start()
+            started.wait(5)
+            results = []
+            job = threading.Thread(
+                target=lambda: results.append(run_exclusive('update_rankings', lambda: 'ranks'))
+            )
+            job.start()
+            job.join(5)
+            release.set()
+            manual.join(5)
+        
+        self.assertEqual(results, [('ranks', False)])
+        self.assertEqual(len(errors), 1)
+
+
+class IdempotencyKeyTests(TestCase):
+    """Retried POSTs with an Idempotency-Key"""
+    
+    def setUp(self):
+        cache.clear()
+        like_graph.invalidate()
+        self.giver, self.target, self.other = [create_marketer(index) for index in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.giver)
+    
+    def toggle(self, target, key):
+        return self.client.post(
+            '/api/likes/toggle/', {'marketer_id': target.id}, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+    
+    def test_retried_toggle_replays_without_flipping_the_like(self):
+        first = self.toggle(self.target, 'retry-1')
+        retry = self.toggle(self.target, 'retry-1')
+        
+        self.assertEqual(retry.status_code, first.status_code)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertTrue(Like.objects.current().filter(giver=self.giver, target=self.target).exists())
+    
+    def test_key_reused_with_another_body_is_rejected(self):
+        self.toggle(self.target, 'retry-2')
+        
+        response = self.toggle(self.other, 'retry-2')
+        
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Like.objects.current().filter(giver=self.giver, target=self.other).exists())
+    
+    def test_abandoned_reservation_is_taken_over_after_its_lease(self):
+        self.toggle(self.target, 'retry-3')
+        # El proceso original murió sin guardar la respuesta
+        IdempotencyRecord.objects.update(
+            status_code=None, response_body='', locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        
+        retry = self.toggle(self.target, 'retry-3')
+        replayed = self.toggle(self.target, 'retry-3')
+        
+        self.assertEqual(retry.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', retry)
+        self.assertEqual(replayed.json(), retry.json())
+        self.assertIsNone(IdempotencyRecord.objects.get().locked_until)
+    
+    def test_reservation_in_progress_is_rejected_until_its_lease_expires(self):
+        self.toggle(self.target, 'retry-4')
+        IdempotencyRecord.objects.update(
+            status_code=None, response_body='', locked_until=timezone.now() + timedelta(seconds=30)
+        )
+        
+        response = self.toggle(self.target, 'retry-4')
+        
+        self.assertEqual(response.status_code, 409)
+    
+    def register(self, code, email, address):
+        return APIClient().post('/api/auth/register/', {
+            'invitation_code': code,
+            'email': email,
+            'first_name': 'Nuevo',
+            'last_name': 'Marketer',
+            'password': 'Marketeros-2024!',
+            'confirm_password': 'Marketeros-2024!'
+        }, format='json', HTTP_IDEMPOTENCY_KEY='registro', REMOTE_ADDR=address)
+    
+    def test_anonymous_keys_are_scoped_by_client(self):
+        for code in ['PRIMERA', 'SEGUNDA']:
+            Invitation.objects.create(code=code, created_by=self.giver)
+        
+        first = self.register('PRIMERA', 'primero@example.com', '10.0.0.1')
+        second = self.register('SEGUNDA', 'segundo@example.com', '10.0.0.2')
+        
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', second)
+    
+    def test_replayed_registration_issues_new_tokens_without_storing_them(self):
+        Invitation.objects.create(code='PRIMERA', created_by=self.giver)
+        
+        first = self.register('PRIMERA', 'primero@example.com', '10.0.0.1')
+        retry = self.register('PRIMERA', 'primero@example.com', '10.0.0.1')
+        
+        stored = IdempotencyRecord.objects.get().response_body
+        self.assertNotIn(first.json()['access'], stored)
+        self.assertNotIn(first.json()['refresh'], stored)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['user'], first.json()['user'])
+        self.assertNotEqual(retry.json()['refresh'], first.json()['refresh'])
+    
+    def test_fingerprint_is_keyed_so_passwords_cannot_be_guessed_from_it(self):
+        Invitation.objects.create(code='PRIMERA', created_by=self.giver)
+        
+        self.register('PRIMERA', 'primero@example.com', '10.0.0.1')
+        
+        body = json.dumps({
+            'invitation_code': 'PRIMERA',
+            'email': 'primero@example.com',
+            'first_name': 'Nuevo',
+            'last_name': 'Marketer',
+            'password': 'Marketeros-2024!',
+            'confirm_password': 'Marketeros-2024!'
+        }, sort_keys=True)
+        self.assertNotEqual(
+            IdempotencyRecord.objects.get().fingerprint, hashlib.sha256(body.encode()).hexdigest()
+        )
+
 
-# Create your tests here.
+class JobQueueTests(TestCase):
+    """Background jobs run by manage.py run_worker"""
+    
+    def setUp(self):
+        cache.clear()
+        like_graph.invalidate()
+        self.admin = User.objects.create_superuser(
+            username='admin@example.com', email='admin@example.com', password='Marketeros-2024!'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    
+    def test_bulk_invitations_are_created_by_the_worker(self):
+        response = self.client.post('/api/admin/invitations/bulk/', {'count': 3}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Invitation.objects.count(), 0)
+        
+        self.assertTrue(run_job(claim_job('test')))
+        
+        job = self.client.get(f"/api/admin/jobs/{response.data['job']['id']}/").data
+        self.assertEqual(job['status'], Job.STATUS_COMPLETED)
+        self.assertEqual(job['progress'], 100)
+        self.assertEqual(len(job['result']['codes']), 3)
+        self.assertEqual(Invitation.objects.filter(created_by=self.admin).count(), 3)
+    
+    def test_bulk_invitations_request_is_validated_before_queueing(self):
+        invalid = [
+            {'count': 2, 'emails': 5},
+            {'count': 101},
+            {'count': 1, 'emails': ['a@example.com', 'b@example.com']},
+        ]
+        for data in invalid:
+            response = self.client.post('/api/admin/invitations/bulk/', data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+        self.assertFalse(Job.objects.exists())
+    
+    def test_bulk_invitations_retry_reuses_the_stored_codes(self):
+        job = enqueue('bulk_invitations', {'count': 3}, created_by=self.admin)
+        claimed = claim_job('test')
+        # El primer intento guardó los códigos y creó una invitación antes de caer
+        Job.objects.filter(id=job.id).update(result={'codes': ['AAA', 'BBB', 'CCC']})
+        Invitation.objects.create(code='AAA', created_by=self.admin)
+        claimed.refresh_from_db()
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(run_job(claimed))
+        
+        self.assertEqual(
+            sorted(Invitation.objects.values_list('code', flat=True)), ['AAA', 'BBB', 'CCC']
+        )
+        self.assertEqual(
+            sum('INSERT INTO "invitations"' in query['sql'] for query in queries.captured_queries), 1
+        )
+    
+    def test_job_payload_is_validated_when_queued(self):
+        for payload in [{'count': 0}, {'count': 101}, {'count': 'tres'}, {'count': 2, 'unknown': True}]:
+            response = self.client.post(
+                '/api/admin/jobs/', {'kind': 'bulk_invitations', 'payload': payload}, format='json'
+            )
+            self.assertEqual(response.status_code, 400, payload)
+        
+        with self.assertRaises(ValidationError):
+            enqueue('rebuild_stats', {'unknown': True})
+        self.assertFalse(Job.objects.exists())
+    
+    def test_failed_job_is_retried_then_marked_failed(self):
+        # Payload guardado antes de validarse al encolar
+        job = Job.objects.create(kind='bulk_invitations', payload={'unknown': True}, max_attempts=2)
+        
+        self.assertFalse(run_job(claim_job('test')))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_PENDING)
+        
+        Job.objects.filter(id=job.id).update(run_after=job.created_at)
+        self.assertFalse(run_job(claim_job('test')))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+    
+    def test_abandoned_job_without_attempts_left_is_failed_not_rerun(self):
+        job = enqueue('rebuild_stats', max_attempts=1)
+        claim_job('caido')
+        # El worker murió: su reserva caducó sin terminar el único intento
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        
+        self.assertIsNone(claim_job('test'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 1)
+    
+    def test_running_job_extends_its_lease_without_reporting_progress(self):
+        enqueue('rebuild_stats')
+        job = claim_job('test')
+        
+        slow = {'rebuild_stats': lambda job: time.sleep(0.2)}
+        with mock.patch('voting.jobs.JOB_HEARTBEAT_INTERVAL', 0.01):
+            with mock.patch('voting.jobs.extend_lease') as extend_lease:
+                with mock.patch.dict(JOB_HANDLERS, slow):
+                    self.assertTrue(run_job(job))
+        
+        self.assertGreater(extend_lease.call_count, 1)
+    
+    def test_like_reset_runs_as_a_job(self):
+        users = [create_marketer(index) for index in range(2)]
+        Like.objects.create(giver=users[0], target=users[1])
+        
+        response = self.client.post('/api/admin/likes/reset/', {'confirm': True}, format='json')
+        self.assertEqual(response.status_code, 202)
+        
+        run_job(claim_job('test'))
+        
+        self.assertEqual(LikeReset.objects.get().status, LikeReset.STATUS_COMPLETED)
+        self.assertFalse(Like.objects.current().exists())
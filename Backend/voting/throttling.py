@@ -0,0 +1,174 @@
+"""
+Token-bucket throttles kept in the shared database
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.throttling import BaseThrottle
+
+from .models import ThrottleBucket
+
+
+THROTTLE_BUCKETS = getattr(settings, 'THROTTLE_BUCKETS', {})
+THROTTLE_CACHE_ALIAS = getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')
+THROTTLE_PURGE_INTERVAL = getattr(settings, 'THROTTLE_PURGE_INTERVAL', 300)
+
+REJECTED_KEY_PREFIX = 'voting:throttle:rejected'
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+_last_purge = 0.0
+
+
+def parse_rate(rate):
+    """Turn '10/min' into (capacity, period in seconds)"""
+    capacity, period = rate.split('/')
+    return int(capacity), PERIODS[period]
+
+
+def purge_expired_buckets():
+    """Delete the buckets that have refilled completely"""
+    return ThrottleBucket.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+
+def _maybe_purge():
+    # Como mucho una limpieza por intervalo y proceso, sobre el índice de caducidad
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge >= THROTTLE_PURGE_INTERVAL:
+        _last_purge = now
+        purge_expired_buckets()
+
+
+def rejected_key(scope, kind):
+    return f'{REJECTED_KEY_PREFIX}:{scope}:{kind}'
+
+
+def get_rejection_counts():
+    """Rejected requests per scope and bucket kind since the cache was cleared"""
+    throttle_cache = caches[THROTTLE_CACHE_ALIAS]
+    keys = {
+        rejected_key(scope, kind): (scope, kind)
+        for scope, buckets in THROTTLE_BUCKETS.items()
+        for kind in buckets
+    }
+    counts = throttle_cache.get_many(list(keys))
+    return {
+        f'{scope}_{kind}': counts.get(key, 0)
+        for key, (scope, kind) in keys.items()
+    }
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Per-IP and per-user token buckets configured in settings.THROTTLE_BUCKETS[scope]"""
+    scope = None
+    
+    def __init__(self):
+        self.cache = caches[THROTTLE_CACHE_ALIAS]
+        self.buckets = {
+            kind: parse_rate(rate)
+            for kind, rate in THROTTLE_BUCKETS.get(self.scope, {}).items()
+        }
+        self._wait = None
+    
+    def get_user_ident(self, request):
+        """Identity of the user bucket, or None to skip it"""
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+    
+    def get_idents(self, request):
+        idents = {}
+        if 'ip' in self.buckets:
+            idents['ip'] = self.get_ident(request)
+        if 'user' in self.buckets:
+            user_ident = self.get_user_ident(request)
+            if user_ident is not None:
+                idents['user'] = user_ident
+        return idents
+    
+    def allow_request(self, request, view):
+        if not self.buckets:
+            return True
+        
+        keys = {
+            kind: f'voting:throttle:{self.scope}:{kind}:{ident}'
+            for kind, ident in self.get_idents(request).items()
+        }
+        if not keys:
+            return True
+        
+        _maybe_purge()
+        # Reloj de pared: los buckets se comparten entre procesos
+        now = time.time()
+        # Un bucket sin tocar durante un periodo vuelve a estar lleno
+        expires_at = timezone.now() + timedelta(seconds=max(period for _, period in self.buckets.values()))
+        
+        with transaction.atomic():
+            # Filas llenas para los buckets nuevos; después se leen bloqueadas para
+            # que el leer-modificar-escribir sea atómico entre workers
+            ThrottleBucket.objects.bulk_create([
+                ThrottleBucket(
+                    key=key, tokens=self.buckets[kind][0], refilled_at=now, expires_at=expires_at
+                ) for kind, key in keys.items()
+            ], ignore_conflicts=True)
+            stored = ThrottleBucket.objects.select_for_update().in_bulk(list(keys.values()))
+            
+            rejected = []
+            for kind, key in keys.items():
+                capacity, period = self.buckets[kind]
+                refill = capacity / period
+                bucket = stored[key]
+                tokens = min(capacity, bucket.tokens + max(0.0, now - bucket.refilled_at) * refill)
+                if tokens < 1:
+                    rejected.append(kind)
+                    self._wait = max(self._wait or 0, (1 - tokens) / refill)
+                bucket.tokens, bucket.refilled_at, bucket.expires_at = tokens - 1, now, expires_at
+            
+            # Solo se consume un token si todos los buckets lo permiten
+            if not rejected:
+                ThrottleBucket.objects.bulk_update(
+                    stored.values(), ['tokens', 'refilled_at', 'expires_at']
+                )
+        
+        for kind in rejected:
+            self.record_rejection(kind)
+        return not rejected
+    
+    def record_rejection(self, kind):
+        key = rejected_key(self.scope, kind)
+        if not self.cache.add(key, 1, timeout=None):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, 1, timeout=None)
+    
+    def wait(self):
+        return self._wait
+
+
+class LoginThrottle(TokenBucketThrottle):
+    """Login attempts per IP and per attempted email"""
+    scope = 'login'
+    
+    def get_user_ident(self, request):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        # Hash para que el email no aparezca en la clave del bucket
+        return hashlib.sha1(email.strip().lower().encode()).hexdigest()
+
+
+class InvitationValidationThrottle(TokenBucketThrottle):
+    """Invitation code lookups per IP"""
+    scope = 'invitation'
+
+
+class ToggleLikeThrottle(TokenBucketThrottle):
+    """Like toggles per IP and per user"""
+    scope = 'toggle_like'
@@ -24,16 +24,22 @@ urlpatterns = [
     path('profile/', views.UserProfileView.as_view(), name='user_profile'),
     path('marketers/', views.MarketersListView.as_view(), name='marketers_list'),
     path('marketers/<int:user_id>/', views.user_detail_view, name='user_detail'),
+    path('marketers/<int:user_id>/rank-history/', views.rank_history_view, name='rank_history'),
     path('search/', views.search_marketers_view, name='search_marketers'),
     
     # Estadísticas de usuario
     path('user/stats/', views.user_stats_view, name='user_stats'),
+    path('dashboard/', views.dashboard_view, name='dashboard'),
     path('likes/my-likes/', views.my_likes_view, name='my_likes'),
     path('likes/toggle/', views.toggle_like_view, name='toggle_like'),
+    path('likes/batch/', views.batch_likes_view, name='batch_likes'),
     
     # Rankings
     path('marketers/ranking/', views.ranking_view, name='ranking'),
+    path('marketers/ranking/top-movers/', views.top_movers_view, name='top_movers'),
+    path('marketers/ranking/around-me/', views.ranking_around_me_view, name='ranking_around_me'),
     path('rankings/update/', views.update_rankings_view, name='update_rankings'),
+    path('rounds/', views.voting_rounds_view, name='voting_rounds'),
     
     # Feed de actividad
     path('activity/', views.activity_feed_view, name='activity_feed'),
@@ -42,6 +48,10 @@ urlpatterns = [
     path('admin/stats/', views.admin_stats_view, name='admin_stats'),
     path('admin/invitations/bulk/', views.bulk_create_invitations, name='bulk_invitations'),
     path('admin/likes/reset/', views.reset_all_likes_view, name='reset_likes'),
+    path('admin/rounds/close/', views.close_round_view, name='close_round'),
+    path('admin/likes/reset/<int:reset_id>/', views.reset_likes_progress_view, name='reset_likes_progress'),
+    path('admin/jobs/', views.enqueue_job_view, name='enqueue_job'),
+    path('admin/jobs/<int:job_id>/', views.job_detail_view, name='job_detail'),
     
     # Incluir rutas del router
     path('', include(router.urls)),
@@ -0,0 +1,45 @@
+"""
+Cached public detail payload of a marketer
+"""
+from django.core.cache import cache
+
+from .cache import user_detail_cache_key, USER_DETAIL_CACHE_TIMEOUT
+from .models import User
+from .serializers import UserDetailSerializer
+
+
+def build_user_detail_payload(user_id):
+    """Build the detail payload with a fixed number of queries, or None if not found"""
+    # Los likes salen de la proyección compartida de aristas (2 consultas o caché)
+    user = User.objects.select_related('stats').filter(
+        id=user_id, is_marketer=True, registration_completed=True
+    ).first()
+    if user is None:
+        return None
+    # Sin request: las URLs de los avatares quedan relativas y se pueden cachear
+    return UserDetailSerializer(user).data
+
+
+def _with_absolute_avatars(payload, request):
+    """Copy of the payload with the avatar URLs made absolute for this request"""
+    payload = dict(payload)
+    if payload.get('avatar'):
+        payload['avatar'] = request.build_absolute_uri(payload['avatar'])
+    stats = payload.get('stats')
+    if stats and stats.get('avatar'):
+        payload['stats'] = {**stats, 'avatar': request.build_absolute_uri(stats['avatar'])}
+    return payload
+
+
+def get_user_detail_payload(user_id, request):
+    """Return the cached detail payload, building it on a miss"""
+    key = user_detail_cache_key(user_id)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_user_detail_payload(user_id)
+        # Los usuarios inexistentes no se cachean
+        if payload is None:
+            return None
+        cache.set(key, payload, USER_DETAIL_CACHE_TIMEOUT)
+    # El host y el esquema dependen de cada petición
+    return _with_absolute_avatars(payload, request)
@@ -1,47 +1,85 @@
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from django.db.models import Count, Q
+from django.db.models import Q, Sum
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
-
-from .models import User, Invitation, Like, UserStats
+import math
+
+from .admin_stats import get_admin_stats
+from .cache import invalidate_user_payloads
+from .dashboard import get_dashboard_payload
+from .idempotency import idempotent
+from .jobs import JOB_HANDLERS, enqueue
+from .models import (
+    User, Invitation, Like, UserStats, LikeReset, VotingRound, RankingSnapshot,
+    RankHistory, Job, RoundAlreadyClosed,
+    MAX_LIKES_PER_USER
+)
+from .invitations import get_invitation
+from .leaderboard import (
+    RANKINGS_UPDATE_COOLDOWN, leaderboard, likes_percentile, recompute_rankings
+)
+from .like_edges import edge_summary, get_like_edges
+from .projections import get_recent_activity
+from .resets import start_like_reset
+from .singleflight import CooldownActive, run_exclusive
+from .user_detail import get_user_detail_payload
+from .throttling import (
+    InvitationValidationThrottle, LoginThrottle, ToggleLikeThrottle, get_rejection_counts
+)
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer,
     UserStatsSerializer, LikeSerializer, InvitationSerializer,
-    UserDetailSerializer, RankingSerializer
+    UserDetailSerializer, RankingSerializer, LikeBatchSerializer,
+    LikeResetSerializer, VotingRoundSerializer, JobSerializer,
+    BulkInvitationsPayloadSerializer
 )
 
 
+def registration_payload(user, request):
+    """Registration response body with freshly issued JWT tokens"""
+    refresh = RefreshToken.for_user(user)
+    
+    return {
+        'user': UserProfileSerializer(user, context={'request': request}).data,
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+        'message': 'Usuario registrado exitosamente'
+    }
+
+
+def replay_registration(request, stored):
+    """Rebuild a replayed registration response, issuing new tokens"""
+    return registration_payload(get_object_or_404(User, pk=stored['user_id']), request)
+
+
 class UserRegistrationView(generics.CreateAPIView):
     """User registration endpoint"""
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
     
+    # Los tokens no se guardan con la respuesta: al repetirla se emiten otros
+    @idempotent(store=lambda data: {'user_id': data['user']['id']}, replay=replay_registration)
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
         
-        # Generar tokens JWT
-        refresh = RefreshToken.for_user(user)
-        
-        return Response({
-            'user': UserProfileSerializer(user, context={'request': request}).data,
-            'access': str(refresh.access_token),
-            'refresh': str(refresh),
-            'message': 'Usuario registrado exitosamente'
-        }, status=status.HTTP_201_CREATED)
+        return Response(registration_payload(user, request), status=status.HTTP_201_CREATED)
 
 
 class UserLoginView(generics.GenericAPIView):
     """User login endpoint"""
     serializer_class = UserLoginSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LoginThrottle]
     
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -67,9 +105,7 @@ class MarketersListView(generics.ListAPIView):
         queryset = User.objects.filter(
             is_marketer=True,
             registration_completed=True
-        ).select_related('stats').prefetch_related(
-            'received_likes', 'given_likes'
-        )
+        ).select_related('stats')
         
         # Filtros opcionales
         search = self.request.query_params.get('search', None)
@@ -81,10 +117,8 @@ class MarketersListView(generics.ListAPIView):
                 Q(bio__icontains=search)
             )
         
-        # Ordenamiento por likes recibidos
-        queryset = queryset.annotate(
-            likes_count=Count('received_likes')
-        ).order_by('-likes_count', 'first_name')
+        # Ordenamiento por likes recibidos en la ronda actual
+        queryset = queryset.order_by('-stats__likes_received', 'first_name')
         
         return queryset
     
@@ -118,10 +152,11 @@ class LikeViewSet(ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Like.objects.filter(
+        return Like.objects.current().filter(
             giver=self.request.user
         ).select_related('target')
     
+    @idempotent
     def create(self, request, *args, **kwargs):
         """Create a new like"""
         serializer = self.get_serializer(data=request.data)
@@ -151,42 +186,39 @@ def user_stats_view(request):
     """Get detailed user statistics"""
     user = request.user
     
+    edges = get_like_edges(user.id)
+    
     # Estadísticas básicas
     stats = {
-        'likes_given': user.likes_given_count,
-        'likes_received': user.likes_received_count,
-        'remaining_likes': user.remaining_likes,
+        'likes_given': edges['given_count'],
+        'likes_received': edges['received_count'],
+        'remaining_likes': max(0, MAX_LIKES_PER_USER - edges['given_count']),
         'rank': getattr(user.stats, 'rank', None) if hasattr(user, 'stats') else None
     }
     
-    # Likes dados (con detalles de los usuarios)
-    given_likes = user.given_likes.select_related('target').all()
-    stats['given_likes_details'] = [{
-        'id': like.target.id,
-        'name': like.target.full_name,
-        'email': like.target.email,
-        'avatar': like.target.avatar.url if like.target.avatar else None,
-        'created_at': like.created_at
-    } for like in given_likes]
-    
-    # Likes recibidos (con detalles de los usuarios)
-    received_likes = user.received_likes.select_related('giver').all()
-    stats['received_likes_details'] = [{
-        'id': like.giver.id,
-        'name': like.giver.full_name,
-        'email': like.giver.email,
-        'avatar': like.giver.avatar.url if like.giver.avatar else None,
-        'created_at': like.created_at
-    } for like in received_likes]
+    # Likes dados y recibidos (con detalles de los usuarios)
+    stats['given_likes_details'] = [
+        {**edge['user'], 'created_at': edge['created_at']} for edge in edges['given']
+    ]
+    stats['received_likes_details'] = [
+        {**edge['user'], 'created_at': edge['created_at']} for edge in edges['received']
+    ]
     
     return Response(stats)
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def dashboard_view(request):
+    """Get everything the dashboard needs for its first paint"""
+    return Response(get_dashboard_payload(request.user))
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def my_likes_view(request):
     """Get likes given by current user"""
-    likes = Like.objects.filter(
+    likes = Like.objects.current().filter(
         giver=request.user
     ).select_related('target')
     
@@ -204,20 +236,176 @@ def my_likes_view(request):
 def ranking_view(request):
     """Get marketers ranking"""
     # Obtener parámetros de consulta
-    limit = int(request.query_params.get('limit', 50))
-    
-    # Ranking basado en UserStats
-    ranking = UserStats.objects.select_related('user').filter(
-        user__is_marketer=True,
-        user__registration_completed=True,
-        likes_received__gt=0
-    ).order_by('-likes_received', 'user__first_name')[:limit]
+    try:
+        limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+    except ValueError:
+        return Response({
+            'error': 'Parámetros inválidos'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    round_id = request.query_params.get('round')
     
-    serializer = RankingSerializer(ranking, many=True)
+    # Rondas cerradas: se sirve el ranking congelado sin recalcular
+    if round_id:
+        try:
+            voting_round = VotingRound.objects.get(id=round_id)
+        except (VotingRound.DoesNotExist, ValueError):
+            return Response({
+                'error': 'Ronda no encontrada'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        if not voting_round.is_active:
+            snapshot = RankingSnapshot.objects.filter(
+                round=voting_round
+            ).select_related('user').order_by('position')[:limit]
+            serializer = RankingSerializer(snapshot, many=True, context={'request': request})
+            
+            return Response({
+                'round': VotingRoundSerializer(voting_round).data,
+                'ranking': serializer.data,
+                'total_ranked': RankingSnapshot.objects.filter(round=voting_round).count()
+            })
+    
+    # Ranking de la ronda actual desde el leaderboard en memoria:
+    # los usuarios de la página se cargan después en una sola consulta
+    top = leaderboard.top(limit)
+    users = User.objects.in_bulk([user_id for user_id, _, _ in top])
+    ranking = [
+        UserStats(user=users[user_id], likes_received=likes_received, rank=rank)
+        for user_id, likes_received, rank in top if user_id in users
+    ]
+    
+    serializer = RankingSerializer(ranking, many=True, context={'request': request})
     
     return Response({
         'ranking': serializer.data,
-        'total_ranked': ranking.count()
+        'total_ranked': leaderboard.total_ranked(),
+        'my_rank': leaderboard.rank_of(request.user.id)
+    })
+
+
+def ranking_neighbors(likes_received, sort_name, user_id, window):
+    """Listed stats rows just above and below a ranking key, at most window on each side"""
+    listed = UserStats.objects.filter(is_listed=True).select_related('user')
+    # Orden del ranking: (-likes_received, sort_name, user_id)
+    ties = listed.filter(likes_received=likes_received)
+    
+    above = list(ties.filter(
+        Q(sort_name__lt=sort_name) | Q(sort_name=sort_name, user_id__lt=user_id)
+    ).order_by('-sort_name', '-user_id')[:window])
+    if len(above) < window:
+        above += listed.filter(likes_received__gt=likes_received).order_by(
+            'likes_received', '-sort_name', '-user_id'
+        )[:window - len(above)]
+    
+    below = list(ties.filter(
+        Q(sort_name__gt=sort_name) | Q(sort_name=sort_name, user_id__gt=user_id)
+    ).order_by('sort_name', 'user_id')[:window])
+    if len(below) < window:
+        below += listed.filter(likes_received__lt=likes_received).order_by(
+            '-likes_received', 'sort_name', 'user_id'
+        )[:window - len(below)]
+    
+    return above[::-1], below
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def ranking_around_me_view(request):
+    """Get the marketers ranked just above and below the current user"""
+    try:
+        window = min(max(int(request.query_params.get('window', 5)), 1), 25)
+    except ValueError:
+        return Response({
+            'error': 'Parámetros inválidos'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    stats = UserStats.objects.filter(user=request.user).values(
+        'rank', 'likes_received', 'sort_name', 'is_listed'
+    ).first() or {
+        **UserStats.listing_fields(request.user),
+        'rank': None, 'likes_received': 0, 'is_listed': False
+    }
+    
+    # Keyset sobre el orden del ranking: como mucho window filas a cada lado,
+    # aunque haya muchos empates
+    above, below = ranking_neighbors(
+        stats['likes_received'], stats['sort_name'], request.user.id, window
+    )
+    me = [UserStats(
+        user=request.user, likes_received=stats['likes_received'], rank=stats['rank']
+    )] if stats['is_listed'] else []
+    neighbors = above + me + below
+    percentile, total_listed = likes_percentile(stats['likes_received'])
+    
+    serializer = RankingSerializer(neighbors, many=True, context={'request': request})
+    
+    return Response({
+        'rank': stats['rank'],
+        'likes_count': stats['likes_received'],
+        'percentile': percentile,
+        'total_listed': total_listed,
+        'window': window,
+        'ranking': serializer.data
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def rank_history_view(request, user_id):
+    """Get the rank history of a marketer in the current round"""
+    try:
+        days = int(request.query_params.get('days', 30))
+    except ValueError:
+        days = 30
+    
+    history = RankHistory.objects.filter(
+        user_id=user_id,
+        round=VotingRound.active_id(),
+        recorded_at__gte=timezone.now() - timedelta(days=days)
+    ).order_by('recorded_at').values('recorded_at', 'rank', 'delta')
+    
+    return Response({
+        'user_id': user_id,
+        'history': list(history)
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def top_movers_view(request):
+    """Get the marketers that climbed the most positions recently"""
+    try:
+        hours = int(request.query_params.get('hours', 24))
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+    except ValueError:
+        return Response({
+            'error': 'Parámetros inválidos'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Suma de deltas precalculados, sin recorrer la tabla de likes
+    movers = list(RankHistory.objects.filter(
+        round=VotingRound.active_id(),
+        recorded_at__gte=timezone.now() - timedelta(hours=hours)
+    ).values('user_id').annotate(
+        climbed=Sum('delta')
+    ).filter(climbed__gt=0).order_by('-climbed', 'user_id')[:limit])
+    
+    users = User.objects.select_related('stats').in_bulk(
+        [mover['user_id'] for mover in movers]
+    )
+    
+    return Response({
+        'hours': hours,
+        'movers': [{
+            'user_id': mover['user_id'],
+            'full_name': users[mover['user_id']].full_name,
+            'avatar': (
+                users[mover['user_id']].avatar.url
+                if users[mover['user_id']].avatar else None
+            ),
+            'climbed': mover['climbed'],
+            'rank': getattr(getattr(users[mover['user_id']], 'stats', None), 'rank', None)
+        } for mover in movers if mover['user_id'] in users]
     })
 
 
@@ -272,7 +460,7 @@ class InvitationViewSet(ModelViewSet):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
 def reset_all_likes_view(request):
-    """Reset all likes (Admin only)"""
+    """Reset all likes of the current round in the background (Admin only)"""
     if not request.user.is_superuser:
         return Response({
             'error': 'Solo los superusuarios pueden resetear todos los likes'
@@ -285,19 +473,79 @@ def reset_all_likes_view(request):
             'error': 'Debe confirmar la acción enviando confirm: true'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Eliminar todos los likes
-    deleted_count, _ = Like.objects.all().delete()
+    # Solo un reseteo a la vez
+    in_progress = LikeReset.objects.filter(
+        status__in=[LikeReset.STATUS_PENDING, LikeReset.STATUS_RUNNING]
+    ).first()
+    if in_progress:
+        return Response({
+            'error': 'Ya hay un reseteo de likes en curso',
+            'reset': LikeResetSerializer(in_progress).data
+        }, status=status.HTTP_409_CONFLICT)
     
-    # Resetear estadísticas
-    UserStats.objects.all().update(
-        likes_received=0,
-        likes_given=0,
-        rank=None
-    )
+    reset, job = start_like_reset(request.user)
     
     return Response({
-        'message': f'Se eliminaron {deleted_count} likes exitosamente',
-        'deleted_likes': deleted_count
+        'message': 'Reseteo de likes iniciado',
+        'reset': LikeResetSerializer(reset).data,
+        'job': JobSerializer(job).data,
+        'progress_url': request.build_absolute_uri(
+            reverse('voting:reset_likes_progress', args=[reset.id])
+        )
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
+def reset_likes_progress_view(request, reset_id):
+    """Get the progress of a likes reset (Admin only)"""
+    try:
+        reset = LikeReset.objects.select_related('requested_by').get(id=reset_id)
+    except LikeReset.DoesNotExist:
+        return Response({
+            'error': 'Reseteo no encontrado'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(LikeResetSerializer(reset).data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def voting_rounds_view(request):
+    """List voting rounds, newest first"""
+    rounds = VotingRound.objects.all()
+    return Response({
+        'current': VotingRoundSerializer(VotingRound.get_current()).data,
+        'rounds': VotingRoundSerializer(rounds, many=True).data
+    })
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
+def close_round_view(request):
+    """Close the current round, freeze its ranking and open the next one (Admin only)"""
+    confirm = request.data.get('confirm', False)
+    if not confirm:
+        return Response({
+            'error': 'Debe confirmar la acción enviando confirm: true'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    closed_round = VotingRound.get_current()
+    try:
+        next_round = closed_round.close(
+            closed_by=request.user,
+            next_name=request.data.get('next_name') or None
+        )
+    except RoundAlreadyClosed:
+        return Response({
+            'error': 'La ronda ya fue cerrada por otra petición'
+        }, status=status.HTTP_409_CONFLICT)
+    closed_round.refresh_from_db()
+    
+    return Response({
+        'message': f'{closed_round.name} cerrada exitosamente',
+        'closed_round': VotingRoundSerializer(closed_round).data,
+        'current_round': VotingRoundSerializer(next_round).data
     })
 
 
@@ -306,36 +554,45 @@ def reset_all_likes_view(request):
 def update_rankings_view(request):
     """Force update of all user rankings"""
     try:
-        UserStats.update_all_rankings()
-        return Response({
-            'message': 'Rankings actualizados exitosamente'
-        })
+        # Peticiones simultáneas comparten una sola ejecución (también entre workers)
+        changed_user_ids, shared = run_exclusive(
+            'update_rankings', recompute_rankings, cooldown=RANKINGS_UPDATE_COOLDOWN
+        )
+    except CooldownActive as e:
+        retry_after = math.ceil(e.retry_after)
+        response = Response({
+            'error': f'Los rankings se actualizaron hace poco. Intenta de nuevo en {retry_after} segundos'
+        }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = str(retry_after)
+        return response
     except Exception as e:
         return Response({
             'error': f'Error actualizando rankings: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return Response({
+        'message': 'Rankings actualizados exitosamente',
+        'shared': shared,
+        'updated_users': len(changed_user_ids) if changed_user_ids is not None else None
+    })
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def user_detail_view(request, user_id):
     """Get detailed information about a specific user"""
-    try:
-        user = User.objects.select_related('stats').prefetch_related(
-            'received_likes__giver',
-            'given_likes__target'
-        ).get(id=user_id, is_marketer=True, registration_completed=True)
-    except User.DoesNotExist:
+    payload = get_user_detail_payload(user_id, request)
+    if payload is None:
         return Response({
             'error': 'Usuario no encontrado'
         }, status=status.HTTP_404_NOT_FOUND)
     
-    serializer = UserDetailSerializer(user, context={'request': request})
-    return Response(serializer.data)
+    return Response(payload)
 
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([InvitationValidationThrottle])
 def validate_invitation_view(request):
     """Validate invitation code without using it"""
     code = request.query_params.get('code')
@@ -344,20 +601,19 @@ def validate_invitation_view(request):
             'error': 'Código de invitación requerido'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        invitation = Invitation.objects.get(code=code)
-        is_valid, message = invitation.is_valid()
-        
-        return Response({
-            'valid': is_valid,
-            'message': message,
-            'email': invitation.email if is_valid else None
-        })
-    except Invitation.DoesNotExist:
+    invitation = get_invitation(code)
+    if invitation is None:
         return Response({
             'valid': False,
             'message': 'Código de invitación no existe'
         })
+    
+    is_valid, message = invitation.is_valid()
+    return Response({
+        'valid': is_valid,
+        'message': message,
+        'email': invitation.email if is_valid else None
+    })
 
 
 @api_view(['GET'])
@@ -377,9 +633,7 @@ def search_marketers_view(request):
         Q(bio__icontains=query),
         is_marketer=True,
         registration_completed=True
-    ).select_related('stats').annotate(
-        likes_count=Count('received_likes')
-    ).order_by('-likes_count', 'first_name')[:20]
+    ).select_related('stats').order_by('-stats__likes_received', 'first_name')[:20]
     
     serializer = UserProfileSerializer(
         marketers, many=True, context={'request': request}
@@ -396,59 +650,48 @@ def search_marketers_view(request):
 @permission_classes([permissions.IsAuthenticated])
 def activity_feed_view(request):
     """Get recent activity feed"""
-    # Últimos likes recibidos por el usuario actual
-    recent_received = Like.objects.filter(
-        target=request.user
-    ).select_related('giver').order_by('-created_at')[:10]
-    
-    # Últimos likes dados por el usuario actual
-    recent_given = Like.objects.filter(
-        giver=request.user
-    ).select_related('target').order_by('-created_at')[:10]
+    # Últimos likes recibidos y dados por el usuario actual
+    edges = get_like_edges(request.user.id)
     
-    # Actividad general reciente (opcional)
-    recent_activity = Like.objects.select_related(
-        'giver', 'target'
-    ).order_by('-created_at')[:20]
+    # Actividad general reciente, proyectada desde el log de eventos
+    recent_activity = get_recent_activity(limit=20)
+    users = User.objects.in_bulk({
+        user_id for _, giver_id, target_id, _ in recent_activity for user_id in (giver_id, target_id)
+    })
     
     return Response({
         'recent_received': [{
-            'id': like.id,
-            'from': {
-                'id': like.giver.id,
-                'name': like.giver.full_name,
-                'avatar': like.giver.avatar.url if like.giver.avatar else None
-            },
-            'created_at': like.created_at
-        } for like in recent_received],
+            'id': edge['like_id'],
+            'from': edge_summary(edge),
+            'created_at': edge['created_at']
+        } for edge in edges['received'][:10]],
         'recent_given': [{
-            'id': like.id,
-            'to': {
-                'id': like.target.id,
-                'name': like.target.full_name,
-                'avatar': like.target.avatar.url if like.target.avatar else None
-            },
-            'created_at': like.created_at
-        } for like in recent_given],
+            'id': edge['like_id'],
+            'to': edge_summary(edge),
+            'created_at': edge['created_at']
+        } for edge in edges['given'][:10]],
         'recent_activity': [{
-            'id': like.id,
+            'id': event_id,
             'from': {
-                'id': like.giver.id,
-                'name': like.giver.full_name,
-                'avatar': like.giver.avatar.url if like.giver.avatar else None
+                'id': users[giver_id].id,
+                'name': users[giver_id].full_name,
+                'avatar': users[giver_id].avatar.url if users[giver_id].avatar else None
             },
             'to': {
-                'id': like.target.id,
-                'name': like.target.full_name,
-                'avatar': like.target.avatar.url if like.target.avatar else None
+                'id': users[target_id].id,
+                'name': users[target_id].full_name,
+                'avatar': users[target_id].avatar.url if users[target_id].avatar else None
             },
-            'created_at': like.created_at
-        } for like in recent_activity]
+            'created_at': created_at
+        } for event_id, giver_id, target_id, created_at in recent_activity
+            if giver_id in users and target_id in users]
     })
 
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@throttle_classes([ToggleLikeThrottle])
+@idempotent
 def toggle_like_view(request):
     """Toggle like for a user (give or remove)"""
     marketer_id = request.data.get('marketer_id')
@@ -469,7 +712,7 @@ def toggle_like_view(request):
         }, status=status.HTTP_404_NOT_FOUND)
     
     # Verificar si ya existe el like
-    existing_like = Like.objects.filter(
+    existing_like = Like.objects.current().filter(
         giver=request.user, 
         target=target_user
     ).first()
@@ -499,6 +742,24 @@ def toggle_like_view(request):
     })
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@idempotent
+def batch_likes_view(request):
+    """Apply several like add/remove operations in a single request"""
+    serializer = LikeBatchSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    result = serializer.save()
+    
+    return Response({
+        'added': result['to_add'],
+        'removed': result['to_remove'],
+        'liked_ids': result['liked_ids'],
+        'remaining_likes': MAX_LIKES_PER_USER - len(result['liked_ids']),
+        'message': 'Likes actualizados exitosamente'
+    })
+
+
 # Error handlers personalizados
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -521,89 +782,73 @@ def custom_500_view(request):
         'error': 'Error interno del servidor',
         'status_code': 500
     }, status=500)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
 def bulk_create_invitations(request):
-    """Create multiple invitations at once"""
-    count = request.data.get('count', 1)
-    emails = request.data.get('emails', [])
-    expires_days = request.data.get('expires_days', 30)
+    """Queue the creation of multiple invitations (Admin only)"""
+    serializer = BulkInvitationsPayloadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    count = serializer.validated_data['count']
     
-    if count < 1 or count > 100:
+    # Las invitaciones se crean en un worker: se consulta el job para obtener los códigos
+    job = enqueue('bulk_invitations', serializer.validated_data, created_by=request.user)
+    
+    return Response({
+        'message': f'Creación de {count} invitaciones en cola',
+        'job': JobSerializer(job).data,
+        'job_url': request.build_absolute_uri(reverse('voting:job_detail', args=[job.id]))
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
+def enqueue_job_view(request):
+    """Queue a background job (Admin only)"""
+    kind = request.data.get('kind')
+    if kind not in JOB_HANDLERS:
         return Response({
-            'error': 'El número debe estar entre 1 y 100'
+            'error': f'Tipo de tarea inválido. Opciones: {", ".join(sorted(JOB_HANDLERS))}'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    expires_at = timezone.now() + timedelta(days=expires_days)
-    created_invitations = []
+    # Los reseteos se inician desde su endpoint, con confirmación y registro de auditoría
+    if kind == 'reset_likes':
+        return Response({
+            'error': 'Usa /api/admin/likes/reset/ para resetear los likes'
+        }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Crear invitaciones
-    for i in range(count):
-        email = emails[i] if i < len(emails) else None
-        
-        invitation = Invitation.objects.create(
-            created_by=request.user,
-            email=email,
-            expires_at=expires_at
-        )
-        
-        # Generar código único
-        import secrets
-        import string
-        while True:
-            code = ''.join(secrets.choice(
-                string.ascii_uppercase + string.digits
-            ) for _ in range(12))
-            
-            if not Invitation.objects.filter(code=code).exists():
-                invitation.code = code
-                invitation.save()
-                break
-        
-        created_invitations.append(invitation)
+    payload = request.data.get('payload') or {}
+    if not isinstance(payload, dict):
+        return Response({
+            'error': 'payload debe ser un objeto'
+        }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Serializar resultados
-    serializer = InvitationSerializer(created_invitations, many=True)
+    job = enqueue(kind, payload, created_by=request.user)
     
     return Response({
-        'invitations': serializer.data,
-        'count': len(created_invitations),
-        'message': f'{len(created_invitations)} invitaciones creadas exitosamente'
-    }, status=status.HTTP_201_CREATED)
+        'job': JobSerializer(job).data,
+        'job_url': request.build_absolute_uri(reverse('voting:job_detail', args=[job.id]))
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
+def job_detail_view(request, job_id):
+    """Get the status and progress of a background job (Admin only)"""
+    try:
+        job = Job.objects.select_related('created_by').get(id=job_id)
+    except Job.DoesNotExist:
+        return Response({
+            'error': 'Tarea no encontrada'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(JobSerializer(job).data)
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
 def admin_stats_view(request):
     """Get admin statistics"""
-    total_users = User.objects.filter(is_marketer=True).count()
-    active_users = User.objects.filter(
-        is_marketer=True, 
-        registration_completed=True
-    ).count()
-    total_likes = Like.objects.count()
-    total_invitations = Invitation.objects.count()
-    used_invitations = Invitation.objects.filter(used=True).count()
-    
-    # Usuarios más activos (que más likes han dado)
-    most_active_givers = User.objects.annotate(
-        given_count=Count('given_likes')
-    ).filter(given_count__gt=0).order_by('-given_count')[:5]
-    
-    # Usuarios más populares (que más likes han recibido)
-    most_popular = User.objects.annotate(
-        received_count=Count('received_likes')
-    ).filter(received_count__gt=0).order_by('-received_count')[:5]
-    
     return Response({
-        'total_users': total_users,
-        'active_users': active_users,
-        'total_likes': total_likes,
-        'total_invitations': total_invitations,
-        'used_invitations': used_invitations,
-        'unused_invitations': total_invitations - used_invitations,
-        'most_active_givers': UserProfileSerializer(
-            most_active_givers, many=True, context={'request': request}
-        ).data,
-        'most_popular': UserProfileSerializer(
-            most_popular, many=True, context={'request': request}
-        ).data
+        **get_admin_stats(),
+        'throttle_rejections': get_rejection_counts()
     })